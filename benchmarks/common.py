@@ -0,0 +1,55 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+import random
+import statistics
+import time
+import typing
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QPainter, QLinearGradient, QColor, QBrush
+
+
+def create_sample_image(path: pathlib.Path, width: int = 5100, height: int = 7000, quality: int = 90) -> pathlib.Path:
+    """
+    Writes a synthetic scan-like image to path and returns the path. The default size corresponds to an
+    A4 page scanned at 600 DPI. The image contains a background gradient with some colored rectangles on top,
+    so that it compresses similar to a real scan containing photos.
+    """
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(250, 245, 230))
+    gradient.setColorAt(1, QColor(40, 70, 100))
+    painter.fillRect(image.rect(), QBrush(gradient))
+    rng = random.Random(42)
+    for _ in range(400):
+        color = QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        painter.fillRect(QRect(rng.randrange(width), rng.randrange(height), width // 20, height // 30), color)
+    painter.end()
+    image.save(str(path), None, quality)
+    return path
+
+
+def measure(function: typing.Callable[[], typing.Any], repetitions: int = 5) -> typing.Tuple[float, typing.Any]:
+    """Calls function repetitions times. Returns the median run time in seconds and the result of the last call."""
+    timings = []
+    result = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
@@ -0,0 +1,95 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares copying selections out of the decoded image against referencing the decoded image buffer using views.
+Usage: python3 -m benchmarks.crop_views [IMAGE …]
+The image is split into a grid of selections. All selections are extracted and kept alive, like in the queues of the
+save pipeline, and then encoded. Each variant runs in a fresh process, so that the peak memory usage (maximum resident
+set size) of the variants can be compared.
+Without arguments, a synthetic scan is generated in a temporary directory.
+"""
+
+import argparse
+import concurrent.futures
+import multiprocessing
+import pathlib
+import resource
+import tempfile
+import time
+import typing
+
+from PyQt5.QtCore import QBuffer, QIODevice, QRect
+from PyQt5.QtGui import QImage, QImageWriter
+
+from visual_image_splitter.model.crop import extract_region
+from .common import create_sample_image
+
+COLUMNS = 4
+ROWS = 3
+
+
+def grid(image: QImage) -> typing.List[QRect]:
+    width, height = image.width() // COLUMNS, image.height() // ROWS
+    return [QRect(column * width, row * height, width, height) for row in range(ROWS) for column in range(COLUMNS)]
+
+
+def encode(image: QImage) -> int:
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    QImageWriter(buffer, b"png").write(image)
+    return buffer.size()
+
+
+def run(path: pathlib.Path, use_views: bool) -> typing.Tuple[float, float, float]:
+    """Executed in a separate process. Returns the extraction time, the encoding time and the peak RSS in MiB."""
+    image = QImage(str(path))
+    start = time.perf_counter()
+    extracts = [
+        extract_region(image, region) if use_views else image.copy(region)
+        for region in grid(image)
+    ]
+    extracted = time.perf_counter()
+    for extract in extracts:
+        encode(extract)
+    encoded = time.perf_counter()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10  # ru_maxrss is given in KiB on Linux
+    return extracted - start, encoded - extracted, peak_rss
+
+
+def benchmark(path: pathlib.Path):
+    image = QImage(str(path))
+    print(f"{path.name}: {image.width()}x{image.height()} pixels, {image.sizeInBytes()/2**20:.1f} MiB decoded, "
+          f"{COLUMNS*ROWS} selections")
+    context = multiprocessing.get_context("spawn")
+    for name, use_views in (("copies", False), ("views", True)):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            extract_time, encode_time, peak_rss = executor.submit(run, path, use_views).result()
+        print(f"  {name:>6}: extract {extract_time*1000:7.1f} ms, encode {encode_time*1000:7.1f} ms, "
+              f"peak RSS {peak_rss:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=pathlib.Path)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = args.images or [create_sample_image(pathlib.Path(temp_dir, "sample.png"))]
+        for image in images:
+            benchmark(image)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the encoder presets by encoding time and output size.
+Usage: python3 -m benchmarks.encoder_presets [IMAGE …]
+Each image is decoded once and then encoded as JPEG, PNG and TIFF using the Qt default settings and each preset.
+Without arguments, a synthetic scan is generated in a temporary directory.
+This is the same benchmark as the --benchmark-encoders command line option, with a configurable repetition count.
+"""
+
+import argparse
+import pathlib
+import sys
+import tempfile
+
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter.encoder_benchmark import benchmark, candidates
+from visual_image_splitter.model.encoder_settings import EncoderSettings
+from .common import create_sample_image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=pathlib.Path)
+    parser.add_argument("-r", "--repetitions", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = args.images or [create_sample_image(pathlib.Path(temp_dir, "sample.png"), 2550, 3500)]
+        for image in images:
+            benchmark(image.name, QImage(str(image)), candidates(EncoderSettings()), sys.stdout, args.repetitions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures the photo detection time per page, excluding the preview creation.
+Usage: python3 -m benchmarks.photo_detection [IMAGE …]
+Without arguments, a synthetic scan with a grid of photos is generated in a temporary directory.
+"""
+
+import argparse
+import pathlib
+import tempfile
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from visual_image_splitter.model import photo_detection
+from visual_image_splitter.model.image import Image
+from .common import create_sample_image, measure
+
+
+def create_sample_page(path: pathlib.Path, width: int = 5100, height: int = 7000) -> pathlib.Path:
+    """Writes a scan of six photos on a bright scanner bed to path. The photos are synthetic scans themselves."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        photo = QImage(str(create_sample_image(pathlib.Path(temp_dir, "photo.jpg"), width // 3, height // 4)))
+    page = QImage(width, height, QImage.Format_RGB32)
+    page.fill(QColor(248, 248, 244))
+    painter = QPainter(page)
+    for row in range(3):
+        for column in range(2):
+            painter.drawImage(QRect(
+                width // 10 + column * width // 2, height // 20 + row * height // 3, photo.width(), photo.height()
+            ), photo)
+    painter.end()
+    page.save(str(path), None, 90)
+    return path
+
+
+def benchmark(path: pathlib.Path, repetitions: int):
+    image = Image(path)
+    low_resolution_image = image.read_preview()
+    run_time, photos = measure(lambda: photo_detection.find_photos(low_resolution_image), repetitions)
+    print(f"{path.name}: {image.width}x{image.height} pixels, preview {low_resolution_image.width()}x"
+          f"{low_resolution_image.height()}, {len(photos)} photos detected in {run_time*1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=pathlib.Path)
+    parser.add_argument("-r", "--repetitions", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = args.images or [create_sample_page(pathlib.Path(temp_dir, "sample.jpg"))]
+        for image in images:
+            benchmark(image, args.repetitions)
+
+
+if __name__ == "__main__":
+    main()
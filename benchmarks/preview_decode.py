@@ -0,0 +1,74 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the two preview creation paths: Reduced size decoding versus full decode followed by scaling.
+Usage: python3 -m benchmarks.preview_decode [IMAGE …]
+Without arguments, synthetic JPEG and PNG scans are generated in a temporary directory.
+The reported buffer size only covers the decoded images returned by Qt. Format handlers that emulate reduced size
+decoding, like the PNG handler, still allocate the full resolution image internally.
+"""
+
+import argparse
+import pathlib
+import tempfile
+
+from PyQt5.QtGui import QImageReader
+
+from visual_image_splitter.model import preview
+from .common import create_sample_image, measure
+
+
+def full_decode(path: pathlib.Path):
+    image_data = QImageReader(str(path)).read()
+    return preview.scale_to_preview(image_data), image_data.sizeInBytes()
+
+
+def reduced_size_decode(path: pathlib.Path):
+    reader = QImageReader(str(path))
+    size = reader.size()
+    result = preview.read_reduced_size_preview(reader, preview.preview_size(size.width(), size.height()))
+    if result is None:
+        return None, 0
+    return result, result.sizeInBytes()
+
+
+def benchmark(path: pathlib.Path, repetitions: int):
+    print(f"{path.name}: {path.stat().st_size/2**20:.1f} MiB on disk")
+    for name, function in (("full decode + scale", full_decode), ("reduced size decode", reduced_size_decode)):
+        run_time, (result, decoded_bytes) = measure(lambda: function(path), repetitions)
+        if result is None:
+            print(f"  {name:>20}: not supported by this format")
+        else:
+            print(f"  {name:>20}: {run_time*1000:8.1f} ms, largest decoded buffer {decoded_bytes/2**20:7.1f} MiB, "
+                  f"preview {result.width()}x{result.height()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=pathlib.Path)
+    parser.add_argument("-r", "--repetitions", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = args.images or [
+            create_sample_image(pathlib.Path(temp_dir, "sample.jpg")),
+            create_sample_image(pathlib.Path(temp_dir, "sample.png")),
+        ]
+        for image in images:
+            benchmark(image, args.repetitions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares applying selection presets one by one against applying a SelectionPresetList, which parses the presets once
+and caches the resolved coordinates per image size.
+Usage: python3 -m benchmarks.selection_presets [-n IMAGES] [-p PRESETS]
+The images are stand-ins sharing three different sizes, so that only the preset handling is measured.
+"""
+
+import argparse
+import time
+import typing
+
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.selection_preset import SelectionPreset, SelectionPresetList
+
+SIZES = ((5100, 7000), (4960, 7016), (2550, 3500))
+
+
+class StandInImage:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.image_path = "stand-in"
+        self.selections: typing.List[Selection] = []
+
+    def add_selection(self, selection: Selection):
+        self.selections.append(selection)
+
+    def add_selections(self, selections: typing.Iterable[Selection]):
+        self.selections += selections
+
+
+def create_presets(count: int) -> typing.List[SelectionPreset]:
+    return [
+        SelectionPreset(f"{index % 10}%", str(index * 10), f"+{index + 100}", f"-{index % 5 * 10}%")
+        for index in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--images", type=int, default=10000)
+    parser.add_argument("-p", "--presets", type=int, default=50)
+    args = parser.parse_args()
+    presets = create_presets(args.presets)
+    images = [StandInImage(*SIZES[index % len(SIZES)]) for index in range(args.images)]
+    print(f"Applying {args.presets} presets to {args.images} images")
+    start = time.perf_counter()
+    for image in images:
+        for preset in presets:
+            image.add_selection(preset.to_rectangle(image))
+    print(f"  to_rectangle():       {time.perf_counter() - start:7.3f} s")
+    for image in images:
+        image.selections.clear()
+    start = time.perf_counter()
+    preset_list = SelectionPresetList(presets)
+    for image in images:
+        preset_list.apply_to(image)
+    print(f"  SelectionPresetList:  {time.perf_counter() - start:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
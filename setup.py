@@ -77,7 +77,7 @@ meta_data = extract_metadata()
 
 setup(
     name=project_name,
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "benchmarks")),
     include_package_data=True,
     # add required packages to install_requires list
     # This causes pip to download and install a copy from PyPi, instead of using the already installed version
@@ -18,7 +18,9 @@ from collections import namedtuple
 import visual_image_splitter.logger as logger
 
 logger.configure_root_logger(
-    namedtuple("Namespace", ["cutelog_integration", "verbose"])(True, False)
+    namedtuple("Namespace", ["cutelog_integration", "verbose", "batch", "benchmark_encoders"])(
+        True, False, False, False
+    )
 )
 
 del logger, namedtuple
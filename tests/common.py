@@ -13,14 +13,57 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import pathlib
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
 
 class Namespace:
     """
     Mock namespace. This class fakes command line parameter parsing results.
     """
-    def __init__(self, images: list=None, output_dir: str=None):
+    def __init__(self, images: list=None, output_dir: str=None, jobs: int=1):
         if images is None:
             images = []
         self.images = images
+        self.files_from = None
+        self.extensions = None
+        self.recursive = True
+        self.manifest = None
         self.output_dir = output_dir
         self.selections = []
+        self.detect_photos = False
+        self.jobs = jobs
+        self.thumbnail_cache_size = 0
+        self.thumbnail_cache_dir = None
+        self.freedesktop_thumbnails = False
+        self.image_cache_size = 0
+        self.source_cache_size = 0
+        self.region_decoding = "auto"
+        self.prefetch = 0
+        self.prefetch_decode = False
+        self.lossless_jpeg = False
+        self.save_strategy = "processes"
+        self.encoder_preset = None
+        self.jpeg_quality = None
+        self.jpeg_progressive = None
+        self.jpeg_optimize = None
+        self.png_compression = None
+        self.tiff_compression = None
+        self.sync = "never"
+        self.journal = None
+        self.resume = False
+        self.batch = False
+        self.watch_directories = []
+        self.watch_interval = 5.0
+        self.benchmark_encoders = False
+
+
+def create_image_file(
+        path: pathlib.Path, width: int = 1000, height: int = 800, color: Qt.GlobalColor = Qt.darkCyan) -> pathlib.Path:
+    """Writes a single colored image file in the format given by the file name suffix and returns its path."""
+    image_data = QImage(width, height, QImage.Format_RGB32)
+    image_data.fill(color)
+    image_data.save(str(path))
+    return path
@@ -0,0 +1,66 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import gc
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QImage, QLinearGradient, QPainter
+
+from visual_image_splitter.model.crop import can_create_view, extract_region
+
+
+def _create_image(image_format: QImage.Format) -> QImage:
+    image = QImage(300, 200, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, 300, 200)
+    gradient.setColorAt(0, Qt.white)
+    gradient.setColorAt(1, Qt.darkGreen)
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    image.setDotsPerMeterX(11811)
+    image.setText("Description", "Scan")
+    return image.convertToFormat(image_format)
+
+
+@pytest.mark.parametrize("image_format, region, is_view", [
+    (QImage.Format_RGB32, QRect(13, 7, 100, 50), True),
+    (QImage.Format_ARGB32, QRect(0, 0, 300, 200), True),
+    (QImage.Format_Grayscale8, QRect(12, 7, 100, 50), True),
+    (QImage.Format_Grayscale8, QRect(13, 7, 100, 50), False),  # Not 32-bit aligned
+    (QImage.Format_RGB888, QRect(4, 5, 20, 20), True),
+    (QImage.Format_RGB888, QRect(5, 5, 20, 20), False),  # Not 32-bit aligned
+    (QImage.Format_Mono, QRect(8, 0, 50, 50), False),  # Pixels do not start at byte boundaries
+    (QImage.Format_RGB32, QRect(250, 150, 100, 100), False),  # Exceeds the image bounds
+])
+def test_extract_region(image_format: QImage.Format, region: QRect, is_view: bool):
+    image = _create_image(image_format)
+    extract = extract_region(image, region)
+    assert_that(can_create_view(image, region), is_(is_view))
+    assert_that(extract, is_(equal_to(image.copy(region))))
+    references_image_buffer = int(image.constBits()) <= int(extract.constBits()) < \
+        int(image.constBits()) + image.sizeInBytes()
+    assert_that(references_image_buffer, is_(is_view))
+    assert_that(extract.dotsPerMeterX(), is_(equal_to(11811)))
+    assert_that(extract.text("Description"), is_(equal_to("Scan")))
+
+
+def test_view_keeps_image_buffer_alive():
+    extract = extract_region(_create_image(QImage.Format_RGB32), QRect(20, 20, 50, 50))
+    gc.collect()
+    assert_that(extract.pixelColor(0, 0).isValid(), is_(True))
+    assert_that(extract.copy(), is_(equal_to(extract)))
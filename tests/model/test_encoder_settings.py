@@ -0,0 +1,87 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import QBuffer, QIODevice, Qt
+from PyQt5.QtGui import QImage, QImageWriter, QLinearGradient, QPainter
+
+from visual_image_splitter.model.encoder_settings import EncoderSettings, PRESETS, from_arguments, from_json, to_json
+
+
+@pytest.fixture(scope="module")
+def image() -> QImage:
+    image = QImage(400, 300, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, 400, 300)
+    gradient.setColorAt(0, Qt.white)
+    gradient.setColorAt(1, Qt.darkBlue)
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    return image
+
+
+def _encoded_size(image: QImage, image_format: str, settings: EncoderSettings) -> int:
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, image_format.encode())
+    settings.apply(writer, image_format)
+    assert_that(writer.write(image), is_(True))
+    return buffer.size()
+
+
+@pytest.mark.parametrize("image_format, small, large", [
+    ("png", EncoderSettings(png_compression=9), EncoderSettings(png_compression=0)),
+    ("jpg", EncoderSettings(jpeg_quality=10), EncoderSettings(jpeg_quality=100)),
+    ("tiff", EncoderSettings(tiff_compression="lzw"), EncoderSettings(tiff_compression="none")),
+])
+def test_settings_are_applied(image: QImage, image_format: str, small: EncoderSettings, large: EncoderSettings):
+    assert_that(_encoded_size(image, image_format, small), is_(less_than(_encoded_size(image, image_format, large))))
+
+
+@pytest.mark.parametrize("level", range(10))
+def test_png_compression_level_to_quality_mapping(level: int):
+    writer = QImageWriter()
+    EncoderSettings(png_compression=level).apply(writer, "png")
+    # Inverse of the mapping used by the Qt PNG handler
+    assert_that((100 - writer.quality()) * 9 // 91, is_(equal_to(level)))
+
+
+def test_individual_settings_override_the_preset():
+    settings = from_arguments("small", EncoderSettings(jpeg_quality=70, tiff_compression="none"))
+    assert_that(settings, is_(equal_to(PRESETS["small"]._replace(jpeg_quality=70, tiff_compression="none"))))
+    assert_that(from_arguments(None, EncoderSettings()), is_(equal_to(EncoderSettings())))
+
+
+def test_from_json_overrides_the_preset():
+    settings = from_json({"preset": "small", "jpeg_quality": 95})
+    assert_that(settings, is_(equal_to(PRESETS["small"]._replace(jpeg_quality=95))))
+    assert_that(from_json(to_json(settings)), is_(equal_to(settings)))
+    assert_that(from_json({}), is_(equal_to(EncoderSettings())))
+
+
+@pytest.mark.parametrize("value", [
+    [],
+    {"preset": "tiny"},
+    {"jpeg_quality": 101},
+    {"jpeg_quality": True},
+    {"png_compression": "9"},
+    {"jpeg_progressive": 1},
+    {"tiff_compression": "zip"},
+    {"quality": 90},
+])
+def test_from_json_rejects_invalid_settings(value):
+    assert_that(calling(from_json).with_args(value), raises(ValueError))
@@ -0,0 +1,164 @@
+# Copyright (C) 2018 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage, QImageIOHandler
+
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.image import Image, create_image_data_cache, create_encoded_data_cache
+from visual_image_splitter.model.thumbnail_cache import ThumbnailCache
+
+
+@pytest.fixture(params=["jpg", "png"])
+def image_file(request, tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / f"scan.{request.param}"
+    image = QImage(1600, 1000, QImage.Format_RGB32)
+    image.fill(Qt.darkCyan)
+    image.save(str(path))
+    return path
+
+
+def test_opening_reads_header_only(image_file: pathlib.Path):
+    image = Image(image_file)
+    assert_that(image.width, is_(equal_to(1600)))
+    assert_that(image.height, is_(equal_to(1000)))
+    assert_that(image.has_image_data, is_(False))
+    assert_that(image.has_preview, is_(False))
+
+
+def test_load_preview(qapplication, image_file: pathlib.Path):
+    image = Image(image_file)
+    image.load_preview()
+    assert_that(image.has_preview, is_(True))
+    assert_that(image.low_resolution_image.width(), is_(equal_to(800)))
+    assert_that(image.low_resolution_image.height(), is_(equal_to(500)))
+    assert_that(image.has_image_data, is_(False))
+
+
+@pytest.mark.parametrize("freedesktop, cached_width", [(False, 800), (True, 1024)])
+def test_read_preview_using_thumbnail_cache(
+        image_file: pathlib.Path, tmp_path: pathlib.Path, freedesktop: bool, cached_width: int):
+    cache = ThumbnailCache(tmp_path / "cache", 2**30, freedesktop)
+    image = Image(image_file)
+    assert_that(image.read_preview(cache).size(), is_(equal_to(QSize(800, 500))))
+    entries = list((tmp_path / "cache").glob("*.png"))
+    assert_that(entries, has_length(1))
+    # freedesktop.org xx-large thumbnails are 1024 pixels large, as defined by the standard.
+    assert_that(QImage(str(entries[0])).width(), is_(equal_to(cached_width)))
+    assert_that(image.read_preview(cache).size(), is_(equal_to(QSize(800, 500))))
+    assert_that(cache.hits, is_(equal_to(1)))
+
+
+def test_unreadable_file_raises(tmp_path: pathlib.Path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"Not an image")
+    assert_that(calling(Image).with_args(path), raises(RuntimeError))
+
+
+def test_image_data_is_kept_in_the_shared_cache(image_file: pathlib.Path):
+    cache = create_image_data_cache(2**30)
+    image = Image(image_file, image_data_cache=cache)
+    image_data = image.load_image_data()
+    assert_that(image.has_image_data, is_(True))
+    assert_that(image.load_image_data(), is_(equal_to(image_data)))
+    assert_that(cache.hits, is_(equal_to(1)))
+    image.clear_image_data()
+    assert_that(image.has_image_data, is_(False))
+
+
+def test_image_data_is_not_kept_without_budget(image_file: pathlib.Path):
+    image = Image(image_file)
+    image_data = image.load_image_data()
+    assert_that(image_data.width(), is_(equal_to(1600)))
+    assert_that(image.has_image_data, is_(False))
+
+
+def test_decoding_from_encoded_data_cache(qapplication, image_file: pathlib.Path):
+    encoded_data_cache = create_encoded_data_cache(2**30)
+    image = Image(image_file, encoded_data_cache=encoded_data_cache)
+    image.load_preview()
+    assert_that(image.image_path in encoded_data_cache, is_(True))
+    image_file.unlink()  # All further decoding has to use the cached file content
+    assert_that(image.load_image_data().width(), is_(equal_to(1600)))
+    image.clear_image_data()
+    assert_that(image.image_path in encoded_data_cache, is_(False))
+
+
+def test_header_is_read_from_encoded_data_cache(image_file: pathlib.Path):
+    encoded_data_cache = create_encoded_data_cache(2**30)
+    image = Image(image_file, encoded_data_cache=encoded_data_cache)
+    assert_that(image.image_path in encoded_data_cache, is_(True))
+    image_file.unlink()  # Reading the header again has to use the cached file content
+    image.load_meta_data()
+    assert_that(image.width, is_(equal_to(1600)))
+
+
+@pytest.mark.parametrize("selections, region_decoding, expected", [
+    ([(0, 0, 100, 100)], "auto", True),
+    ([(0, 0, 800, 500), (800, 500, 1600, 1000)], "auto", False),  # Second region requires decoding all rows
+    ([(0, 0, 800, 500), (800, 500, 1600, 1000)], "always", True),
+    ([(0, 0, 100, 100)], "never", False),
+    ([(1500, 900, 1700, 1100)], "always", False),  # Selection exceeds the image bounds
+])
+def test_use_region_decoding_for_jpeg(tmp_path: pathlib.Path, selections, region_decoding: str, expected: bool):
+    path = tmp_path / "scan.jpg"
+    QImage(1600, 1000, QImage.Format_RGB32).save(str(path))
+    image = Image(path)
+    for x1, y1, x2, y2 in selections:
+        image.add_selection(Selection(Point(x1, y1), Point(x2, y2), image))
+    assert_that(image._use_region_decoding(region_decoding), is_(expected))
+
+
+def test_region_decoding_matches_full_decode(image_file: pathlib.Path):
+    image = Image(image_file)
+    region = Selection(Point(100, 200), Point(600, 500), image).as_qrect
+    if not image._create_image_reader().supportsOption(QImageIOHandler.ClipRect):
+        pytest.skip("Format does not support region decoding.")
+    assert_that(image._read_region(region), is_(equal_to(image.load_image_data().copy(region))))
+
+
+def _add_grid_selections(image: Image, count: int):
+    for index in range(count):
+        x = 100 * index
+        image.add_selection(Selection(Point(x, 0), Point(x + 50 + index, 100), image))
+
+
+def test_concurrent_write_output_keeps_output_numbering(qapplication, image_file: pathlib.Path):
+    image = Image(image_file)
+    _add_grid_selections(image, 8)
+    progress = []
+    image.write_output_progress.connect(progress.append)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        image.write_output(region_decoding="never", executor=executor)
+    qapplication.processEvents()  # Deliver the progress signals emitted by the executor threads
+    for index, selection in enumerate(image.selections, start=1):
+        output = QImage(image._get_output_file_name(index))
+        assert_that(output.size(), is_(equal_to(selection.as_qrect.size())))
+    assert_that(progress, is_(equal_to(sorted(progress))))
+    assert_that(progress[-1], is_(equal_to(100)))
+
+
+def test_write_output_interruption(image_file: pathlib.Path):
+    image = Image(image_file)
+    _add_grid_selections(image, 3)
+    image.write_output(is_interruption_requested=lambda: True)
+    assert_that(list(image_file.parent.glob(f"{image_file.stem}_*")), is_(empty()))
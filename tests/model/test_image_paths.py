@@ -0,0 +1,87 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import io
+import pathlib
+
+from hamcrest import *
+
+from visual_image_splitter.model import image_paths
+from tests.common import Namespace
+
+
+def _touch(*paths: pathlib.Path):
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
+def test_walk_yields_matching_files_in_name_order(tmp_path: pathlib.Path):
+    _touch(
+        tmp_path / "b.jpg", tmp_path / "a.PNG", tmp_path / "notes.txt", tmp_path / ".hidden.jpg",
+        tmp_path / "sub" / "c.jpg", tmp_path / "sub" / "deeper" / "d.jpg", tmp_path / ".cache" / "e.jpg"
+    )
+    assert_that(
+        list(image_paths.walk(tmp_path, {"jpg", "png"})),
+        contains_exactly(
+            tmp_path / "a.PNG", tmp_path / "b.jpg", tmp_path / "sub" / "c.jpg", tmp_path / "sub" / "deeper" / "d.jpg"
+        )
+    )
+    assert_that(
+        list(image_paths.walk(tmp_path, {"jpg"}, recursive=False)), contains_exactly(tmp_path / "b.jpg")
+    )
+
+
+def test_expand_glob_pattern(tmp_path: pathlib.Path):
+    _touch(tmp_path / "scan1.tif", tmp_path / "scan2.jpg", tmp_path / "a" / "scan3.tif")
+    assert_that(
+        list(image_paths.expand(str(tmp_path / "**" / "scan*"), {"tif"})),
+        contains_exactly(tmp_path / "a" / "scan3.tif", tmp_path / "scan1.tif")
+    )
+
+
+def test_walk_follows_directory_links_once(tmp_path: pathlib.Path):
+    _touch(tmp_path / "sub" / "a.jpg")
+    # A link back to the parent directory would cause an endless loop, if directories were searched more than once.
+    (tmp_path / "sub" / "loop").symlink_to(tmp_path, target_is_directory=True)
+    (tmp_path / "linked").symlink_to(tmp_path / "sub", target_is_directory=True)
+    assert_that(list(image_paths.walk(tmp_path, {"jpg"})), contains_exactly(tmp_path / "linked" / "a.jpg"))
+
+
+def test_expand_passes_files_through(tmp_path: pathlib.Path):
+    # Explicitly given files are not filtered, so that loading reports unreadable or missing files.
+    assert_that(
+        list(image_paths.expand(str(tmp_path / "missing.txt"), {"jpg"})), contains_exactly(tmp_path / "missing.txt")
+    )
+
+
+def test_read_path_list_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(image_paths, "_READ_SIZE", 3)
+    stream = io.BytesIO(b"first.jpg\0second path.jpg\0\0/abs/third.png")
+    assert_that(
+        list(image_paths.read_path_list(stream)), contains_exactly("first.jpg", "second path.jpg", "/abs/third.png")
+    )
+
+
+def test_from_arguments_reads_files_from_list(tmp_path: pathlib.Path):
+    _touch(tmp_path / "dir" / "a.jpg", tmp_path / "b.jpg", tmp_path / "c.png")
+    path_list = tmp_path / "list"
+    path_list.write_bytes(b"\0".join(bytes(path) for path in (tmp_path / "b.jpg", tmp_path / "c.png")))
+    args = Namespace([str(tmp_path / "dir")])
+    args.files_from = str(path_list)
+    args.extensions = ["jpg"]
+    assert_that(
+        list(image_paths.from_arguments(args)),
+        contains_exactly(tmp_path / "dir" / "a.jpg", tmp_path / "b.jpg", tmp_path / "c.png")
+    )
@@ -0,0 +1,99 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import os
+import pathlib
+
+from hamcrest import *
+
+from visual_image_splitter.model.journal import Journal
+
+SELECTIONS = [(0, 0, 10, 10), (10, 0, 20, 10)]
+
+
+def _record(tmp_path: pathlib.Path) -> (pathlib.Path, list, pathlib.Path):
+    source = tmp_path / "scan.png"
+    source.write_bytes(b"source")
+    outputs = [tmp_path / "scan_00001.png", tmp_path / "scan_00002.png"]
+    for output in outputs:
+        output.write_bytes(b"output")
+    journal_path = tmp_path / "journal.jsonl"
+    with Journal(journal_path, sync="never") as journal:
+        journal.record(source, SELECTIONS, outputs)
+    return source, outputs, journal_path
+
+
+def test_completed_outputs_after_record(tmp_path: pathlib.Path):
+    source, outputs, journal_path = _record(tmp_path)
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(equal_to(outputs)))
+        assert_that(journal.completed_outputs(source, SELECTIONS[:1]), is_(none()))
+        assert_that(journal.completed_outputs(tmp_path / "other.png", SELECTIONS), is_(none()))
+
+
+def test_without_resume_nothing_is_completed(tmp_path: pathlib.Path):
+    source, _, journal_path = _record(tmp_path)
+    with Journal(journal_path) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+
+
+def test_changed_source_invalidates_entry(tmp_path: pathlib.Path):
+    source, _, journal_path = _record(tmp_path)
+    source.write_bytes(b"changed source")
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+
+
+def test_changed_modification_time_invalidates_entry(tmp_path: pathlib.Path):
+    source, _, journal_path = _record(tmp_path)
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+
+
+def test_missing_or_truncated_output_invalidates_entry(tmp_path: pathlib.Path):
+    source, outputs, journal_path = _record(tmp_path)
+    outputs[0].write_bytes(b"out")
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+    outputs[0].write_bytes(b"output")
+    outputs[1].unlink()
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+
+
+def test_torn_last_line_is_ignored(tmp_path: pathlib.Path):
+    source, outputs, journal_path = _record(tmp_path)
+    with open(journal_path, "a", encoding="utf-8") as file:
+        file.write('{"source": "')
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(equal_to(outputs)))
+
+
+def test_disabled_journal(tmp_path: pathlib.Path):
+    source = tmp_path / "scan.png"
+    source.write_bytes(b"source")
+    with Journal(None, resume=True) as journal:
+        journal.record(source, SELECTIONS, [])
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(none()))
+
+
+def test_record_after_torn_line(tmp_path: pathlib.Path):
+    source, outputs, journal_path = _record(tmp_path)
+    journal_path.write_text('{"source": "')
+    with Journal(journal_path, sync="never") as journal:
+        journal.record(source, SELECTIONS, outputs)
+    with Journal(journal_path, resume=True) as journal:
+        assert_that(journal.completed_outputs(source, SELECTIONS), is_(equal_to(outputs)))
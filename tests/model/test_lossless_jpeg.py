@@ -0,0 +1,62 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter.model import lossless_jpeg
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.image import Image
+from tests.common import create_image_file
+
+
+@pytest.fixture()
+def without_jpegtran(monkeypatch):
+    monkeypatch.setattr(lossless_jpeg, "jpegtran_path", lambda: None)
+
+
+def test_png_can_not_be_cropped_losslessly(tmp_path: pathlib.Path):
+    assert_that(lossless_jpeg.can_crop_losslessly(create_image_file(tmp_path / "scan.png", 1600, 1000)), is_(False))
+
+
+def test_crop_without_jpegtran_raises(tmp_path: pathlib.Path, without_jpegtran):
+    path = create_image_file(tmp_path / "scan.jpg", 1600, 1000)
+    assert_that(lossless_jpeg.can_crop_losslessly(path), is_(False))
+    assert_that(calling(lossless_jpeg.crop).with_args(path, QRect(0, 0, 100, 100)), raises(RuntimeError))
+
+
+@pytest.mark.skipif(lossless_jpeg.jpegtran_path() is None, reason="jpegtran is not installed")
+def test_crop_expands_to_imcu_grid(tmp_path: pathlib.Path):
+    path = create_image_file(tmp_path / "scan.jpg", 1600, 1000)
+    cropped = QImage.fromData(lossless_jpeg.crop(path, QRect(20, 20, 300, 200)))
+    # The top left corner moves to the next grid position, at most 15 pixels up and left.
+    assert_that(cropped.width(), is_(all_of(greater_than_or_equal_to(300), less_than_or_equal_to(315))))
+    assert_that(cropped.height(), is_(all_of(greater_than_or_equal_to(200), less_than_or_equal_to(215))))
+
+
+def test_failed_lossless_crop_falls_back_to_re_encoding(tmp_path: pathlib.Path, monkeypatch, without_jpegtran):
+    monkeypatch.setattr(lossless_jpeg, "can_crop_losslessly", lambda path: True)
+    image = Image(create_image_file(tmp_path / "scan.jpg", 1600, 1000))
+    selection = Selection(Point(20, 20), Point(320, 220), image)
+    image.add_selection(selection)
+    image.write_output(lossless_jpeg=True)
+    output = QImage(image._get_output_file_name(1))
+    assert_that(output.size(), is_(equal_to(selection.as_qrect.size())))
@@ -0,0 +1,70 @@
+# Copyright (C) 2018 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from hamcrest import *
+
+from visual_image_splitter.model.lru_cache import LRUCache
+
+
+def create_cache(budget: int) -> LRUCache:
+    return LRUCache(budget, len)
+
+
+def test_get_returns_put_value():
+    cache = create_cache(10)
+    cache.put("a", b"12345")
+    assert_that(cache.get("a"), is_(equal_to(b"12345")))
+    assert_that(cache.get("b"), is_(none()))
+    assert_that(cache.hits, is_(equal_to(1)))
+    assert_that(cache.misses, is_(equal_to(1)))
+
+
+def test_least_recently_used_values_are_evicted():
+    cache = create_cache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.put("c", b"1234")
+    assert_that("a" in cache, is_(True))
+    assert_that("b" in cache, is_(False))
+    assert_that("c" in cache, is_(True))
+    assert_that(cache.total_size, is_(equal_to(8)))
+
+
+def test_peek_does_not_change_the_usage_order():
+    cache = create_cache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.peek("a")
+    cache.put("c", b"1234")
+    assert_that("a" in cache, is_(False))
+
+
+def test_replacing_a_value_updates_the_total_size():
+    cache = create_cache(10)
+    cache.put("a", b"1234")
+    cache.put("a", b"123456")
+    assert_that(cache.total_size, is_(equal_to(6)))
+    cache.remove("a")
+    assert_that(cache.total_size, is_(equal_to(0)))
+    assert_that(len(cache), is_(equal_to(0)))
+
+
+def test_values_larger_than_the_budget_are_not_cached():
+    cache = create_cache(4)
+    cache.put("a", b"1234")
+    cache.put("b", b"12345")
+    assert_that("a" in cache, is_(True))
+    assert_that("b" in cache, is_(False))
@@ -0,0 +1,94 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import pathlib
+
+from hamcrest import *
+
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.image import Image
+from visual_image_splitter.model import manifest
+from visual_image_splitter.model.encoder_settings import EncoderSettings, PRESETS
+from visual_image_splitter.model.manifest import ManifestRecord
+from tests.common import create_image_file
+
+
+def test_parse_resolves_relative_paths(tmp_path: pathlib.Path):
+    record = ManifestRecord.parse(
+        '{"source": "scans/a.tif", "output": "split", "selections": [[0, 0, 10, 20], [5, 5, 1, 1]]}', tmp_path
+    )
+    assert_that(record, is_(equal_to(ManifestRecord(
+        tmp_path / "scans" / "a.tif", tmp_path / "split", [(0, 0, 10, 20), (5, 5, 1, 1)]
+    ))))
+
+
+def test_parse_defaults_output_to_source_directory(tmp_path: pathlib.Path):
+    record = ManifestRecord.parse('{"source": "/data/a.tif"}', tmp_path)
+    assert_that(record, is_(equal_to(ManifestRecord(pathlib.Path("/data/a.tif"), pathlib.Path("/data"), []))))
+
+
+def test_reader_skips_invalid_lines(tmp_path: pathlib.Path):
+    path = tmp_path / "manifest.jsonl"
+    path.write_text(
+        '{"source": "a.png", "selections": [[0, 0, 1, 1]]}\n'
+        '\n'
+        'not json\n'
+        '{"source": "b.png", "selections": [[0, 0, 1]]}\n'
+        '{"source": "c.png", "selections": [[0, 0, 1.5, 1]]}\n'
+        '{"output": "d"}\n'
+        '{"source": "e.png"}\n'
+        '{"source": "f.png", "encoder": {"jpeg_quality": 200}}\n'
+    )
+    reader = manifest.read(str(path))
+    assert_that([record.source for record in reader], contains_exactly(tmp_path / "a.png", tmp_path / "e.png"))
+    assert_that(reader.invalid_lines, contains_exactly(3, 4, 5, 6, 8))
+
+
+def test_export_and_import_round_trip(tmp_path: pathlib.Path):
+    image = Image(create_image_file(tmp_path / "scan.png", 1000, 800))
+    image.output_path = tmp_path / "output"
+    image.add_selection(Selection(Point(0, 0), Point(400, 300), image))
+    image.add_selection(Selection(Point(1000, 800), Point(500, 400), image))
+    path = tmp_path / "manifest.jsonl"
+    manifest.write(path, [image])
+    imported = Image(tmp_path / "scan.png")
+    records = list(manifest.read(str(path)))
+    assert_that(records, has_length(1))
+    records[0].apply_to(imported)
+    assert_that(imported.output_path, is_(equal_to(tmp_path / "output")))
+    assert_that(
+        [(selection.top_left, selection.bottom_right) for selection in imported.selections],
+        contains_exactly((Point(0, 0), Point(400, 300)), (Point(500, 400), Point(1000, 800)))
+    )
+
+
+def test_per_image_encoder_settings(tmp_path: pathlib.Path):
+    record = ManifestRecord.parse('{"source": "a.jpg", "encoder": {"preset": "fast", "jpeg_quality": 50}}', tmp_path)
+    expected = PRESETS["fast"]._replace(jpeg_quality=50)
+    assert_that(record.encoder, is_(equal_to(expected)))
+    job = record.to_save_job("auto", False, EncoderSettings(jpeg_quality=90, jpeg_progressive=True), "never")
+    assert_that(job.encoder_settings, is_(equal_to(expected)))
+
+
+def test_per_image_encoder_settings_override_the_command_line(tmp_path: pathlib.Path):
+    record = ManifestRecord.parse('{"source": "a.png", "encoder": {"jpeg_quality": 50}}', tmp_path)
+    image = Image(create_image_file(tmp_path / "a.png", 10, 10))
+    image.encoder_settings = EncoderSettings(jpeg_quality=90, png_compression=9)
+    record.apply_to(image)
+    assert_that(image.encoder_settings, is_(equal_to(EncoderSettings(jpeg_quality=50, png_compression=9))))
+    # Only the settings of the image itself are exported.
+    exported = ManifestRecord.from_image(image).to_json()
+    assert_that(ManifestRecord.parse(exported, tmp_path).encoder, is_(equal_to(EncoderSettings(jpeg_quality=50))))
+    assert_that(ManifestRecord.parse('{"source": "b.png"}', tmp_path).to_json(), is_not(contains_string('"encoder"')))
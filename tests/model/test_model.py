@@ -0,0 +1,315 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import pathlib
+import threading
+import time
+import typing
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import Qt, QModelIndex, QtWarningMsg, qInstallMessageHandler
+from PyQt5.QtGui import QImage
+from PyQt5.QtTest import QAbstractItemModelTester, QTest
+
+from visual_image_splitter.model.image import Image, Columns as ImageColumns
+from visual_image_splitter.model.model import Model
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.selection_preset import SelectionPreset, SelectionPresetList
+from tests.common import Namespace, create_image_file
+
+IMAGE_COUNT = 10000
+
+
+@pytest.fixture
+def model(qapplication, request) -> Model:
+    # The number of jobs can be given using indirect parametrization.
+    model = Model(Namespace(jobs=getattr(request, "param", 1)))
+    # Let the delayed opening of the command line given images run, before the model is destroyed.
+    QTest.qWait(200)
+    yield model
+    model.prefetcher.shutdown()
+    model.worker_thread.requestInterruption()
+    model.worker_thread.quit()
+    model.worker_thread.wait()
+    model.image_enumerator_pool.shutdown(wait=True)
+    model.image_loader_pool.shutdown(wait=True)
+    model.image_writer_pool.shutdown(wait=True)
+    model.output_writer.close()
+
+
+@pytest.fixture
+def image_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / "scan.png"
+    image = QImage(200, 100, QImage.Format_RGB32)
+    image.fill(Qt.darkCyan)
+    image.save(str(path))
+    return path
+
+
+@pytest.fixture
+def qt_warnings() -> typing.List[str]:
+    """Collects the warnings logged by Qt, including the failures reported by QAbstractItemModelTester."""
+    warnings = []
+
+    def handler(message_type, context, message):
+        if message_type >= QtWarningMsg:
+            warnings.append(message)
+    qInstallMessageHandler(handler)
+    yield warnings
+    qInstallMessageHandler(None)
+
+
+def _insert_image(model: Model, path: pathlib.Path, preview: QImage) -> Image:
+    image = Image(path)
+    image.add_selections([
+        Selection(Point(0, 0), Point(100, 100), image), Selection(Point(100, 0), Point(200, 100), image)
+    ])
+    image.set_preview(preview)
+    model._insert_image(image)
+    return image
+
+
+def _assert_rows_are_consistent(model: Model):
+    for row, image in enumerate(model.images):
+        assert_that(image.row(), is_(equal_to(row)))
+        for selection_row, selection in enumerate(image.selections):
+            assert_that(selection.row(), is_(equal_to(selection_row)))
+
+
+def _change_model(model: Model, image_file: pathlib.Path, preview: QImage):
+    """Removes two images, adds a selection and inserts an image."""
+    model._remove_image(model.images[0])
+    model._remove_image(model.images[len(model.images) // 2])
+    image_index = model.index(5, ImageColumns.IMAGE)
+    model.add_selection(image_index, Selection(Point(10, 10), Point(20, 20), model.images[5]))
+    _insert_image(model, image_file, preview)
+    assert_that(model.rowCount(image_index), is_(equal_to(3)))
+    assert_that(model.rowCount(image_index.sibling(5, ImageColumns.IMAGE_PATH)), is_(equal_to(0)))
+
+
+def test_model_passes_model_tester_while_changing(model: Model, image_file: pathlib.Path, qt_warnings: list):
+    preview = QImage(str(image_file))
+    # The tester checks the whole model after each change.
+    tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning)
+    for _ in range(20):
+        _insert_image(model, image_file, preview)
+    _change_model(model, image_file, preview)
+    assert_that(qt_warnings, is_(empty()))
+    assert_that(model.rowCount(), is_(equal_to(19)))
+    _assert_rows_are_consistent(model)
+    del tester
+
+
+def test_model_with_many_images_passes_model_tester(model: Model, image_file: pathlib.Path, qt_warnings: list):
+    """Looking up rows is constant time. Otherwise, checking all parent indices takes minutes."""
+    preview = QImage(str(image_file))
+    for _ in range(IMAGE_COUNT):
+        _insert_image(model, image_file, preview)
+    _change_model(model, image_file, preview)
+    # Creating the tester checks the whole model once.
+    tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning)
+    assert_that(qt_warnings, is_(empty()))
+    assert_that(model.rowCount(), is_(equal_to(IMAGE_COUNT - 1)))
+    _assert_rows_are_consistent(model)
+    del tester
+
+
+def test_parent_of_selection(model: Model, image_file: pathlib.Path):
+    preview = QImage(str(image_file))
+    images = [_insert_image(model, image_file, preview) for _ in range(3)]
+    selection_index = model.index(1, 0, model.index(2, 0))
+    assert_that(selection_index.internalPointer(), is_(same_instance(images[2].selections[1])))
+    assert_that(model.parent(selection_index).row(), is_(equal_to(2)))
+    assert_that(model.parent(selection_index).internalPointer(), is_(same_instance(images[2])))
+    images[2].remove_selection(0)
+    assert_that(images[2].selections[0].row(), is_(equal_to(0)))
+    assert_that(model.parent(model.index(0, 0, QModelIndex())), is_(equal_to(QModelIndex())))
+
+
+def test_preview_loaded_notifies_views_of_open_images_only(model: Model, image_file: pathlib.Path):
+    preview = QImage(str(image_file))
+    images = [_insert_image(model, image_file, preview) for _ in range(3)]
+    changed_rows = []
+    model.dataChanged.connect(lambda top_left, bottom_right: changed_rows.append(top_left.row()))
+    model._on_image_preview_loaded(images[2])
+    model._on_image_preview_loaded(Image(image_file))
+    assert_that(changed_rows, contains_exactly(2, 0))
+
+
+def test_outdated_row_is_found(model: Model, image_file: pathlib.Path):
+    preview = QImage(str(image_file))
+    images = [_insert_image(model, image_file, preview) for _ in range(3)]
+    images[2].cached_row = 0
+    assert_that(images[2].row(), is_(equal_to(2)))
+    assert_that(images[2].cached_row, is_(equal_to(2)))
+
+
+def test_loaded_images_are_inserted_in_one_batch(model: Model, image_file: pathlib.Path):
+    preview = QImage(str(image_file))
+    images = [Image(image_file) for _ in range(50)]
+    for image in images:
+        image.set_preview(preview)
+    inserted_rows = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted_rows.append((first, last)))
+    loader = threading.Thread(target=lambda: [model._queue_for_insertion(image) for image in images])
+    loader.start()
+    loader.join()
+    assert_that(model.images, is_(empty()))
+    QTest.qWait(50)
+    assert_that(inserted_rows, contains_exactly((0, 49)))
+    assert_that(model.images, contains_exactly(*[same_instance(image) for image in images]))
+    _assert_rows_are_consistent(model)
+
+
+def test_image_removed_by_other_thread_is_removed_by_gui_thread(model: Model, image_file: pathlib.Path):
+    preview = QImage(str(image_file))
+    images = [_insert_image(model, image_file, preview) for _ in range(3)]
+    remover = threading.Thread(target=lambda: [model._remove_image(images[1]), model._remove_image(images[1])])
+    remover.start()
+    remover.join()
+    assert_that(model.images, has_length(3))
+    QTest.qWait(50)
+    assert_that(model.images, contains_exactly(same_instance(images[0]), same_instance(images[2])))
+    _assert_rows_are_consistent(model)
+
+
+def _create_images(tmp_path: pathlib.Path, count: int) -> typing.List[pathlib.Path]:
+    return [create_image_file(tmp_path / f"scan_{number}.png", 20 + number, 10, Qt.white) for number in range(count)]
+
+
+def _wait_for_rows(model: Model, count: int):
+    for _ in range(100):
+        if model.rowCount() >= count:
+            break
+        QTest.qWait(20)
+    QTest.qWait(20)
+
+
+def test_opened_images_are_fetched_on_demand(model: Model, tmp_path: pathlib.Path):
+    paths = _create_images(tmp_path, 10)
+    model.FETCH_COUNT = 4
+    model._open_images(paths)
+    _wait_for_rows(model, 4)
+    assert_that(model.rowCount(), is_(equal_to(4)))
+    assert_that(model.canFetchMore(QModelIndex()), is_(True))
+    model.fetchMore(QModelIndex())
+    model.fetchMore(QModelIndex())
+    _wait_for_rows(model, 10)
+    assert_that([image.image_path for image in model.images], contains_exactly(*paths))
+    assert_that(model.canFetchMore(QModelIndex()), is_(False))
+    _assert_rows_are_consistent(model)
+
+
+@pytest.mark.parametrize("model", [4], indirect=True)
+def test_concurrently_opened_images_keep_the_given_order(model: Model, tmp_path: pathlib.Path):
+    paths = _create_images(tmp_path, 20)
+    model._open_images(paths)
+    _wait_for_rows(model, 20)
+    assert_that([image.image_path for image in model.images], contains_exactly(*paths))
+    _assert_rows_are_consistent(model)
+
+
+@pytest.mark.parametrize("model", [4], indirect=True)
+def test_unreadable_images_are_skipped(model: Model, tmp_path: pathlib.Path):
+    paths = _create_images(tmp_path, 6)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"This is not a PNG file")
+    model._open_images(paths[:3] + [broken] + paths[3:])
+    _wait_for_rows(model, 6)
+    assert_that([image.image_path for image in model.images], contains_exactly(*paths))
+    _assert_rows_are_consistent(model)
+
+
+def test_images_are_fetched_while_enumerating(model: Model, tmp_path: pathlib.Path):
+    paths = _create_images(tmp_path, 3)
+    enumeration_finished = threading.Event()
+
+    def slow_enumeration():
+        yield from paths
+        time.sleep(2)
+        enumeration_finished.set()
+
+    model._open_images(slow_enumeration())
+    _wait_for_rows(model, 3)
+    assert_that(enumeration_finished.is_set(), is_(False))
+    assert_that([image.image_path for image in model.images], contains_exactly(*paths))
+    model._enumeration.result()
+
+
+def test_export_manifest_includes_unfetched_images(model: Model, image_file: pathlib.Path, tmp_path: pathlib.Path):
+    model.FETCH_COUNT = 1
+    model._open_images([image_file] * 3)
+    _wait_for_rows(model, 1)
+    manifest_path = tmp_path / "manifest.jsonl"
+    exported = []
+    model.manifest_exported.connect(lambda path, count: exported.append((path, count)))
+    model._export_manifest(str(manifest_path))
+    assert_that(exported, contains_exactly((str(manifest_path), 3)))
+    assert_that(manifest_path.read_text().splitlines(), has_length(3))
+    assert_that(model.rowCount(), is_(equal_to(1)))
+
+
+def test_export_manifest_reports_failure(model: Model, tmp_path: pathlib.Path):
+    failures = []
+    model.manifest_export_failed.connect(lambda path, error: failures.append(path))
+    manifest_path = str(tmp_path / "missing" / "manifest.jsonl")
+    model._export_manifest(manifest_path)
+    assert_that(failures, contains_exactly(manifest_path))
+
+
+def test_save_all_writes_unfetched_images_in_chunks(model: Model, tmp_path: pathlib.Path):
+    model.args.save_strategy = "pipeline"
+    model.FETCH_COUNT = 2
+    model.predefined_selections = SelectionPresetList([SelectionPreset("0", "0", "10", "10")])
+    paths = _create_images(tmp_path, 5)
+    model._open_images(paths)
+    _wait_for_rows(model, 2)
+    progress = []
+    model.save_and_close_all_progress.connect(lambda finished, total: progress.append((finished, total)))
+    model._save_and_close_all_images()
+    assert_that(progress[-1], is_(equal_to((5, 5))))
+    assert_that(sorted(tmp_path.iterdir()), has_length(10))  # One output file per source image
+    assert_that(model.canFetchMore(QModelIndex()), is_(False))
+    QTest.qWait(50)
+    assert_that(model.images, is_(empty()))
+
+
+def test_image_data_is_cached(image_file: pathlib.Path):
+    image = Image(image_file)
+    output_path = image.data(ImageColumns.OUTPUT_PATH, Qt.DisplayRole)
+    assert_that(image.data(ImageColumns.OUTPUT_PATH, Qt.DisplayRole), is_(same_instance(output_path)))
+    assert_that(output_path.value(), is_(equal_to(str(image_file.parent))))
+    image.output_path = pathlib.Path("/other")
+    assert_that(image.data(ImageColumns.OUTPUT_PATH, Qt.DisplayRole).value(), is_(equal_to("/other")))
+    assert_that(image.data(ImageColumns.IMAGE, Qt.UserRole).value(), is_(same_instance(image)))
+
+
+def test_selection_display_data_follows_points():
+    selection = Selection(Point(0, 0), Point(10, 10))
+    assert_that(selection.data(1, Qt.DisplayRole).value(), is_(equal_to(str(Point(0, 0)))))
+    selection.top_left = Point(5, 5)
+    assert_that(selection.data(1, Qt.DisplayRole).value(), is_(equal_to(str(Point(5, 5)))))
+
+
+def test_interrupted_save_all_using_the_pipeline_does_not_finish(model: Model, image_file: pathlib.Path):
+    model.args.save_strategy = "pipeline"
+    _insert_image(model, image_file, QImage(str(image_file)))
+    finished = []
+    model.save_and_close_all_finished.connect(lambda: finished.append(True))
+    model.worker_thread.requestInterruption()
+    model._save_and_close_all_images()
+    assert_that(finished, is_(empty()))
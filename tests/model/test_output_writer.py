@@ -0,0 +1,66 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from visual_image_splitter.model.output_writer import OutputWriter, SYNC_MODES, write_file_atomically
+
+
+@pytest.mark.parametrize("sync", SYNC_MODES)
+def test_output_writer_commits_all_files(tmp_path: pathlib.Path, sync: str):
+    with OutputWriter(sync) as writer:
+        commits = [writer.submit(tmp_path / f"output_{index}.bin", bytes([index]) * 1000) for index in range(20)]
+    assert_that([commit.result() for commit in commits], contains_exactly(
+        *(tmp_path / f"output_{index}.bin" for index in range(20))
+    ))
+    for index in range(20):
+        assert_that((tmp_path / f"output_{index}.bin").read_bytes(), is_(equal_to(bytes([index]) * 1000)))
+    assert_that(list(tmp_path.glob(".*.tmp")), is_(empty()))
+    assert_that(writer.statistics().files, is_(equal_to(20)))
+
+
+def test_failed_write_keeps_existing_file(tmp_path: pathlib.Path):
+    output = tmp_path / "missing_directory" / "output.bin"
+    with OutputWriter("file") as writer:
+        commit = writer.submit(output, b"content")
+    assert_that(calling(commit.result), raises(OSError))
+    assert_that(output.exists(), is_(False))
+
+
+@pytest.mark.parametrize("sync", SYNC_MODES)
+def test_failed_rename_removes_temporary_file(tmp_path: pathlib.Path, sync: str):
+    # Renaming a file onto a non-empty directory fails
+    output = tmp_path / "output.bin"
+    output.mkdir()
+    (output / "content").write_bytes(b"")
+    with OutputWriter(sync) as writer:
+        commit = writer.submit(output, b"content")
+    assert_that(calling(commit.result), raises(OSError))
+    assert_that(list(tmp_path.glob(".*.tmp")), is_(empty()))
+
+
+def test_write_file_atomically_replaces_existing_file(tmp_path: pathlib.Path):
+    output = tmp_path / "output.bin"
+    output.write_bytes(b"old")
+    write_file_atomically(output, b"new content", "file")
+    assert_that(output.read_bytes(), is_(equal_to(b"new content")))
+    assert_that(list(tmp_path.iterdir()), contains_exactly(output))
+
+
+def test_invalid_sync_mode():
+    assert_that(calling(OutputWriter).with_args("always"), raises(ValueError))
@@ -0,0 +1,81 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from visual_image_splitter.model import photo_detection
+from visual_image_splitter.model.image import Image
+
+pytestmark = pytest.mark.skipif(not photo_detection.is_available(), reason="Photo detection requires NumPy")
+
+PHOTOS = [QRect(40, 40, 300, 200), QRect(420, 50, 320, 220), QRect(60, 400, 260, 380)]
+
+
+def _create_scan(width: int = 800, height: int = 1000, photos=PHOTOS) -> QImage:
+    scan = QImage(width, height, QImage.Format_RGB32)
+    scan.fill(QColor(245, 245, 240))
+    painter = QPainter(scan)
+    for photo in photos:
+        painter.fillRect(photo, QColor(90, 60, 40))
+        # A bright area inside a photo must not split it.
+        painter.fillRect(photo.adjusted(photo.width() // 4, 20, -photo.width() // 4, -20), QColor(245, 245, 240))
+    # Dust
+    painter.fillRect(QRect(600, 700, 3, 3), Qt.black)
+    painter.end()
+    return scan
+
+
+def _assert_close_to(actual: QRect, expected: QRect, tolerance: int = photo_detection.CELL_SIZE):
+    for getter in (QRect.left, QRect.top, QRect.right, QRect.bottom):
+        assert_that(getter(actual), is_(close_to(getter(expected), tolerance)), f"{actual} != {expected}")
+
+
+def test_find_photos():
+    photos = photo_detection.find_photos(_create_scan())
+    assert_that(photos, has_length(3))
+    for actual, expected in zip(photos, PHOTOS):
+        _assert_close_to(actual, expected)
+
+
+def test_find_photos_on_empty_page():
+    assert_that(photo_detection.find_photos(_create_scan(photos=[])), is_(empty()))
+
+
+def test_find_photos_uses_reading_order():
+    # The right photo starts slightly above the left photo in the same line
+    photos = [QRect(420, 60, 300, 200), QRect(40, 50, 300, 200), QRect(40, 500, 300, 200)]
+    detected = photo_detection.find_photos(_create_scan(photos=photos))
+    assert_that(detected, has_length(3))
+    for actual, expected in zip(detected, [photos[1], photos[0], photos[2]]):
+        _assert_close_to(actual, expected)
+
+
+def test_detect_photos_scales_to_full_resolution(tmp_path: pathlib.Path):
+    path = tmp_path / "scan.png"
+    _create_scan(1600, 2000, [QRect(photo.topLeft() * 2, photo.size() * 2) for photo in PHOTOS]).save(str(path))
+    image = Image(path)
+    low_resolution_image = image.read_preview()
+    assert_that(low_resolution_image.width(), is_(less_than(image.width)))
+    selections = photo_detection.detect_photos(image, low_resolution_image)
+    assert_that(selections, has_length(3))
+    # The preview is 2.5 times smaller, so are the cells.
+    for selection, photo in zip(selections, PHOTOS):
+        expected = QRect(photo.topLeft() * 2, photo.size() * 2)
+        _assert_close_to(selection.as_qrect, expected, 3 * photo_detection.CELL_SIZE)
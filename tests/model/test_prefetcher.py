@@ -0,0 +1,162 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+import pathlib
+import threading
+import typing
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+
+from visual_image_splitter.model.image import Image, create_encoded_data_cache
+from visual_image_splitter.model.prefetcher import Prefetcher
+from tests.common import create_image_file
+
+IMAGE_COUNT = 10
+
+
+class MockImage:
+    """Records the prefetched rows instead of reading files."""
+
+    def __init__(self, row: int, loaded: typing.List[typing.Tuple[str, int]], blocker: threading.Event = None):
+        self.row = row
+        self.image_path = pathlib.Path(f"scan_{row}.png")
+        self.loaded = loaded
+        self.blocker = blocker
+        self.started = threading.Event()
+
+    def load_encoded_data(self):
+        self._load("encoded")
+
+    def load_image_data(self):
+        self._load("decoded")
+
+    def _load(self, kind: str):
+        self.started.set()
+        if self.blocker is not None:
+            self.blocker.wait(10)
+        self.loaded.append((kind, self.row))
+
+
+class MockModel:
+
+    def __init__(self, images: list):
+        self.images = images
+        # Provides the model indices passed to the Prefetcher. Each row has a child, like the selections of an image.
+        self.item_model = QStandardItemModel()
+        for _ in images:
+            item = QStandardItem()
+            item.appendRow(QStandardItem())
+            self.item_model.appendRow(item)
+
+    def index(self, row: int) -> QModelIndex:
+        return self.item_model.index(row, 0)
+
+
+@pytest.fixture
+def loaded() -> typing.List[typing.Tuple[str, int]]:
+    return []
+
+
+@pytest.fixture
+def model(loaded: list) -> MockModel:
+    return MockModel([MockImage(row, loaded) for row in range(IMAGE_COUNT)])
+
+
+def _finish(prefetcher: Prefetcher):
+    """Waits for the pending work. Prefetcher.shutdown() discards it."""
+    concurrent.futures.wait(prefetcher._pending)
+    prefetcher.shutdown()
+
+
+def _prefetch(model: MockModel, current: int, previous: typing.Optional[int], count: int = 2, decode: bool = False):
+    prefetcher = Prefetcher(model, count, decode)
+    prefetcher.on_active_image_changed(
+        model.index(current), QModelIndex() if previous is None else model.index(previous)
+    )
+    _finish(prefetcher)
+
+
+@pytest.mark.parametrize("current, previous, expected_rows", [
+    (3, None, [3, 4, 5]),
+    (3, 2, [3, 4, 5]),
+    (3, 5, [3, 2, 1]),
+    (1, 2, [1, 0]),
+    (8, 7, [8, 9]),
+])
+def test_prefetches_in_navigation_direction(model: MockModel, loaded: list, current: int, previous: int,
+                                            expected_rows: typing.List[int]):
+    _prefetch(model, current, previous)
+    assert_that(loaded, contains_exactly(*[("encoded", row) for row in expected_rows]))
+
+
+def test_decodes_prefetched_images(model: MockModel, loaded: list):
+    _prefetch(model, 0, None, count=1, decode=True)
+    assert_that(loaded, contains_exactly(("decoded", 0), ("decoded", 1)))
+
+
+def test_disabled_prefetching(model: MockModel, loaded: list):
+    _prefetch(model, 3, None, count=0)
+    assert_that(loaded, is_(empty()))
+
+
+def test_selections_are_not_prefetched(model: MockModel, loaded: list):
+    prefetcher = Prefetcher(model, 2, False)
+    prefetcher.on_active_image_changed(model.item_model.index(0, 0, model.index(3)), QModelIndex())
+    prefetcher.shutdown()
+    assert_that(loaded, is_(empty()))
+
+
+def test_stale_work_is_discarded(model: MockModel, loaded: list):
+    blocker = threading.Event()
+    model.images[0].blocker = blocker
+    prefetcher = Prefetcher(model, 2, False)
+    prefetcher.on_active_image_changed(model.index(0), QModelIndex())
+    assert_that(model.images[0].started.wait(10), is_(True))
+    # Rows 1 and 2 did not start yet, so they are cancelled. The running job for row 0 finishes.
+    prefetcher.on_active_image_changed(model.index(6), model.index(5))
+    blocker.set()
+    _finish(prefetcher)
+    assert_that(loaded, contains_exactly(("encoded", 0), ("encoded", 6), ("encoded", 7), ("encoded", 8)))
+
+
+def test_jobs_of_older_generations_are_skipped(model: MockModel, loaded: list):
+    prefetcher = Prefetcher(model, 2, False)
+    generation = prefetcher._generation
+    prefetcher._cancel_pending()
+    # Simulates a job that could not be cancelled, because it was just starting.
+    prefetcher._prefetch(model.images[0], generation)
+    prefetcher._prefetch(model.images[1], prefetcher._generation)
+    prefetcher.shutdown()
+    assert_that(loaded, contains_exactly(("encoded", 1)))
+
+
+def test_prefetched_data_is_bounded_by_the_cache_budget(qapplication, tmp_path: pathlib.Path):
+    encoded_data_cache = create_encoded_data_cache(2**20)
+    images = []
+    for row in range(IMAGE_COUNT):
+        # Uncompressed, so only a few fit into the budget
+        path = create_image_file(tmp_path / f"scan_{row}.bmp", 300, 300)
+        images.append(Image(path, encoded_data_cache=encoded_data_cache))
+    model = MockModel(images)
+    _prefetch(model, 0, None, count=4)
+    assert_that(encoded_data_cache.total_size, is_(less_than_or_equal_to(2**20)))
+    # The least recently used, first prefetched images were dropped.
+    assert_that(images[4].image_path in encoded_data_cache, is_(True))
+    assert_that(images[0].image_path in encoded_data_cache, is_(False))
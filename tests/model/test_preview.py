@@ -0,0 +1,56 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImageReader
+
+from visual_image_splitter.model import preview
+from tests.common import create_image_file
+
+
+def test_preview_size_keeps_aspect_ratio():
+    assert_that(preview.preview_size(1600, 1000), is_(equal_to(QSize(800, 500))))
+    assert_that(preview.preview_size(100, 50), is_(equal_to(QSize(100, 50))))
+
+
+@pytest.mark.parametrize("suffix", [
+    "jpg",  # Decoded directly at the reduced size
+    "png",  # The format handler decodes the full image and scales it internally
+])
+def test_read_reduced_size_preview(tmp_path: pathlib.Path, suffix: str):
+    reader = QImageReader(str(create_image_file(tmp_path / f"scan.{suffix}", 1600, 1000)))
+    result = preview.read_reduced_size_preview(reader, preview.preview_size(1600, 1000))
+    assert_that(result.size(), is_(equal_to(QSize(800, 500))))
+
+
+def test_unsupported_format_requires_full_decode(tmp_path: pathlib.Path):
+    path = create_image_file(tmp_path / "scan.bmp", 1600, 1000)
+    assert_that(preview.read_reduced_size_preview(QImageReader(str(path)), QSize(800, 500)), is_(none()))
+    full_image = QImageReader(str(path)).read()
+    assert_that(preview.scale_to_preview(full_image).size(), is_(equal_to(QSize(800, 500))))
+
+
+def test_failing_reader_returns_none(tmp_path: pathlib.Path):
+    path = create_image_file(tmp_path / "scan.jpg", 1600, 1000)
+    # Keeps the header, so the format is detected, but decoding fails.
+    path.write_bytes(path.read_bytes()[:300])
+    reader = QImageReader(str(path))
+    assert_that(preview.supports_reduced_size_decoding(reader), is_(True))
+    assert_that(preview.read_reduced_size_preview(reader, QSize(800, 500)), is_(none()))
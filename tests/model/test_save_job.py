@@ -0,0 +1,51 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+
+from hamcrest import *
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.image import Image
+from visual_image_splitter.model import save_job
+from tests.common import create_image_file
+
+
+def test_schedule_orders_largest_files_first(tmp_path: pathlib.Path):
+    small = Image(create_image_file(tmp_path / "small.png", 100, 100))
+    large = Image(create_image_file(tmp_path / "large.png", 1000, 1000))
+    medium = Image(create_image_file(tmp_path / "medium.png", 500, 500))
+    assert_that(save_job.schedule([small, large, medium]), contains_exactly(large, medium, small))
+
+
+def test_run_in_process_pool(tmp_path: pathlib.Path):
+    image = Image(create_image_file(tmp_path / "scan.png", 1000, 800))
+    image.add_selection(Selection(Point(0, 0), Point(400, 300), image))
+    image.add_selection(Selection(Point(500, 400), Point(1000, 800), image))
+    output_path = tmp_path / "output"
+    output_path.mkdir()
+    image.output_path = output_path
+    job = save_job.SaveJob.from_image(image, "auto", False)
+    with save_job.create_process_pool(1) as process_pool:
+        assert_that(
+            process_pool.submit(save_job.run, job).result(),
+            contains_exactly(output_path / "scan_00001.png", output_path / "scan_00002.png")
+        )
+    assert_that(QImage(str(output_path / "scan_00001.png")).size(), is_(equal_to(QSize(400, 300))))
+    assert_that(QImage(str(output_path / "scan_00002.png")).size(), is_(equal_to(QSize(500, 400))))
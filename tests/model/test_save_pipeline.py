@@ -0,0 +1,85 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pathlib
+
+from hamcrest import *
+
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter.model.point import Point
+from visual_image_splitter.model.selection import Selection
+from visual_image_splitter.model.image import Image
+from visual_image_splitter.model.save_pipeline import SavePipeline
+from tests.common import create_image_file
+
+
+def _create_image(path: pathlib.Path, selection_count: int) -> Image:
+    image = Image(create_image_file(path))
+    for index in range(selection_count):
+        image.add_selection(Selection(Point(10 * index, 0), Point(10 * index + 100, 200 + index), image))
+    return image
+
+
+def test_pipeline_writes_all_images(tmp_path: pathlib.Path):
+    images = [_create_image(tmp_path / f"scan_{index}.{suffix}", 3) for index, suffix in enumerate(["jpg", "png"] * 3)]
+    pipeline = SavePipeline(images, threads=2)
+    results = list(pipeline.results())
+    assert_that([result.error for result in results], only_contains(none()))
+    assert_that([result.image for result in results], contains_inanyorder(*images))
+    for image in images:
+        for index, selection in enumerate(image.selections, start=1):
+            output = QImage(image._get_output_file_name(index))
+            assert_that(output.size(), is_(equal_to(selection.as_qrect.size())))
+    statistics = {stage.name: stage for stage in pipeline.statistics()}
+    assert_that(statistics["read"].processed, is_(equal_to(6)))
+    assert_that(statistics["write"].processed, is_(equal_to(18)))
+    assert_that(statistics["decode"].max_queue_depth, is_(less_than_or_equal_to(statistics["decode"].queue_size)))
+
+
+def test_pipeline_reports_unreadable_images(tmp_path: pathlib.Path):
+    image = _create_image(tmp_path / "scan.png", 2)
+    readable = _create_image(tmp_path / "readable.png", 1)
+    image.image_path.write_bytes(b"not an image")
+    results = list(SavePipeline([image, readable], threads=1).results())
+    assert_that(results, has_length(2))
+    errors = {result.image.image_path.name: result.error for result in results}
+    assert_that(errors, has_entries({"scan.png": not_none(), "readable.png": none()}))
+
+
+def test_pipeline_interruption(tmp_path: pathlib.Path):
+    images = [_create_image(tmp_path / f"scan_{index}.png", 2) for index in range(3)]
+    results = list(SavePipeline(images, threads=1, is_interruption_requested=lambda: True).results())
+    assert_that(results, is_(empty()))
+    assert_that(list(tmp_path.glob("scan_*_*")), is_(empty()))
+
+
+def test_pipeline_reports_unexpected_stage_errors(tmp_path: pathlib.Path):
+    image = _create_image(tmp_path / "scan.png", 2)
+    other = _create_image(tmp_path / "other.png", 1)
+
+    def fail_encoding(content: QImage):
+        raise ValueError("Unexpected")
+    image.encode = fail_encoding
+    results = list(SavePipeline([image, other], threads=1).results())
+    assert_that(results, has_length(2))
+    errors = {result.image.image_path.name: result.error for result in results}
+    assert_that(errors, has_entries({"scan.png": equal_to("Unexpected"), "other.png": none()}))
+
+
+def test_pipeline_reports_images_without_selections(tmp_path: pathlib.Path):
+    image = _create_image(tmp_path / "scan.png", 0)
+    results = list(SavePipeline([image], threads=1).results())
+    assert_that(results, contains_exactly(has_properties(image=same_instance(image), error=none(), outputs=empty())))
@@ -78,3 +78,9 @@ def test_q_rectf_conversion(input_points: RectangleData, expected: RectangleData
     assert_that(q_rectangle.topLeft().y(), is_(equal_to(expected.point1.y)))
     assert_that(q_rectangle.bottomRight().x(), is_(equal_to(expected.point2.x)))
     assert_that(q_rectangle.bottomRight().y(), is_(equal_to(expected.point2.y)))
+
+
+def test_from_normalized_points_matches_constructor():
+    created = Selection(Point(5, 10), Point(20, 40))
+    from_points = Selection.from_normalized_points(Point(5, 10), Point(20, 40))
+    assert_that(vars(from_points), is_(equal_to(vars(created))))
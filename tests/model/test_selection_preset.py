@@ -18,13 +18,17 @@ from hamcrest import *
 
 from visual_image_splitter.model.point import Point
 from visual_image_splitter.model.selection import Selection
-from visual_image_splitter.model.selection_preset import SelectionPreset
+from visual_image_splitter.model.selection_preset import SelectionPreset, SelectionPresetList
 
 
 class MockImage:
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
+        self.selections = []
+
+    def add_selections(self, selections):
+        self.selections += selections
 
 
 def rectangle(x1: int, y1: int, x2: int, y2: int) -> Selection:
@@ -64,3 +68,28 @@ def test_selection_preset_to_rectangle_conversion(selection, image, expected_rec
     result = selection.to_rectangle(image)
     assert_that(result.top_left, is_(equal_to(expected_rectangle.top_left)))
     assert_that(result.bottom_right, is_(equal_to(expected_rectangle.bottom_right)))
+
+
+@pytest.mark.parametrize("selection, image, expected_rectangle",
+                         generate_selection_preset_to_rectangle_conversion_test_cases())
+def test_selection_preset_list_matches_to_rectangle(selection, image, expected_rectangle):
+    SelectionPresetList([selection]).apply_to(image)
+    assert_that(image.selections, has_length(1))
+    result = image.selections[0]
+    assert_that(result.top_left, is_(equal_to(expected_rectangle.top_left)))
+    assert_that(result.bottom_right, is_(equal_to(expected_rectangle.bottom_right)))
+    assert_that(result.parent(), is_(same_instance(image)))
+
+
+def test_selection_preset_list_caches_per_image_size():
+    presets = SelectionPresetList([
+        SelectionPreset("0", "0", "50%", "100%"), SelectionPreset("50%", "0", "100%", "100%")
+    ])
+    first, second, other = MockImage(1000, 800), MockImage(1000, 800), MockImage(500, 400)
+    for image in (first, second, other):
+        presets.apply_to(image)
+    assert_that(presets.points(1000, 800), is_(same_instance(presets.points(1000, 800))))
+    assert_that([selection.as_qrect for selection in second.selections],
+                is_(equal_to([selection.as_qrect for selection in first.selections])))
+    assert_that(second.selections[0], is_(not_(same_instance(first.selections[0]))))
+    assert_that(other.selections[1].bottom_right, is_(equal_to(Point(500, 400))))
@@ -0,0 +1,132 @@
+# Copyright (C) 2018 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage, QImageReader
+
+from visual_image_splitter.model.thumbnail_cache import ThumbnailCache
+
+
+def create_source_file(path: pathlib.Path) -> pathlib.Path:
+    path.write_bytes(b"Source file content. Not read by the cache.")
+    return path
+
+
+def create_thumbnail(color=Qt.red) -> QImage:
+    thumbnail = QImage(80, 60, QImage.Format_RGB32)
+    thumbnail.fill(color)
+    return thumbnail
+
+
+@pytest.mark.parametrize("freedesktop", [False, True])
+def test_store_and_load(tmp_path: pathlib.Path, freedesktop: bool):
+    source = create_source_file(tmp_path / "scan.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 2**20, freedesktop)
+    assert_that(cache.load(source, QSize(80, 60)), is_(none()))
+    cache.store(source, create_thumbnail())
+    # A new instance simulates a program restart
+    cache = ThumbnailCache(tmp_path / "cache", 2**20, freedesktop)
+    thumbnail = cache.load(source, QSize(80, 60))
+    assert_that(thumbnail, is_(not_none()))
+    assert_that(thumbnail.pixelColor(0, 0).red(), is_(equal_to(255)))
+    assert_that(cache.hits, is_(equal_to(1)))
+    assert_that(cache.misses, is_(equal_to(0)))
+
+
+@pytest.mark.parametrize("freedesktop", [False, True])
+def test_modified_source_is_a_miss(tmp_path: pathlib.Path, freedesktop: bool):
+    source = create_source_file(tmp_path / "scan.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 2**20, freedesktop)
+    cache.store(source, create_thumbnail())
+    source_stat = source.stat()
+    os.utime(source, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns + 5 * 10**9))
+    assert_that(cache.load(source, QSize(80, 60)), is_(none()))
+    assert_that(cache.misses, is_(equal_to(1)))
+
+
+def test_different_preview_size_is_a_miss(tmp_path: pathlib.Path):
+    source = create_source_file(tmp_path / "scan.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 2**20)
+    cache.store(source, create_thumbnail())
+    assert_that(cache.load(source, QSize(800, 600)), is_(none()))
+
+
+def test_freedesktop_entry_metadata(tmp_path: pathlib.Path):
+    source = create_source_file(tmp_path / "scan.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 2**20, freedesktop=True)
+    cache.store(source, create_thumbnail())
+    entries = list((tmp_path / "cache").iterdir())
+    assert_that(entries, has_length(1))
+    entry = QImageReader(str(entries[0])).read()
+    assert_that(entry.text("Thumb::URI"), is_(equal_to(source.resolve().as_uri())))
+    assert_that(entry.text("Thumb::MTime"), is_(equal_to(str(int(source.stat().st_mtime)))))
+    assert_that(entry.text("Thumb::Size"), is_(equal_to(str(source.stat().st_size))))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: pathlib.Path):
+    sources = [create_source_file(tmp_path / f"scan_{index}.jpg") for index in range(3)]
+    cache = ThumbnailCache(tmp_path / "cache", 2**20)
+    cache.store(sources[0], create_thumbnail())
+    entry_size = next((tmp_path / "cache").iterdir()).stat().st_size
+    cache.size_limit = 2 * entry_size
+    cache.store(sources[1], create_thumbnail())
+    cache.load(sources[0], QSize(80, 60))  # Marks the first entry as recently used
+    cache.store(sources[2], create_thumbnail())
+    assert_that(cache.load(sources[0], QSize(80, 60)), is_(not_none()))
+    assert_that(cache.load(sources[1], QSize(80, 60)), is_(none()))
+    assert_that(cache.load(sources[2], QSize(80, 60)), is_(not_none()))
+
+
+def _write_foreign_thumbnail(cache: ThumbnailCache, source: pathlib.Path, name: str = None) -> pathlib.Path:
+    thumbnail = create_thumbnail(Qt.blue).scaled(1024, 768)
+    thumbnail.setText("Thumb::MTime", str(int(source.stat().st_mtime)))
+    thumbnail.setText("Software", "file manager")
+    path = cache.cache_directory / (name or cache._entry_name(source, source.stat()))
+    thumbnail.save(str(path), "png")
+    return path
+
+
+def test_freedesktop_entries_of_other_programs_are_kept(tmp_path: pathlib.Path):
+    source = create_source_file(tmp_path / "scan.jpg")
+    other_source = create_source_file(tmp_path / "other.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 1, True)
+    foreign_entry = _write_foreign_thumbnail(cache, source)
+    unrelated_entry = _write_foreign_thumbnail(cache, source, "unrelated.png")
+    # Entries of other programs neither count towards the size limit nor are they evicted.
+    cache = ThumbnailCache(tmp_path / "cache", 1, True)
+    assert_that(cache._entries, is_(empty()))
+    cache.store(source, create_thumbnail())
+    cache.store(other_source, create_thumbnail())
+    assert_that(QImage(str(foreign_entry)).size(), is_(equal_to(QSize(1024, 768))))
+    assert_that(unrelated_entry.exists(), is_(True))
+    assert_that(cache.load(source, QSize(80, 60)), is_(none()))
+
+
+def test_failed_store_removes_temporary_file(tmp_path: pathlib.Path):
+    source = create_source_file(tmp_path / "scan.jpg")
+    cache = ThumbnailCache(tmp_path / "cache", 2**20)
+    # Renaming the temporary file onto a non-empty directory fails.
+    entry_path = cache.cache_directory / cache._entry_name(source, source.stat())
+    entry_path.mkdir()
+    (entry_path / "content").write_bytes(b"")
+    cache.store(source, create_thumbnail())
+    assert_that(list(cache.cache_directory.glob(".*.tmp")), is_(empty()))
+    assert_that(cache._entries, is_(empty()))
@@ -0,0 +1,137 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import io
+import json
+import pathlib
+
+import pytest
+from hamcrest import *
+
+from PyQt5.QtCore import Qt, QSize, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from visual_image_splitter import batch
+from tests.common import Namespace, create_image_file
+
+
+def _run(args: Namespace) -> (int, list):
+    output = io.StringIO()
+    exit_status = batch.run(args, output)
+    return exit_status, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_run_applies_presets_to_all_images(tmp_path: pathlib.Path):
+    images = [create_image_file(tmp_path / f"scan{i}.png", 1000, 800) for i in range(3)]
+    args = Namespace([str(image) for image in images], jobs=2)
+    args.selections = [("0", "0", "50%", "100%"), ("50%", "0", "100%", "100%")]
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_SUCCESS)))
+    assert_that(events[0], has_entries(event="started", total=3))
+    assert_that(events[1:-1], has_length(3))
+    assert_that(events[1:-1], only_contains(has_entries(event="image", status="ok", outputs=has_length(2))))
+    assert_that(events[-1], has_entries(event="finished", succeeded=3, failed=0, interrupted=False))
+    for image in images:
+        assert_that(QImage(str(tmp_path / f"{image.stem}_00001.png")).size(), is_(equal_to(QSize(500, 800))))
+        assert_that(QImage(str(tmp_path / f"{image.stem}_00002.png")).size(), is_(equal_to(QSize(500, 800))))
+
+
+def test_run_reports_unreadable_images(tmp_path: pathlib.Path):
+    valid = create_image_file(tmp_path / "valid.png", 100, 100)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"This is not a PNG file")
+    args = Namespace([str(valid), str(broken)])
+    args.selections = [("0", "0", "50", "50")]
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_FAILURE)))
+    assert_that(events, has_item(has_entries(event="image", path=str(broken), status="error", error=not_none())))
+    assert_that(events, has_item(has_entries(event="image", path=str(valid), status="ok")))
+    assert_that(events[-1], has_entries(event="finished", succeeded=1, failed=1))
+
+
+def test_run_requires_selections(tmp_path: pathlib.Path):
+    args = Namespace([str(create_image_file(tmp_path / "scan.png", 100, 100))])
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_USAGE)))
+    assert_that(events, is_(empty()))
+
+
+def test_run_interrupted_while_enumerating(tmp_path: pathlib.Path, monkeypatch):
+    def interrupted_enumeration(args):
+        yield create_image_file(tmp_path / "scan.png", 100, 100)
+        raise KeyboardInterrupt()
+    monkeypatch.setattr(batch.image_paths, "from_arguments", interrupted_enumeration)
+    args = Namespace([str(tmp_path)])
+    args.selections = [("0", "0", "50", "50")]
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_INTERRUPTED)))
+    assert_that(events[-1], has_entries(event="finished", succeeded=0, interrupted=True))
+
+
+def test_run_manifest(tmp_path: pathlib.Path):
+    valid = create_image_file(tmp_path / "valid.png", 1000, 800)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"This is not a PNG file")
+    manifest_path = tmp_path / "manifest.jsonl"
+    manifest_path.write_text(
+        '{"source": "valid.png", "output": "output", "selections": [[0, 0, 400, 300], [500, 400, 1000, 800]]}\n'
+        'invalid\n'
+        '{"source": "broken.png", "selections": [[0, 0, 10, 10]]}\n'
+    )
+    (tmp_path / "output").mkdir()
+    args = Namespace(jobs=1)
+    args.manifest = str(manifest_path)
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_FAILURE)))
+    assert_that(events[0], has_entries(event="started", total=None))
+    assert_that(events, has_item(has_entries(event="image", path=str(valid), status="ok", outputs=has_length(2))))
+    assert_that(events, has_item(has_entries(event="image", path=str(broken), status="error")))
+    assert_that(events[-1], has_entries(event="finished", succeeded=1, failed=1, invalid_records=1))
+    assert_that(QImage(str(tmp_path / "output" / "valid_00002.png")).size(), is_(equal_to(QSize(500, 400))))
+
+
+def test_run_resumes_from_journal(tmp_path: pathlib.Path):
+    images = [create_image_file(tmp_path / f"scan{i}.png", 100, 100) for i in range(2)]
+    args = Namespace([str(image) for image in images])
+    args.selections = [("0", "0", "50", "50")]
+    args.journal = str(tmp_path / "journal.jsonl")
+    exit_status, _ = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_SUCCESS)))
+    (tmp_path / "scan1_00001.png").unlink()
+    args.resume = True
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_SUCCESS)))
+    assert_that(events, has_item(has_entries(event="image", path=str(images[0]), status="skipped")))
+    assert_that(events, has_item(has_entries(event="image", path=str(images[1]), status="ok")))
+    assert_that(events[-1], has_entries(event="finished", succeeded=1, skipped=1, failed=0))
+    assert_that((tmp_path / "scan1_00001.png").exists(), is_(True))
+
+
+def test_run_selects_detected_photos(tmp_path: pathlib.Path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "scan.png"
+    scan = QImage(1000, 800, QImage.Format_RGB32)
+    scan.fill(Qt.white)
+    painter = QPainter(scan)
+    painter.fillRect(QRect(50, 50, 400, 300), Qt.darkRed)
+    painter.fillRect(QRect(550, 400, 400, 300), Qt.darkBlue)
+    painter.end()
+    scan.save(str(path))
+    args = Namespace([str(path)])
+    args.detect_photos = True
+    exit_status, events = _run(args)
+    assert_that(exit_status, is_(equal_to(batch.EXIT_SUCCESS)))
+    assert_that(events, has_item(has_entries(event="image", status="ok", outputs=has_length(2))))
+    assert_that(QImage(str(tmp_path / "scan_00001.png")).pixelColor(200, 150), is_(equal_to(QColor(Qt.darkRed))))
+    assert_that(QImage(str(tmp_path / "scan_00002.png")).pixelColor(200, 150), is_(equal_to(QColor(Qt.darkBlue))))
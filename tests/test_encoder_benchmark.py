@@ -0,0 +1,55 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import pathlib
+
+from hamcrest import *
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter import encoder_benchmark
+from visual_image_splitter.batch import EXIT_SUCCESS, EXIT_FAILURE
+from tests.common import Namespace
+
+
+def test_reports_each_format_and_setting(tmp_path: pathlib.Path):
+    path = tmp_path / "scan.png"
+    image = encoder_benchmark.create_sample_image(200, 300)
+    image.save(str(path))
+    args = Namespace([str(path)])
+    args.jpeg_quality = 50
+    output = io.StringIO()
+    assert_that(encoder_benchmark.run(args, output), is_(equal_to(EXIT_SUCCESS)))
+    lines = output.getvalue().splitlines()
+    assert_that(lines[0], is_(equal_to(f"{path}: 200x300 pixels")))
+    # The Qt defaults, three presets and the configured settings for each format
+    assert_that(lines[1:], has_length(3 * 5))
+    row = r" (jpg|png|tiff) +[\w ]+: +(\d+\.\d ms, +\d+\.\d\d MiB|failed)"
+    assert_that(lines[1:], only_contains(matches_regexp(row)))
+    assert_that(lines, has_item(contains_string("jpg configured")))
+
+
+def test_unreadable_images_fail(tmp_path: pathlib.Path):
+    readable = tmp_path / "scan.png"
+    image = QImage(20, 20, QImage.Format_RGB32)
+    image.fill(Qt.white)
+    image.save(str(readable))
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    output = io.StringIO()
+    assert_that(encoder_benchmark.run(Namespace([str(broken), str(readable)]), output), is_(equal_to(EXIT_FAILURE)))
+    assert_that(output.getvalue(), starts_with(f"{readable}: 20x20 pixels"))
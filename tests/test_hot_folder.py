@@ -0,0 +1,160 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+import concurrent.futures
+import io
+import json
+import pathlib
+import time
+
+from hamcrest import *
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter import hot_folder
+from tests.common import Namespace, create_image_file
+
+INTERVAL = 0.05
+
+
+def _create_hot_folder(directory: pathlib.Path) -> (hot_folder.HotFolder, io.StringIO):
+    args = Namespace(jobs=1)
+    args.selections = [("0", "0", "50%", "100%"), ("50%", "0", "100%", "100%")]
+    args.watch_directories = [str(directory)]
+    args.watch_interval = INTERVAL
+    output = io.StringIO()
+    return hot_folder.HotFolder(args, output), output
+
+
+def _wait_until(qapplication, condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert_that(time.monotonic(), is_(less_than(deadline)), "Timed out")
+        qapplication.processEvents()
+        time.sleep(0.01)
+
+
+def _events(output: io.StringIO) -> list:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_new_files_are_split_and_moved(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    watcher.start()
+    create_image_file(tmp_path / "scan.png", 1000, 800)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"This is not a PNG file")
+    _wait_until(qapplication, lambda: watcher.succeeded + watcher.failed == 2)
+    watcher.stop()
+    assert_that(QImage(str(tmp_path / "output" / "scan" / "scan_00001.png")).size(), is_(equal_to(QSize(500, 800))))
+    assert_that(QImage(str(tmp_path / "output" / "scan" / "scan_00002.png")).size(), is_(equal_to(QSize(500, 800))))
+    assert_that((tmp_path / "processed" / "scan.png").is_file(), is_(True))
+    assert_that((tmp_path / "failed" / "broken.png").is_file(), is_(True))
+    assert_that((tmp_path / "output" / "broken").exists(), is_(False))
+    assert_that(list(tmp_path.glob("*.png")), is_(empty()))
+    events = _events(output)
+    assert_that(events[0], has_entries(event="watching", directories=[str(tmp_path)]))
+    assert_that(events, has_item(has_entries(event="image", path=str(tmp_path / "scan.png"), status="ok")))
+    assert_that(events, has_item(has_entries(event="image", path=str(broken), status="error")))
+    assert_that(events[-1], has_entries(event="finished", succeeded=1, failed=1, interrupted=False))
+
+
+def test_files_being_written_are_not_processed(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    path = create_image_file(tmp_path / "scan.png", 100, 100)
+    for size in range(10):
+        # Simulate a slowly growing file, by changing the size faster than the watch interval
+        with open(path, "ab") as file:
+            file.write(b"\0")
+        watcher.scan()
+        time.sleep(INTERVAL / 5)
+    assert_that(watcher.succeeded + watcher.failed, is_(equal_to(0)))
+    assert_that(_events(output), is_(empty()))
+    watcher.stop()
+    assert_that(path.is_file(), is_(True))
+
+
+def test_moved_files_do_not_replace_existing_files(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    watcher.start()
+    (tmp_path / "processed" / "scan.png").write_bytes(b"Previously processed scan")
+    create_image_file(tmp_path / "scan.png", 100, 100)
+    _wait_until(qapplication, lambda: watcher.succeeded == 1)
+    watcher.stop()
+    assert_that((tmp_path / "processed" / "scan.png").read_bytes(), is_(equal_to(b"Previously processed scan")))
+    assert_that((tmp_path / "processed" / "scan.1.png").is_file(), is_(True))
+
+
+def test_reused_file_names_do_not_replace_outputs(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    watcher.start()
+    create_image_file(tmp_path / "scan.png", 100, 100)
+    _wait_until(qapplication, lambda: watcher.succeeded == 1)
+    create_image_file(tmp_path / "scan.png", 200, 100)
+    _wait_until(qapplication, lambda: watcher.succeeded == 2)
+    watcher.stop()
+    assert_that(QImage(str(tmp_path / "output" / "scan" / "scan_00001.png")).size(), is_(equal_to(QSize(50, 100))))
+    assert_that(QImage(str(tmp_path / "output" / "scan.1" / "scan_00001.png")).size(), is_(equal_to(QSize(100, 100))))
+
+
+def test_unexpected_job_errors_fail_the_image(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    watcher.start()
+    path = create_image_file(tmp_path / "scan.png", 100, 100)
+    output_directory = tmp_path / "output" / "scan"
+    output_directory.mkdir()
+    future = concurrent.futures.Future()
+    future.set_exception(ValueError("Can not pickle the job"))
+    watcher._running[future] = path, output_directory, watcher.process_pool
+    watcher._ignored.add(path)
+    watcher._on_job_done(future)
+    watcher.stop()
+    assert_that(watcher.failed, is_(equal_to(1)))
+    assert_that((tmp_path / "failed" / "scan.png").is_file(), is_(True))
+    assert_that(_events(output), has_item(has_entries(event="image", path=str(path), status="error")))
+
+
+class BrokenPool:
+    """Fails like a process pool, whose worker process was killed."""
+
+    def __init__(self):
+        self.is_shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise concurrent.futures.process.BrokenProcessPool("A worker process was killed")
+
+    def shutdown(self, wait: bool = True):
+        self.is_shut_down = True
+
+
+def test_broken_process_pool_is_replaced(qapplication, tmp_path: pathlib.Path):
+    watcher, output = _create_hot_folder(tmp_path)
+    watcher.start()
+    path = create_image_file(tmp_path / "scan.png", 100, 100)
+    broken_pool = BrokenPool()
+    watcher.process_pool.shutdown()
+    watcher.process_pool = broken_pool
+    watcher._ready.append(path)
+    watcher._ignored.add(path)
+    watcher._submit_ready_jobs()
+    assert_that(broken_pool.is_shut_down, is_(True))
+    assert_that(watcher.process_pool, is_not(same_instance(broken_pool)))
+    assert_that((tmp_path / "failed" / "scan.png").is_file(), is_(True))
+    assert_that((tmp_path / "output" / "scan").exists(), is_(False))
+    # The replacement pool is used for the following files.
+    create_image_file(tmp_path / "next.png", 100, 100)
+    _wait_until(qapplication, lambda: watcher.succeeded == 1)
+    watcher.stop()
+    assert_that(watcher.failed, is_(equal_to(1)))
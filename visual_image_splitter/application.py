@@ -29,11 +29,11 @@ logger = visual_image_splitter.logger.get_logger("Application")
 
 class Application(QApplication):
 
-    def __init__(self, argv: typing.List[str] = None):
+    def __init__(self, argv: typing.List[str] = None, args: Namespace = None):
         if argv is None:
             argv = sys.argv
         super(Application, self).__init__(argv)
-        self.args: Namespace = parse_arguments()
+        self.args: Namespace = parse_arguments() if args is None else args
         visual_image_splitter.logger.configure_root_logger(self.args)
         logger.info("Starting visual_image_splitter")
         self.model: visual_image_splitter.model.model.Model = visual_image_splitter.model.model.Model(self.args, self)
@@ -47,12 +47,23 @@ class Application(QApplication):
     def shutdown(self):
         logger.info("About to exit.")
         self.closeAllWindows()
+        self.model.prefetcher.shutdown()
+        logger.debug("Stopped prefetching images.")
         self.model.worker_thread.requestInterruption()
         logger.debug("Requested worker thread to interrupt it’s work.")
         self.model.worker_thread.quit()
         logger.debug("Requested worker thread to quit. Waiting for it to finish.")
         self.model.worker_thread.wait()
-        logger.info("Worker thread finished. Exiting…")
+        self.model.image_enumerator_pool.shutdown(wait=True)
+        logger.info("Worker thread finished. Waiting for the image loader threads to finish.")
+        self.model.image_loader_pool.shutdown(wait=True)
+        self.model.image_writer_pool.shutdown(wait=True)
+        self.model.output_writer.close()
+        if self.model.thumbnail_cache is not None:
+            self.model.thumbnail_cache.log_statistics()
+        self.model.image_data_cache.log_statistics()
+        self.model.encoded_data_cache.log_statistics()
+        logger.info("Image loader threads finished. Exiting…")
         self.quit()
 
     def get_currently_edited_image(self):
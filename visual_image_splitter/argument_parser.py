@@ -15,6 +15,8 @@
 
 import typing
 import argparse
+import importlib.util
+import os
 
 import visual_image_splitter.meta_data
 
@@ -22,9 +24,92 @@ import visual_image_splitter.meta_data
 class Namespace(typing.NamedTuple):
     """Mocks the namespace generated by the ArgumentParser. Used for type checking"""
     images: typing.List[str]
+    files_from: typing.Optional[str]
+    extensions: typing.Optional[typing.List[str]]
+    recursive: bool
+    manifest: typing.Optional[str]
     selections: typing.List[typing.Tuple[str, str, str, str]]
+    detect_photos: bool
     cutelog_integration: bool
     verbose: bool
+    jobs: int
+    thumbnail_cache_size: int
+    thumbnail_cache_dir: typing.Optional[str]
+    freedesktop_thumbnails: bool
+    image_cache_size: int
+    source_cache_size: int
+    region_decoding: str
+    prefetch: int
+    prefetch_decode: bool
+    lossless_jpeg: bool
+    save_strategy: str
+    encoder_preset: typing.Optional[str]
+    jpeg_quality: typing.Optional[int]
+    jpeg_progressive: typing.Optional[bool]
+    jpeg_optimize: typing.Optional[bool]
+    png_compression: typing.Optional[int]
+    tiff_compression: typing.Optional[str]
+    sync: str
+    journal: typing.Optional[str]
+    resume: bool
+    batch: bool
+    watch_directories: typing.List[str]
+    watch_interval: float
+    benchmark_encoders: bool
+
+
+def positive_int(value: str) -> int:
+    """Argument type for strictly positive integer values, like thread or process counts."""
+    result = int(value)
+    if result < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive integer, got {value}")
+    return result
+
+
+def non_negative_int(value: str) -> int:
+    """Argument type for integer values that must not be negative, like cache sizes."""
+    result = int(value)
+    if result < 0:
+        raise argparse.ArgumentTypeError(f"Expected a non-negative integer, got {value}")
+    return result
+
+
+def positive_float(value: str) -> float:
+    """Argument type for strictly positive decimal values, like time intervals."""
+    result = float(value)
+    if not result > 0:
+        raise argparse.ArgumentTypeError(f"Expected a positive number, got {value}")
+    return result
+
+
+def int_in_range(minimum: int, maximum: int) -> typing.Callable[[str], int]:
+    """Returns an argument type for integer values in the closed interval [minimum, maximum]."""
+    def in_range(value: str) -> int:
+        result = int(value)
+        if not minimum <= result <= maximum:
+            raise argparse.ArgumentTypeError(f"Expected an integer between {minimum} and {maximum}, got {value}")
+        return result
+    return in_range
+
+
+def extension_list(value: str) -> typing.List[str]:
+    """Argument type for comma separated lists of file name extensions. Leading dots are optional."""
+    result = [extension.strip().lstrip(".").lower() for extension in value.split(",")]
+    if not all(result):
+        raise argparse.ArgumentTypeError(f"Expected a comma separated list of file name extensions, got {value}")
+    return result
+
+
+def add_boolean_argument(parser: argparse.ArgumentParser, name: str, help_text: str):
+    """
+    Adds the switches --name and --no-name. If neither is given, the value is None, so that a default can be applied
+    later.
+    """
+    dest = name.replace("-", "_")
+    parser.add_argument(f"--{name}", action="store_const", const=True, default=None, dest=dest, help=help_text)
+    parser.add_argument(
+        f"--no-{name}", action="store_const", const=False, dest=dest, help=f"Disable --{name}."
+    )
 
 
 def generate_argument_parser() -> argparse.ArgumentParser:
@@ -43,8 +128,37 @@ def generate_argument_parser() -> argparse.ArgumentParser:
         "images",
         nargs="*",
         metavar="IMAGE",
-        help="One or more image files. The given files will be loaded on program start. Specifying images here is "
-             "optional, as additional images can be loaded at runtime later."
+        help="One or more image files, directories or glob patterns. The given files will be loaded on program "
+             "start. Directories are searched for image files, including all subdirectories. Quoted glob patterns "
+             "are expanded by this program, which avoids command line length limits for large numbers of files. "
+             "\"**\" matches any number of subdirectories. Specifying images here is optional, as additional images "
+             "can be loaded at runtime later."
+    )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Read additional IMAGE arguments from FILE, separated by NUL characters, like the output of "
+             "\"find -print0\". Use \"-\" to read from the standard input."
+    )
+    parser.add_argument(
+        "--extensions",
+        type=extension_list,
+        metavar="EXT[,EXT…]",
+        help="Comma separated list of file name extensions, like \"jpg,tif\". Only files with these extensions are "
+             "loaded from directories and glob patterns. Defaults to all supported image formats."
+    )
+    parser.add_argument(
+        "--no-recursive",
+        action="store_false",
+        dest="recursive",
+        help="Only load image files directly inside given directories, without searching subdirectories."
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="FILE",
+        help="Open the images listed in the given job manifest together with their selections. Manifests are "
+             "JSON Lines files, which can be exported from the File menu. With --batch, the manifest is executed "
+             "without the graphical user interface. Use \"-\" to read the manifest from the standard input."
     )
     parser.add_argument(
         "-s", "--selection",
@@ -64,6 +178,194 @@ def generate_argument_parser() -> argparse.ArgumentParser:
              "The second pair specifies the second anchor point. "
              "If a sign (either + or -) is given for a value, it is treated as relative to the first anchor point. "
     )
+    parser.add_argument(
+        "--detect-photos",
+        action="store_true",
+        help="Select the photos detected on each opened image, that has no selections otherwise. The photos are "
+             "found by their difference to the background color of the scanner bed. Requires NumPy."
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=os.cpu_count() or 1,
+        metavar="N",
+        help="Number of images that are opened and decoded concurrently, number of selections that are "
+             "extracted and encoded concurrently when saving an image and number of processes used to save all "
+             "images. Defaults to the number of CPU cores available on this machine."
+    )
+    parser.add_argument(
+        "--thumbnail-cache-size",
+        type=non_negative_int,
+        default=256,
+        metavar="MiB",
+        help="Maximum size of the persistent preview image cache in MiB. Preview images are cached on disk, so that "
+             "re-opening images is fast. If the cache is full, the least recently used entries are removed. "
+             "Set to 0 to disable the cache. Defaults to %(default)s MiB."
+    )
+    parser.add_argument(
+        "--thumbnail-cache-dir",
+        metavar="DIRECTORY",
+        help="Directory used to store the preview image cache. Defaults to a directory in the user cache directory."
+    )
+    parser.add_argument(
+        "--freedesktop-thumbnails",
+        action="store_true",
+        help="Store cached preview images according to the freedesktop.org thumbnail standard. This shares the cache "
+             "with other programs, like file managers. If no cache directory is given, the shared xx-large "
+             "thumbnail directory is used. Thumbnails are stored at the 1024 pixel size defined for that directory."
+    )
+    parser.add_argument(
+        "--image-cache-size",
+        type=non_negative_int,
+        default=1024,
+        metavar="MiB",
+        help="Memory budget in MiB for keeping decoded full resolution images in memory. Images that are used "
+             "again, for example when saving them, are not decoded again as long as they fit into the budget. "
+             "If the budget is exceeded, the least recently used images are dropped. Defaults to %(default)s MiB."
+    )
+    parser.add_argument(
+        "--source-cache-size",
+        type=non_negative_int,
+        default=0,
+        metavar="MiB",
+        help="Memory budget in MiB for keeping the raw content of image files in memory. If enabled, each file is read "
+             "only once and all decoding is done from memory. This is useful, if the images are stored on a slow "
+             "network share. Set to 0 to disable. Defaults to %(default)s MiB."
+    )
+    parser.add_argument(
+        "--region-decoding",
+        choices=("auto", "always", "never"),
+        default="auto",
+        help="When saving, decode only the selected regions instead of the whole image, if the image format supports "
+             "it. This reduces the memory required for saving large images. "
+             "\"auto\" decodes regions only if this is estimated to be faster than decoding the whole image. "
+             "Defaults to \"%(default)s\"."
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=non_negative_int,
+        default=2,
+        metavar="N",
+        help="Number of images that are read in the background after the currently edited image, following the "
+             "navigation direction in the opened images list. Set to 0 to disable. Defaults to %(default)s."
+    )
+    parser.add_argument(
+        "--prefetch-decode",
+        action="store_true",
+        help="Also decode the currently edited and the prefetched images in the background, so that saving them does "
+             "not have to wait for decoding. Decoded images are kept within the --image-cache-size budget."
+    )
+    parser.add_argument(
+        "--lossless-jpeg",
+        action="store_true",
+        help="Crop selections from JPEG files losslessly, without decoding and re-encoding the image data. "
+             "Requires the jpegtran tool. Because lossless cropping is restricted to an 8 or 16 pixel grid, the top "
+             "and left border of each selection may be moved outwards by up to 15 pixels. If jpegtran is unavailable "
+             "or fails, the selections are re-encoded."
+    )
+    parser.add_argument(
+        "--save-strategy",
+        choices=("processes", "pipeline"),
+        default="processes",
+        help="How \"Save all\" writes the images. \"processes\" saves up to --jobs images in parallel worker "
+             "processes. \"pipeline\" streams the images through a pipeline of reading, decoding, cropping, encoding "
+             "and writing threads, so that disk access and computation overlap, and logs statistics for each stage "
+             "to identify the bottleneck. Defaults to \"%(default)s\"."
+    )
+    parser.add_argument(
+        "--encoder-preset",
+        choices=("fast", "balanced", "small"),
+        help="Named set of encoder settings for the output files. \"fast\" minimizes the encoding time, "
+             "\"small\" minimizes the file size and \"balanced\" is in between. The individual encoder options "
+             "below override the preset. Without a preset, the Qt default settings are used."
+    )
+    parser.add_argument(
+        "--jpeg-quality",
+        type=int_in_range(0, 100),
+        metavar="0-100",
+        help="Quality of JPEG output files. Higher values create larger files with less compression artifacts."
+    )
+    add_boolean_argument(
+        parser, "jpeg-progressive",
+        "Write progressive JPEG files, which can be displayed at low resolution before being fully loaded."
+    )
+    add_boolean_argument(
+        parser, "jpeg-optimize",
+        "Optimize the entropy coding of JPEG files. Creates slightly smaller files, but takes longer."
+    )
+    parser.add_argument(
+        "--png-compression",
+        type=int_in_range(0, 9),
+        metavar="0-9",
+        help="Compression level of PNG output files. 0 disables compression, 9 creates the smallest files, "
+             "but is the slowest."
+    )
+    parser.add_argument(
+        "--tiff-compression",
+        choices=("none", "lzw"),
+        help="Compression method of TIFF output files."
+    )
+    parser.add_argument(
+        "--sync",
+        choices=("file", "directory", "never"),
+        default="directory",
+        help="Output files are written to temporary files and renamed when complete, so that no truncated files are "
+             "left behind. This determines how the output is flushed to the storage device. \"file\" syncs each "
+             "file, \"directory\" syncs the files in batches, \"never\" leaves it to the operating system. "
+             "Defaults to \"%(default)s\"."
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="FILE",
+        help="Record each image in this checkpoint journal, after all its output files are written. Used by \"Save "
+             "all\" and by --batch. New entries are appended to an existing journal."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Requires --journal. Skip images that the journal records as written with the same selections, as long as "
+             "the source file is unchanged and all output files still exist with the recorded sizes. Use this to "
+             "continue an interrupted run."
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Split the given images without showing the graphical user interface and exit. Each selection preset "
+             "given with --selection is applied to each image and the output files are written using --jobs worker "
+             "processes. Progress is reported as one JSON object per line on the standard output, log messages are "
+             "written to the standard error. The exit status is 0, if all images were written, 1, if writing any "
+             "image failed, 2 for invalid arguments and 130, if interrupted."
+    )
+    parser.add_argument(
+        "--watch",
+        action="append",
+        default=[],
+        dest="watch_directories",
+        metavar="DIRECTORY",
+        help="Requires --batch. Instead of splitting the given images, watch the given directory for new image files "
+             "and split them as they arrive, until terminated. Can be given multiple times. Files are processed, "
+             "after their size and modification time did not change for --watch-interval seconds. Output files are "
+             "written into a subdirectory of \"output\" named after the source file, numbered if the name was "
+             "used before. Afterwards, the source file is moved "
+             "into the subdirectory \"processed\", or \"failed\", if splitting it failed."
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=positive_float,
+        default=5.0,
+        metavar="SECONDS",
+        help="Time a new file in a watched directory has to remain unchanged, before it is considered completely "
+             "written. Watched directories are also scanned in this interval, in case change notifications are not "
+             "available, like on network shares. Defaults to %(default)s seconds."
+    )
+    parser.add_argument(
+        "--benchmark-encoders",
+        action="store_true",
+        help="Encode each given IMAGE, or a generated sample page, as JPEG, PNG and TIFF using the Qt default "
+             "settings, each --encoder-preset and the given encoder options. Then print the encoding time and the "
+             "output size of each combination and exit, without showing the graphical user interface. Use this to "
+             "choose an encoder preset."
+    )
     parser.add_argument(
         "-v", "--version",
         action="version",
@@ -84,4 +386,23 @@ def generate_argument_parser() -> argparse.ArgumentParser:
 
 def parse_arguments():
     parser = generate_argument_parser()
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.resume and args.journal is None:
+        parser.error("--resume requires --journal")
+    if args.benchmark_encoders and (args.batch or args.manifest is not None):
+        parser.error("--benchmark-encoders can not be combined with --batch or --manifest")
+    if args.detect_photos and importlib.util.find_spec("numpy") is None:
+        parser.error("--detect-photos requires NumPy. Install it using \"pip install numpy\"")
+    if args.batch and args.manifest is not None:
+        if args.images or args.files_from or args.watch_directories:
+            parser.error("--batch --manifest can not be combined with IMAGE arguments, --files-from or --watch")
+        return args
+    if args.batch and not args.selections and not args.detect_photos:
+        parser.error("--batch requires at least one --selection, --detect-photos or a --manifest")
+    if args.watch_directories and not args.batch:
+        parser.error("--watch requires --batch")
+    if args.watch_directories and (args.images or args.files_from):
+        parser.error("--watch can not be combined with IMAGE arguments. Put the images into a watched directory.")
+    if args.batch and not args.images and not args.files_from and not args.watch_directories:
+        parser.error("--batch requires at least one IMAGE, --files-from, --manifest or --watch")
+    return args
@@ -0,0 +1,278 @@
+# Copyright (C) 2018 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Headless batch mode. Applies the selection presets given on the command line to each image and writes the output
+files without creating a QApplication, so no display is required. Without presets, the photos detected on each page
+are selected, if photo detection is enabled. The images are processed by a pool of worker processes, largest files
+first. Alternatively, a job manifest is executed, which contains the selections of each
+image. See the manifest module.
+
+Progress is reported on the standard output as one JSON object per line:
+
+- {"event": "started", "total": N} before the first image is processed.
+- {"event": "image", "path": …, "status": "ok", "error" or "skipped", "outputs": […], "error": …, "finished": i,
+  "total": N} for each processed image. "error" is null, unless the status is "error". Images are skipped, when
+  resuming from a journal that records them as written.
+- {"event": "finished", "succeeded": …, "failed": …, "skipped": …, "total": N, "invalid_records": …,
+  "interrupted": …, "seconds": …} at the end.
+
+When executing a job manifest, the total is unknown in advance and reported as null. invalid_records counts the
+manifest lines that could not be parsed.
+"""
+
+import concurrent.futures
+import json
+from pathlib import Path
+import sys
+import time
+import typing
+
+from visual_image_splitter.argument_parser import Namespace
+from visual_image_splitter.model import encoder_settings
+from visual_image_splitter.model import image_paths
+from visual_image_splitter.model import manifest
+from visual_image_splitter.model import photo_detection
+from visual_image_splitter.model import save_job
+from visual_image_splitter.model.encoder_settings import EncoderSettings
+from visual_image_splitter.model.image import Image
+from visual_image_splitter.model.journal import Journal, JournalSelections, open_journal
+from visual_image_splitter.model.manifest import ManifestRecord
+from visual_image_splitter.model.selection_preset import SelectionPreset, SelectionPresetList
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Process exit status codes
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1  # Writing at least one image failed
+EXIT_USAGE = 2  # Invalid command line arguments. Same as used by argparse.
+EXIT_INTERRUPTED = 130  # Interrupted by SIGINT, following the shell convention 128 + signal number
+
+# Recorded in the journal instead of selection presets, if the detected photos are selected
+DETECTED_PHOTOS = "detected photos"
+
+
+class BatchJob(typing.NamedTuple):
+    """
+    Describes the work for a single image. Unlike a SaveJob, it contains the selection presets instead of concrete
+    selections, because the image dimensions are only known after the worker process has read the image.
+    """
+    image_path: Path
+    presets: typing.List[SelectionPreset]
+    region_decoding: str
+    lossless_jpeg: bool
+    encoder_settings: EncoderSettings
+    sync: str
+    output_path: typing.Optional[Path] = None  # Defaults to the directory containing the image
+    detect_photos: bool = False  # Select the detected photos, if no presets are given
+
+
+def run_job(job: BatchJob) -> typing.List[Path]:
+    """
+    Writes all output files of the given job. Executed by the worker processes.
+    :returns: The written output file paths
+    :raises RuntimeError: If the image can not be read or any output file can not be written.
+    """
+    image = Image(job.image_path)
+    image.encoder_settings = job.encoder_settings
+    if job.output_path is not None:
+        image.output_path = job.output_path
+    SelectionPresetList(job.presets).apply_to(image)
+    if job.detect_photos and not image.selections:
+        for selection in photo_detection.detect_photos(image, image.read_preview()):
+            image.add_selection(selection)
+    return save_job.write_output(image, job.region_decoding, job.lossless_jpeg, job.sync)
+
+
+def report(output: typing.TextIO, event: str, **values):
+    """Writes a progress event as a single line JSON object to output."""
+    output.write(json.dumps({"event": event, **values}) + "\n")
+    output.flush()
+
+
+class _Progress:
+    """
+    Counts the finished images and reports them as progress events. Written images are recorded in the journal.
+    """
+
+    def __init__(self, output: typing.TextIO, total: typing.Optional[int], journal: Journal):
+        self.output = output
+        self.total = total
+        self.journal = journal
+        self.succeeded = self.failed = self.skipped = 0
+        self.invalid_records = 0
+        self.interrupted = False
+        self._start = time.perf_counter()
+        report(output, "started", total=total)
+
+    @property
+    def finished(self) -> int:
+        return self.succeeded + self.failed + self.skipped
+
+    def skip_completed(self, path: Path, selections: JournalSelections) -> bool:
+        """Returns True and reports the image as skipped, if the journal records it as written."""
+        outputs = self.journal.completed_outputs(path, selections)
+        if outputs is None:
+            return False
+        logger.info(f"Skipping {path}, because the journal records it as written.")
+        self.skipped += 1
+        report(
+            self.output, "image", path=str(path), status="skipped", outputs=[str(output) for output in outputs],
+            error=None, finished=self.finished, total=self.total
+        )
+        return True
+
+    def image_finished(self, path: Path, selections: JournalSelections, future: concurrent.futures.Future):
+        try:
+            outputs = future.result()
+        except (RuntimeError, OSError) as e:
+            logger.error(f"Splitting image {path} failed: {e}")
+            self.failed += 1
+            report(
+                self.output, "image", path=str(path), status="error", outputs=[], error=str(e),
+                finished=self.finished, total=self.total
+            )
+        else:
+            self.journal.record(path, selections, outputs)
+            self.succeeded += 1
+            report(
+                self.output, "image", path=str(path), status="ok", outputs=[str(output) for output in outputs],
+                error=None, finished=self.finished, total=self.total
+            )
+
+    def interrupt(self, pending: typing.Iterable[concurrent.futures.Future] = ()):
+        """Marks the run as interrupted and cancels the given jobs that did not start yet."""
+        logger.warning("Interrupted. Waiting for the images in progress to finish.")
+        self.interrupted = True
+        for future in pending:
+            future.cancel()
+
+    def finish(self) -> int:
+        """Reports the final summary and returns the process exit status."""
+        report(
+            self.output, "finished", succeeded=self.succeeded, failed=self.failed, skipped=self.skipped,
+            total=self.total, invalid_records=self.invalid_records, interrupted=self.interrupted,
+            seconds=round(time.perf_counter() - self._start, 3)
+        )
+        if self.interrupted:
+            return EXIT_INTERRUPTED
+        return EXIT_FAILURE if self.failed or self.invalid_records else EXIT_SUCCESS
+
+
+def run(args: Namespace, output: typing.TextIO = None) -> int:
+    """
+    Splits all images given on the command line using the given selection presets. If a manifest is given instead,
+    it is executed using run_manifest().
+    :param args: Parsed command line arguments
+    :param output: Text stream receiving the progress events. Defaults to the standard output.
+    :returns: The process exit status. One of the EXIT_* constants.
+    """
+    if output is None:
+        output = sys.stdout
+    if args.manifest is None and (
+            not (args.selections or args.detect_photos) or not (args.images or args.files_from)):
+        logger.error("Batch mode requires at least one selection or photo detection and at least one image.")
+        return EXIT_USAGE
+    try:
+        journal = open_journal(args)
+    except OSError as e:
+        logger.error(f"Opening the journal {args.journal} failed: {e}")
+        return EXIT_USAGE
+    with journal:
+        if args.manifest is not None:
+            return run_manifest(args, output, journal)
+        return _run_presets(args, output, journal)
+
+
+def _run_presets(args: Namespace, output: typing.TextIO, journal: Journal) -> int:
+    presets = [SelectionPreset(*selection) for selection in args.selections]
+    settings = encoder_settings.from_namespace(args)
+    # Scheduling the largest files first requires the complete list, so the enumeration is not streamed here.
+    # Both touch every file, which takes a while for large directory trees, so allow interrupting them, too.
+    try:
+        jobs = save_job.schedule(
+            BatchJob(
+                path, presets, args.region_decoding, args.lossless_jpeg, settings, args.sync, None, args.detect_photos
+            )
+            for path in image_paths.from_arguments(args)
+        )
+    except KeyboardInterrupt:
+        return _finish_interrupted(output, journal)
+    logger.info(f"Splitting {len(jobs)} images using {len(presets)} selection presets.")
+    progress = _Progress(output, len(jobs), journal)
+    # The presets are recorded in the journal, because the concrete selections depend on each image.
+    journal_selections = [list(preset) for preset in presets] if presets else [[DETECTED_PHOTOS]]
+    jobs = [job for job in jobs if not progress.skip_completed(job.image_path, journal_selections)]
+    if not jobs:
+        if not progress.skipped:
+            logger.warning("No image files found.")
+        return progress.finish()
+    with save_job.create_process_pool(min(args.jobs, len(jobs))) as pool:
+        pending: typing.Dict[concurrent.futures.Future, BatchJob] = {pool.submit(run_job, job): job for job in jobs}
+        try:
+            for future in concurrent.futures.as_completed(pending):
+                progress.image_finished(pending[future].image_path, journal_selections, future)
+        except KeyboardInterrupt:
+            progress.interrupt(pending)
+    return progress.finish()
+
+
+def _finish_interrupted(output: typing.TextIO, journal: Journal) -> int:
+    """Reports a run interrupted before any image was submitted and returns the process exit status."""
+    progress = _Progress(output, None, journal)
+    progress.interrupt()
+    return progress.finish()
+
+
+def run_manifest(args: Namespace, output: typing.TextIO, journal: Journal) -> int:
+    """
+    Executes the job manifest given on the command line. The manifest is read while the images are processed and only
+    a bounded number of jobs is submitted to the worker processes at any time, so manifests can be arbitrarily large.
+    The total number of images is unknown in advance and reported as null.
+    :returns: The process exit status. One of the EXIT_* constants. Invalid manifest lines count as failures.
+    """
+    try:
+        reader = manifest.read(args.manifest)
+    except OSError as e:
+        logger.error(f"Opening the manifest {args.manifest} failed: {e}")
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        # Opening a file on a network share can take a while.
+        return _finish_interrupted(output, journal)
+    settings = encoder_settings.from_namespace(args)
+    progress = _Progress(output, None, journal)
+    # One queued job per worker process keeps the workers busy, while the next job is sent to them.
+    max_running_jobs = 2 * args.jobs
+    running: typing.Dict[concurrent.futures.Future, ManifestRecord] = {}
+    with save_job.create_process_pool(args.jobs) as pool:
+        try:
+            for record in reader:
+                if progress.skip_completed(record.source, record.selections):
+                    continue
+                if len(running) >= max_running_jobs:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        finished_record = running.pop(future)
+                        progress.image_finished(finished_record.source, finished_record.selections, future)
+                job = record.to_save_job(args.region_decoding, args.lossless_jpeg, settings, args.sync)
+                running[pool.submit(save_job.run, job)] = record
+            for future in concurrent.futures.as_completed(running):
+                progress.image_finished(running[future].source, running[future].selections, future)
+        except KeyboardInterrupt:
+            progress.interrupt(running)
+    progress.invalid_records = len(reader.invalid_lines)
+    return progress.finish()
@@ -0,0 +1,144 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Encoder benchmark, started using --benchmark-encoders. Encodes sample images as JPEG, PNG and TIFF using the Qt default
+settings, each encoder preset and the encoder settings given on the command line, and prints the median encoding time
+and the output size of each combination, so that a preset can be chosen based on data. Without given images, a
+synthetic scan is generated. Like the batch mode, this does not require a display.
+"""
+
+import random
+import statistics
+import sys
+import time
+import typing
+
+from PyQt5.QtCore import QBuffer, QCoreApplication, QIODevice, QRect
+from PyQt5.QtGui import QBrush, QColor, QImage, QImageWriter, QLinearGradient, QPainter
+
+from visual_image_splitter.argument_parser import Namespace
+from visual_image_splitter.batch import EXIT_SUCCESS, EXIT_FAILURE
+from visual_image_splitter.model import encoder_settings
+from visual_image_splitter.model import image_paths
+from visual_image_splitter.model.encoder_settings import EncoderSettings, PRESETS
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+FORMATS = ("jpg", "png", "tiff")
+# Each encoding is repeated this many times and the median time is reported.
+REPETITIONS = 3
+
+
+def create_sample_image(width: int = 2550, height: int = 3500) -> QImage:
+    """
+    Returns a synthetic scan-like image. The default size corresponds to an A4 page scanned at 300 DPI. The image
+    contains a background gradient with some colored rectangles on top, so that it compresses similar to a real scan
+    containing photos.
+    """
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(250, 245, 230))
+    gradient.setColorAt(1, QColor(40, 70, 100))
+    painter.fillRect(image.rect(), QBrush(gradient))
+    rng = random.Random(42)
+    for _ in range(400):
+        color = QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        painter.fillRect(QRect(rng.randrange(width), rng.randrange(height), width // 20, height // 30), color)
+    painter.end()
+    return image
+
+
+def encode(image: QImage, image_format: str, settings: EncoderSettings) -> int:
+    """
+    Encodes the image in memory and returns the encoded size in bytes.
+    :raises RuntimeError: If encoding fails, for example because the format is not supported.
+    """
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, image_format.encode())
+    settings.apply(writer, image_format)
+    if not writer.write(image):
+        raise RuntimeError(f"Encoding {image_format} failed: {writer.errorString()}")
+    return buffer.size()
+
+
+def measure(image: QImage, image_format: str, settings: EncoderSettings,
+            repetitions: int = REPETITIONS) -> typing.Tuple[float, int]:
+    """
+    Returns the median encoding time in seconds and the encoded size in bytes.
+    :raises RuntimeError: If encoding fails
+    """
+    timings = []
+    size = 0
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        size = encode(image, image_format, settings)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+
+def candidates(configured: EncoderSettings) -> typing.Dict[str, EncoderSettings]:
+    """Returns the compared settings by name. The configured settings are included, if any are given."""
+    result = {"Qt default": EncoderSettings(), **PRESETS}
+    if configured != EncoderSettings():
+        result["configured"] = configured
+    return result
+
+
+def benchmark(name: str, image: QImage, settings: typing.Dict[str, EncoderSettings], output: typing.TextIO,
+              repetitions: int = REPETITIONS):
+    """Encodes the image using each of the given settings in each of the FORMATS and prints a table row for each."""
+    output.write(f"{name}: {image.width()}x{image.height()} pixels\n")
+    for image_format in FORMATS:
+        for settings_name, encoder in settings.items():
+            try:
+                run_time, size = measure(image, image_format, encoder, repetitions)
+            except RuntimeError as e:
+                logger.warning(str(e))
+                output.write(f"  {image_format:>4} {settings_name:>10}: failed\n")
+                break
+            output.write(f"  {image_format:>4} {settings_name:>10}: {run_time*1000:8.1f} ms, {size/2**20:7.2f} MiB\n")
+    output.flush()
+
+
+def run(args: Namespace, output: typing.TextIO = None) -> int:
+    """
+    Runs the benchmark using the images given on the command line.
+    :param args: Parsed command line arguments
+    :param output: Text stream receiving the results. Defaults to the standard output.
+    :returns: The process exit status. EXIT_FAILURE, if any given image can not be read.
+    """
+    if output is None:
+        output = sys.stdout
+    # Image format plugins are located using the application instance, so keep it referenced until the benchmark is
+    # finished. QCoreApplication does not require a display.
+    application = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    settings = candidates(encoder_settings.from_namespace(args))
+    paths = list(image_paths.from_arguments(args))
+    exit_status = EXIT_SUCCESS
+    if not paths:
+        benchmark("Generated sample page", create_sample_image(), settings, output)
+    for path in paths:
+        image = QImage(str(path))
+        if image.isNull():
+            logger.error(f"Image {path} can not be read. Skipping it.")
+            exit_status = EXIT_FAILURE
+            continue
+        benchmark(str(path), image, settings, output)
+    return exit_status
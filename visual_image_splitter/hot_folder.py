@@ -0,0 +1,358 @@
+# Copyright (C) 2018 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Hot folder mode. Watches directories for new image files and splits them using the selection presets given on the
+command line or the detected photos, as soon as they are completely written. Runs until terminated by SIGINT or
+SIGTERM.
+
+Directory changes are detected using a QFileSystemWatcher, which uses inotify on Linux. Because change notifications
+are unreliable or unavailable on some file systems, like network shares, the directories are also polled. A file is
+considered completely written, after its size and modification time did not change for the watch interval.
+
+The output files of each source file are written into its own subdirectory of the output directory, named after the
+source file. If a source file name is reused, for example by a scanner numbering its files per day, a numbered variant
+of the subdirectory is used, so that earlier output files are never replaced.
+
+Only a bounded number of images is submitted to the worker processes at any time. Further files that are ready wait
+as paths in a queue, so that a burst of new files does not fill the memory with queued work.
+
+Progress is reported like in batch mode, one JSON object per line:
+
+- {"event": "watching", "directories": […]} after startup.
+- {"event": "image", "path": …, "status": "ok" or "error", "outputs": […], "error": …, "moved_to": …, "finished": i}
+  for each processed image.
+- {"event": "finished", "succeeded": …, "failed": …, "interrupted": …, "seconds": …} after termination.
+"""
+
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import os
+from pathlib import Path
+import signal
+import sys
+import time
+import typing
+
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QCoreApplication, QFileSystemWatcher, QObject, QTimer
+
+from visual_image_splitter.argument_parser import Namespace
+from visual_image_splitter.batch import BatchJob, run_job, report, EXIT_SUCCESS, EXIT_USAGE, EXIT_INTERRUPTED
+from visual_image_splitter.model import encoder_settings
+from visual_image_splitter.model import save_job
+from visual_image_splitter.model.image import supported_file_formats
+from visual_image_splitter.model.selection_preset import SelectionPreset
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Subdirectories of each watched directory
+OUTPUT_DIRECTORY = "output"
+PROCESSED_DIRECTORY = "processed"
+FAILED_DIRECTORY = "failed"
+
+
+class _Observation(typing.NamedTuple):
+    size: int
+    modified: int  # Modification time in nanoseconds
+    since: float  # Monotonic time of the first observation with this size and modification time
+
+
+def _unused_path(path: Path) -> Path:
+    """Returns path, if it does not exist. Otherwise, a numbered variant of it that does not exist."""
+    result = path
+    number = 1
+    while result.exists():
+        result = path.with_name(f"{path.stem}.{number}{path.suffix}")
+        number += 1
+    return result
+
+
+def _create_unused_directory(path: Path) -> Path:
+    """
+    Creates and returns the directory path, if it does not exist. Otherwise, a numbered variant of it that did not
+    exist. Creating the directory reserves the name, so that later calls do not return the same directory.
+    :raises OSError: If creating the directory fails for other reasons
+    """
+    result = path
+    number = 1
+    while True:
+        try:
+            result.mkdir()
+        except FileExistsError:
+            result = path.with_name(f"{path.name}.{number}")
+            number += 1
+        else:
+            return result
+
+
+class HotFolder(QObject):
+    """
+    Watches directories and splits new image files using a pool of worker processes.
+    Must be used from a thread running a Qt event loop.
+    """
+
+    # Emitted by the process pool management thread, when a job is done. Delivered in the thread of this object.
+    job_done = pyqtSignal(concurrent.futures.Future)
+    # Emitted after stop() was called and all running jobs are finished
+    stopped = pyqtSignal()
+
+    def __init__(self, args: Namespace, output: typing.TextIO, parent: QObject = None):
+        super(HotFolder, self).__init__(parent)
+        self.directories = [Path(directory).resolve() for directory in args.watch_directories]
+        self.interval = args.watch_interval
+        self.output = output
+        self.exit_status = EXIT_SUCCESS
+        self.succeeded = self.failed = 0
+        self.jobs = args.jobs
+        # One queued job per worker process keeps the workers busy, while the next job is sent to them.
+        self.max_running_jobs = 2 * args.jobs
+        self.presets = [SelectionPreset(*selection) for selection in args.selections]
+        self.region_decoding = args.region_decoding
+        self.lossless_jpeg = args.lossless_jpeg
+        self.encoder_settings = encoder_settings.from_namespace(args)
+        self.sync = args.sync
+        self.detect_photos = args.detect_photos
+        self.file_formats = set(supported_file_formats())
+        self.process_pool = save_job.create_process_pool(args.jobs)
+        self._observations: typing.Dict[Path, _Observation] = {}
+        self._ready: typing.Deque[Path] = collections.deque()
+        # Maps running jobs to the source file, the output directory and the process pool running the job
+        self._running: typing.Dict[
+            concurrent.futures.Future, typing.Tuple[Path, Path, concurrent.futures.Executor]] = {}
+        # Files in _ready or _running and files that could not be moved after processing. These are not observed.
+        self._ignored: typing.Set[Path] = set()
+        self._is_stopping = False
+        self._start_time = time.perf_counter()
+        self.file_system_watcher = QFileSystemWatcher(self)
+        self.file_system_watcher.directoryChanged.connect(self.scan)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(int(self.interval * 1000))
+        self.poll_timer.timeout.connect(self.scan)
+        # Checks new files again, as soon as they may have settled.
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.timeout.connect(self.scan)
+        self.job_done.connect(self._on_job_done)
+
+    def start(self):
+        for directory in self.directories:
+            for subdirectory in (OUTPUT_DIRECTORY, PROCESSED_DIRECTORY, FAILED_DIRECTORY):
+                (directory / subdirectory).mkdir(exist_ok=True)
+        failed = self.file_system_watcher.addPaths([str(directory) for directory in self.directories])
+        if failed:
+            logger.warning(f"Change notifications are not available for {failed}. Only polling these directories.")
+        self.poll_timer.start()
+        logger.info(f"Watching {len(self.directories)} directories for new images.")
+        report(self.output, "watching", directories=[str(directory) for directory in self.directories])
+        self.scan()
+
+    @pyqtSlot()
+    @pyqtSlot(str)
+    def scan(self, _changed_directory: str = None):
+        """
+        Observes the files in all watched directories and submits files that did not change for the watch interval.
+        """
+        if self._is_stopping:
+            return
+        now = time.monotonic()
+        present: typing.Set[Path] = set()
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.error(f"Scanning watched directory {directory} failed: {e}")
+                continue
+            for entry in entries:
+                path = Path(entry.path)
+                if entry.name.startswith(".") or path.suffix.lower()[1:] not in self.file_formats \
+                        or path in self._ignored:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    # Removed since the directory was listed
+                    continue
+                present.add(path)
+                previous = self._observations.get(path)
+                if previous is None or (previous.size, previous.modified) != (stat.st_size, stat.st_mtime_ns):
+                    self._observations[path] = _Observation(stat.st_size, stat.st_mtime_ns, now)
+                elif now - previous.since >= self.interval:
+                    logger.debug(f"File {path} is complete.")
+                    del self._observations[path]
+                    self._ready.append(path)
+                    self._ignored.add(path)
+        for path in set(self._observations).difference(present):
+            # Removed before being completely written
+            del self._observations[path]
+        self._submit_ready_jobs()
+        if self._observations:
+            settled = min(observation.since for observation in self._observations.values()) + self.interval
+            self.settle_timer.start(max(0, int((settled - now) * 1000)))
+
+    def stop(self, exit_status: int = EXIT_SUCCESS):
+        """
+        Stops watching. Running jobs are finished, files waiting in the queue are left in the watched directories.
+        Emits stopped afterwards.
+        """
+        if self._is_stopping:
+            return
+        logger.info(f"Stopping. Waiting for {len(self._running)} running jobs to finish.")
+        self._is_stopping = True
+        self.exit_status = exit_status
+        self.poll_timer.stop()
+        self.settle_timer.stop()
+        self._ready.clear()
+        if not self._running:
+            self._finish()
+
+    def _submit_ready_jobs(self):
+        while self._ready and len(self._running) < self.max_running_jobs:
+            path = self._ready.popleft()
+            try:
+                output_directory = _create_unused_directory(path.parent / OUTPUT_DIRECTORY / path.stem)
+            except OSError as e:
+                logger.error(f"Creating the output directory for {path} failed: {e}")
+                self._report_failure(path, e)
+                continue
+            job = BatchJob(
+                path, self.presets, self.region_decoding, self.lossless_jpeg, self.encoder_settings, self.sync,
+                output_directory, self.detect_photos
+            )
+            try:
+                future = self.process_pool.submit(run_job, job)
+            except concurrent.futures.process.BrokenProcessPool as e:
+                # The pool broke since the last job finished, but before its result was handled.
+                logger.error(f"Submitting image {path} failed: {e!r}")
+                self._replace_process_pool()
+                self._remove_empty_directory(output_directory)
+                self._report_failure(path, e)
+                continue
+            self._running[future] = path, output_directory, self.process_pool
+            future.add_done_callback(self.job_done.emit)
+        if self._ready:
+            logger.debug(f"{len(self._ready)} files are waiting for a free worker.")
+
+    @pyqtSlot(concurrent.futures.Future)
+    def _on_job_done(self, future: concurrent.futures.Future):
+        path, output_directory, process_pool = self._running.pop(future)
+        try:
+            outputs = future.result()
+        except Exception as e:
+            # Includes unexpected errors, like pickling errors. An exception escaping this slot would abort the program.
+            logger.error(f"Splitting image {path} failed: {e!r}")
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool) and process_pool is self.process_pool:
+                # A worker process died, for example killed because of memory exhaustion. The pool is unusable now.
+                self._replace_process_pool()
+            self._remove_empty_directory(output_directory)
+            self._report_failure(path, e)
+        else:
+            self.succeeded += 1
+            moved_to = self._move_source(path, PROCESSED_DIRECTORY)
+            report(
+                self.output, "image", path=str(path), status="ok", outputs=[str(output) for output in outputs],
+                error=None, moved_to=moved_to and str(moved_to), finished=self.succeeded + self.failed
+            )
+            if moved_to is not None:
+                self._ignored.discard(path)
+        if self._is_stopping:
+            if not self._running:
+                self._finish()
+        else:
+            self._submit_ready_jobs()
+
+    def _replace_process_pool(self):
+        """Replaces the broken process pool. Its remaining jobs already failed, so it is not waited for."""
+        logger.warning("Replacing the broken process pool.")
+        self.process_pool.shutdown(wait=False)
+        self.process_pool = save_job.create_process_pool(self.jobs)
+
+    def _report_failure(self, path: Path, error: Exception):
+        """Counts the source file as failed and moves it into the failed subdirectory."""
+        self.failed += 1
+        moved_to = self._move_source(path, FAILED_DIRECTORY)
+        report(
+            self.output, "image", path=str(path), status="error", outputs=[], error=str(error),
+            moved_to=moved_to and str(moved_to), finished=self.succeeded + self.failed
+        )
+        if moved_to is not None:
+            self._ignored.discard(path)
+
+    @staticmethod
+    def _remove_empty_directory(directory: Path):
+        try:
+            directory.rmdir()
+        except OSError:
+            # Not empty, because some output files were written before the job failed.
+            pass
+
+    @staticmethod
+    def _move_source(path: Path, subdirectory: str) -> typing.Optional[Path]:
+        """
+        Moves the processed source file into the given subdirectory. Returns the new path, or None, if moving failed.
+        """
+        target = _unused_path(path.parent / subdirectory / path.name)
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            # The file stays ignored, so that it is not processed again.
+            logger.error(f"Moving processed file {path} to {target} failed: {e}")
+            return None
+        return target
+
+    def _finish(self):
+        self.file_system_watcher.removePaths(self.file_system_watcher.directories())
+        self.process_pool.shutdown(wait=True)
+        report(
+            self.output, "finished", succeeded=self.succeeded, failed=self.failed,
+            interrupted=self.exit_status == EXIT_INTERRUPTED, seconds=round(time.perf_counter() - self._start_time, 3)
+        )
+        logger.info(f"Stopped watching. Split {self.succeeded} images, {self.failed} failed.")
+        self.stopped.emit()
+
+
+def run(args: Namespace, output: typing.TextIO = None) -> int:
+    """
+    Watches the directories given on the command line, until SIGINT or SIGTERM is received.
+    :param args: Parsed command line arguments
+    :param output: Text stream receiving the progress events. Defaults to the standard output.
+    :returns: The process exit status. One of the EXIT_* constants of the batch module.
+    """
+    if output is None:
+        output = sys.stdout
+    missing = [directory for directory in args.watch_directories if not Path(directory).is_dir()]
+    if missing or not (args.selections or args.detect_photos):
+        logger.error(
+            f"Watch mode requires at least one selection or photo detection and existing directories. "
+            f"Missing: {missing}"
+        )
+        return EXIT_USAGE
+    # The event loop is required for change notifications and timers. QCoreApplication does not require a display.
+    application = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    hot_folder = HotFolder(args, output)
+    hot_folder.stopped.connect(application.quit)
+    signal.signal(signal.SIGINT, lambda *_: hot_folder.stop(EXIT_INTERRUPTED))
+    signal.signal(signal.SIGTERM, lambda *_: hot_folder.stop(EXIT_SUCCESS))
+    # Python signal handlers only run, when the interpreter is executing. Regularly enter it from the event loop.
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(500)
+    hot_folder.start()
+    application.exec_()
+    return hot_folder.exit_status
@@ -32,7 +32,9 @@ def get_logger(full_module_path: str) -> logging.Logger:
 def configure_root_logger(args: Namespace):
     """Initialise logging system"""
     root_logger.setLevel(1)
-    handler = logging.StreamHandler(sys.stdout)
+    # In batch mode, the standard output is reserved for machine-readable progress reports, and for the results of the
+    # encoder benchmark.
+    handler = logging.StreamHandler(sys.stderr if args.batch or args.benchmark_encoders else sys.stdout)
     handler.setLevel(logging.DEBUG if args.verbose else logging.INFO)
     handler.setFormatter(logging.Formatter(LOG_FORMAT))
     root_logger.addHandler(handler)
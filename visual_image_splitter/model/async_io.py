@@ -50,7 +50,22 @@ class ModelWorker(QObject):
         logger.info("Opening a list of files")
         self.model._open_images(path_list)
 
+    @pyqtSlot(list)
+    def fetch_images(self, items: list):
+        logger.debug(f"Fetching {len(items)} images into the model")
+        self.model._fetch_images(items)
+
     @pyqtSlot(QModelIndex, bool)
     def close_image(self, model_index: QModelIndex, save_selections: bool):
         logger.info(f"Closing a file. Index={model_index}, Save selections={save_selections}")
         self.model._close_image(model_index, save_selections)
+
+    @pyqtSlot(str)
+    def import_manifest(self, manifest_path: str):
+        logger.info("Importing a job manifest")
+        self.model._import_manifest(manifest_path)
+
+    @pyqtSlot(str)
+    def export_manifest(self, manifest_path: str):
+        logger.info("Exporting a job manifest")
+        self.model._export_manifest(manifest_path)
@@ -0,0 +1,60 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Extracts selections from decoded image data. Instead of copying the selected pixels, a view is created whenever
+possible: A QImage that references the pixel buffer of the full image, starting at the top left pixel of the region and
+using the scan line length of the full image. Encoding a view reads the pixels directly from the full image buffer.
+"""
+
+from PyQt5 import sip
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+
+def can_create_view(image: QImage, region: QRect) -> bool:
+    """
+    Returns True, if a view of the given region can be created. The region has to lie inside the image, pixels have to
+    start at byte boundaries and Qt requires the first pixel to be 32-bit aligned.
+    """
+    if image.isNull() or not image.rect().contains(region) or image.depth() % 8:
+        return False
+    return not (region.x() * image.depth() // 8) % 4
+
+
+def extract_region(image: QImage, region: QRect) -> QImage:
+    """
+    Returns the given region of the image. The result is a view referencing the image buffer, if possible.
+    Otherwise, it is a copy. Views are read-only and keep the full image alive as long as they exist.
+    """
+    if not can_create_view(image, region):
+        logger.debug(f"Copying region {region}, because a view is not possible. Image format: {image.format()}")
+        return image.copy(region)
+    # constBits() does not detach the image, so the buffer is shared with all other copies of the image.
+    address = int(image.constBits()) + region.y() * image.bytesPerLine() + region.x() * image.depth() // 8
+    view = QImage(sip.voidptr(address), region.width(), region.height(), image.bytesPerLine(), image.format())
+    # The view does not own the buffer, so reference the full image to keep the buffer alive.
+    view.source_image = image
+    if image.colorCount():
+        view.setColorTable(image.colorTable())
+    view.setDotsPerMeterX(image.dotsPerMeterX())
+    view.setDotsPerMeterY(image.dotsPerMeterY())
+    for key in image.textKeys():
+        view.setText(key, image.text(key))
+    return view
@@ -0,0 +1,133 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import typing
+
+from PyQt5.QtGui import QImageWriter
+
+from visual_image_splitter.argument_parser import Namespace
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+TIFF_COMPRESSION_METHODS = ("none", "lzw")
+
+
+class EncoderSettings(typing.NamedTuple):
+    """
+    Settings used to encode the output files. Settings that are None keep the Qt default of the image format.
+    """
+    jpeg_quality: typing.Optional[int] = None  # 0 to 100
+    jpeg_progressive: typing.Optional[bool] = None
+    jpeg_optimize: typing.Optional[bool] = None  # Optimize the Huffman tables. Slower, but smaller files.
+    png_compression: typing.Optional[int] = None  # zlib compression level, 0 to 9
+    tiff_compression: typing.Optional[str] = None  # One of TIFF_COMPRESSION_METHODS
+
+    def apply(self, writer: QImageWriter, image_format: str):
+        """
+        Configure the given writer for the given output image format. Settings not applicable to the format are ignored.
+        :param writer: The QImageWriter to configure
+        :param image_format: The output image format, like "jpg" or "png"
+        """
+        image_format = image_format.lower()
+        if image_format in ("jpg", "jpeg"):
+            if self.jpeg_quality is not None:
+                writer.setQuality(self.jpeg_quality)
+            if self.jpeg_progressive is not None:
+                writer.setProgressiveScanWrite(self.jpeg_progressive)
+            if self.jpeg_optimize is not None:
+                writer.setOptimizedWrite(self.jpeg_optimize)
+        elif image_format == "png" and self.png_compression is not None:
+            # The Qt PNG handler derives the zlib compression level from the quality: level = (100-quality)*9/91
+            writer.setQuality(100 - math.ceil(self.png_compression * 91 / 9))
+        elif image_format in ("tif", "tiff") and self.tiff_compression is not None:
+            writer.setCompression(TIFF_COMPRESSION_METHODS.index(self.tiff_compression))
+
+    def merged(self, overrides: "EncoderSettings") -> "EncoderSettings":
+        """Returns new settings, where all settings that are not None in overrides replace the settings of self."""
+        return self._replace(**{key: value for key, value in overrides._asdict().items() if value is not None})
+
+
+PRESETS: typing.Dict[str, EncoderSettings] = {
+    # Fastest encoding, for intermediate files. Larger files.
+    "fast": EncoderSettings(
+        jpeg_quality=90, jpeg_progressive=False, jpeg_optimize=False, png_compression=1, tiff_compression="none"
+    ),
+    "balanced": EncoderSettings(
+        jpeg_quality=90, jpeg_progressive=False, jpeg_optimize=True, png_compression=6, tiff_compression="lzw"
+    ),
+    # Smallest files, for archiving. Slow.
+    "small": EncoderSettings(
+        jpeg_quality=85, jpeg_progressive=True, jpeg_optimize=True, png_compression=9, tiff_compression="lzw"
+    ),
+}
+
+
+def from_json(value: typing.Any) -> EncoderSettings:
+    """
+    Parses per-image encoder settings, as stored in job manifests. value is an object containing any of the
+    EncoderSettings fields and optionally a "preset" name. Like on the command line, the fields override the preset.
+    :raises ValueError: If value is not valid.
+    """
+    if not isinstance(value, dict):
+        raise ValueError("Expected the encoder settings to be an object")
+    unknown = set(value).difference(EncoderSettings._fields, ("preset",))
+    if unknown:
+        raise ValueError(f"Unknown encoder settings: {sorted(unknown)}")
+    preset = value.get("preset")
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"Expected the encoder preset to be one of {sorted(PRESETS)}, got {preset!r}")
+    for name, maximum in (("jpeg_quality", 100), ("png_compression", 9)):
+        setting = value.get(name)
+        if setting is not None and not (
+                isinstance(setting, int) and not isinstance(setting, bool) and 0 <= setting <= maximum):
+            raise ValueError(f"Expected \"{name}\" to be an integer between 0 and {maximum}, got {setting!r}")
+    for name in ("jpeg_progressive", "jpeg_optimize"):
+        if not isinstance(value.get(name, False), bool):
+            raise ValueError(f"Expected \"{name}\" to be true or false, got {value[name]!r}")
+    if value.get("tiff_compression") not in (None, *TIFF_COMPRESSION_METHODS):
+        raise ValueError(
+            f"Expected \"tiff_compression\" to be one of {TIFF_COMPRESSION_METHODS}, got {value['tiff_compression']!r}"
+        )
+    settings = EncoderSettings() if preset is None else PRESETS[preset]
+    return settings.merged(EncoderSettings(**{key: value[key] for key in EncoderSettings._fields if key in value}))
+
+
+def to_json(settings: EncoderSettings) -> typing.Dict[str, typing.Any]:
+    """Returns the settings that are not None as a JSON compatible dictionary. The inverse of from_json()."""
+    return {key: value for key, value in settings._asdict().items() if value is not None}
+
+
+def from_arguments(preset: typing.Optional[str], overrides: EncoderSettings) -> EncoderSettings:
+    """
+    Creates the encoder settings from the command line arguments.
+    :param preset: Name of the preset in PRESETS, or None to start with the Qt default settings.
+    :param overrides: Individually given settings. These take precedence over the preset.
+    """
+    settings = EncoderSettings() if preset is None else PRESETS[preset]
+    settings = settings.merged(overrides)
+    logger.info(f"Using encoder settings {settings}")
+    return settings
+
+
+def from_namespace(args: Namespace) -> EncoderSettings:
+    """Creates the encoder settings from the parsed command line arguments."""
+    return from_arguments(
+        args.encoder_preset,
+        EncoderSettings(
+            args.jpeg_quality, args.jpeg_progressive, args.jpeg_optimize, args.png_compression, args.tiff_compression
+        )
+    )
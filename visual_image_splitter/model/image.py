@@ -13,24 +13,59 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 from pathlib import Path
+import threading
 import typing
 import enum
 
-from PyQt5.QtCore import pyqtSignal, QObject, QThread, QVariant, Qt
-from PyQt5.QtGui import QImage, QImageReader, QImageWriter, QPixmap
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import pyqtSignal, QObject, QVariant, QSize, QRect, Qt, QByteArray, QBuffer, QIODevice
+from PyQt5.QtGui import QImage, QImageReader, QImageWriter, QImageIOHandler, QPixmap
 
 from .selection import Selection
+from .lru_cache import LRUCache
+from .encoder_settings import EncoderSettings
+from .output_writer import OutputWriter, write_file_atomically
+from .crop import extract_region
+from . import preview
+from . import rows
+from . import lossless_jpeg as lossless_jpeg_cropping
 
 if typing.TYPE_CHECKING:
     from .model import Model
+    from .thumbnail_cache import ThumbnailCache
 
 from visual_image_splitter.logger import get_logger
 logger = get_logger(__name__)
 del get_logger
 
 
+# Supported values for the region_decoding parameter of Image.write_output()
+REGION_DECODING_MODES = ("auto", "always", "never")
+ImageDataCache = LRUCache[Path, QImage]
+EncodedDataCache = LRUCache[Path, QByteArray]
+
+
+def create_image_data_cache(budget: int) -> ImageDataCache:
+    """Creates a cache for decoded full resolution image data, limited to budget bytes."""
+    return LRUCache(budget, QImage.sizeInBytes, "Image data cache")
+
+
+def create_encoded_data_cache(budget: int) -> EncodedDataCache:
+    """Creates a cache for the raw, encoded content of image files, limited to budget bytes."""
+    return LRUCache(budget, QByteArray.size, "Encoded data cache")
+
+
+def supported_file_formats() -> typing.List[str]:
+    """
+    Returns all supported file types. This is the intersection of readable and writable file formats, because output
+    files are written in the format of the source image.
+    """
+    supported_input_formats = set(f.data().decode("utf-8") for f in QImageReader.supportedImageFormats())
+    supported_output_formats = set(f.data().decode("utf-8") for f in QImageWriter.supportedImageFormats())
+    return sorted(supported_input_formats.intersection(supported_output_formats))
+
+
 @enum.unique
 class Columns(enum.IntEnum):
     IMAGE = 0
@@ -38,33 +73,132 @@ class Columns(enum.IntEnum):
     OUTPUT_PATH = 2
 
 
+class _WriteProgress:
+    """
+    Thread safe progress counter for writing the selections of an image. Each selection has two steps, extracting and
+    writing. Selections may finish in any order, so the progress is derived from the number of finished steps.
+    """
+
+    def __init__(self, signal: pyqtSignal, total_steps: int):
+        self._signal = signal
+        self._total_steps = total_steps
+        self._finished_steps = 0
+        self._lock = threading.Lock()
+
+    def step(self, count: int = 1) -> float:
+        """Marks count steps as finished. Emits and returns the new progress in percent."""
+        with self._lock:
+            self._finished_steps += count
+            percent = 100*self._finished_steps/self._total_steps
+            self._signal.emit(int(percent))
+        return percent
+
+
 class Image(QObject):
     """This class models an opened image file."""
     write_output_progress = pyqtSignal(int)
+    # Emitted with the Image instance as the argument, after the low resolution preview image was created.
+    preview_loaded = pyqtSignal(QObject)
 
-    QT_COLUMN_COUNT = 3  # Number of columns. Used in the Qt Model API.
+    QT_COLUMN_COUNT = len(Columns)  # Number of columns. Used in the Qt Model API.
 
-    def __init__(self, source_file: Path, parent: QObject = None):
+    def __init__(self, source_file: Path, parent: QObject = None, image_data_cache: ImageDataCache = None,
+                 encoded_data_cache: EncodedDataCache = None):
+        """
+        :param source_file: Path to the image file
+        :param parent: Optional parent object
+        :param image_data_cache: Cache holding the decoded full resolution image data. It is shared between all Image
+          instances to limit the total memory usage. If not given, the image data is not kept after use.
+        :param encoded_data_cache: Cache holding the encoded file content. If given with a non-zero budget, the file
+          is read only once and all decoding is done from memory. If not given, the file is read on each decode.
+        """
         super(Image, self).__init__(parent)
         self.image_path: Path = source_file.expanduser()
         self.selections: typing.List[Selection] = []
         self.low_resolution_image: typing.Optional[QPixmap] = None
-        self.output_path: Path = source_file.parent
-        self.image_data: QImage = None  # Will be overwritten. load_image_data() raises an Error, if the loading fails
+        # Model data for the Qt item views, by column and role. Cleared, when the preview or the output path changes.
+        self._role_data: typing.Dict[typing.Tuple[int, int], QVariant] = {}
+        self._output_path: Path = source_file.parent
+        self.cached_row = 0  # Position in the Model. See the rows module.
+        self.encoder_settings = EncoderSettings()
+        # Settings of this image only, like given in a job manifest. Already merged into encoder_settings.
+        self.encoder_overrides = EncoderSettings()
+        self.image_data_cache: ImageDataCache = image_data_cache if image_data_cache is not None \
+            else create_image_data_cache(0)
+        self.encoded_data_cache: EncodedDataCache = encoded_data_cache if encoded_data_cache is not None \
+            else create_encoded_data_cache(0)
         self._width: int = 0
         self._height: int = 0
         self.load_meta_data()
         logger.info(f"Created Image instance with source file: {source_file}")
 
     def load_meta_data(self):
-        if not self.has_image_data:
-            self.load_image_data()
-        self._width = self.image_data.width()
-        self._height = self.image_data.height()
-        logger.debug(f"Scaling low resolution image to resolution: {self._scaled_to_resolution(800)}")
-        self.low_resolution_image = QPixmap.fromImage(
-            self.image_data.scaled(*self._scaled_to_resolution(800), transformMode=Qt.SmoothTransformation)
-        )
+        """
+        Reads the image dimensions from the file header, without decoding the image data. This is cheap enough to
+        be done for every opened file. The image data is only decoded as a fallback, if the format does not store
+        the image size in the header. If the encoded data cache is enabled, the file is read only once for both.
+        """
+        size = self._create_image_reader().size()
+        if size.isValid():
+            self._width = size.width()
+            self._height = size.height()
+        else:
+            logger.debug("Image size not available from the file header. Decoding the full image instead.")
+            image_data = self.load_image_data()
+            self._width = image_data.width()
+            self._height = image_data.height()
+
+    def load_preview(self, thumbnail_cache: "ThumbnailCache" = None):
+        """
+        Creates the low resolution preview image and emits preview_loaded afterwards. See read_preview().
+        """
+        self.set_preview(self.read_preview(thumbnail_cache))
+
+    def read_preview(self, thumbnail_cache: "ThumbnailCache" = None) -> QImage:
+        """
+        Returns the low resolution preview image, without storing it. Unlike load_preview(), this does not require
+        a QGuiApplication.
+        If a thumbnail cache is given, a cached preview is used, if available. Newly created previews are added to it.
+        If the cache stores larger thumbnails than the preview size, these are created at the cache size and scaled
+        down afterwards.
+        If the image format supports it, the preview is decoded directly at the reduced size, without decoding
+        the full resolution image data. Otherwise, the full image is decoded and scaled down. In that case, the full
+        resolution image data is not kept, unless it was already loaded.
+        """
+        preview_size = preview.preview_size(self.width, self.height)
+        if thumbnail_cache is None:
+            return self._create_preview(preview_size)
+        thumbnail_size = preview.preview_size(self.width, self.height, thumbnail_cache.resolution)
+        low_resolution_image = thumbnail_cache.load(self.image_path, thumbnail_size)
+        if low_resolution_image is None:
+            low_resolution_image = self._create_preview(thumbnail_size)
+            thumbnail_cache.store(self.image_path, low_resolution_image)
+        if low_resolution_image.size() != preview_size:
+            low_resolution_image = preview.scale_to_size(low_resolution_image, preview_size)
+        return low_resolution_image
+
+    def set_preview(self, low_resolution_image: QImage):
+        """Uses the given image as the low resolution preview image and emits preview_loaded afterwards."""
+        self.low_resolution_image = QPixmap.fromImage(low_resolution_image)
+        self.invalidate_role_data()
+        logger.debug(f"Loaded low resolution preview image for {self.image_path}")
+        self.preview_loaded.emit(self)
+
+    def _create_preview(self, preview_size: QSize) -> QImage:
+        low_resolution_image = None
+        image_data = self.image_data
+        if image_data is None:
+            low_resolution_image = preview.read_reduced_size_preview(self._create_image_reader(), preview_size)
+            if low_resolution_image is None:
+                logger.debug("Reduced size decoding unavailable. Scaling the full resolution image instead.")
+                image_data = self._read_image_data()
+        if low_resolution_image is None:
+            low_resolution_image = preview.scale_to_size(image_data, preview_size)
+        return low_resolution_image
+
+    @property
+    def has_preview(self) -> bool:
+        return self.low_resolution_image is not None
 
     def add_selection(self, selection: Selection):
         """
@@ -73,8 +207,16 @@ class Image(QObject):
         :param selection: the to be added Selection
         """
         logger.info(f"Adding a new selection: {selection}")
+        selection.cached_row = len(self.selections)
         self.selections.append(selection)
 
+    def add_selections(self, selections: typing.Iterable[Selection]):
+        """Add multiple selections for this Image at once. Cheaper than add_selection(), when adding many."""
+        count = len(self.selections)
+        self.selections += selections
+        rows.renumber(self.selections, count)
+        logger.debug(f"Added {len(self.selections) - count} selections to {self.image_path}")
+
     def row_count(self) -> int:
         """Returns the number of selections. This is the number of child rows in the Qt TreeModel."""
         return len(self.selections)
@@ -82,10 +224,36 @@ class Image(QObject):
     @staticmethod
     def column_count() -> int:
         """Number of Qt TreeModel columns. This contains the image data, image path and the output path."""
-        return len(Columns)
+        return Image.QT_COLUMN_COUNT
+
+    @property
+    def output_path(self) -> Path:
+        return self._output_path
+
+    @output_path.setter
+    def output_path(self, output_path: Path):
+        self._output_path = output_path
+        self.invalidate_role_data()
+
+    def invalidate_role_data(self):
+        """Drops the cached model data, so that data() creates it again."""
+        self._role_data.clear()
 
     def data(self, column: int, role: int = Qt.DisplayRole) -> QVariant:
-        """Qt Model function. Returns the own data using the Qt model API"""
+        """
+        Qt Model function. Returns the own data using the Qt model API. Views request the same data over and over,
+        so it is created once and cached.
+        """
+        if role == Qt.UserRole and column == Columns.IMAGE:
+            # Not cached, because it references this instance.
+            return QVariant(self)
+        try:
+            return self._role_data[column, role]
+        except KeyError:
+            result = self._role_data[column, role] = self._create_data(column, role)
+            return result
+
+    def _create_data(self, column: int, role: int) -> QVariant:
         if column not in range(0, Selection.QT_COLUMN_COUNT):
             # Short-cut invalid columns now
             return QVariant()
@@ -128,47 +296,98 @@ class Image(QObject):
         else:
             # Look up the own position (row) in the parent model class.
             model: Model = self.parent()
-            row = model.images.index(self)
+            row = rows.row_of(self, model.images)
         return row
 
     def child(self, row: int) -> Selection:
         """Qt Model function. Returns the Selection at the given child row. or None, if it does not exist."""
         return self.selections[row] if 0 <= row < len(self.selections) else None
 
+    @property
+    def image_data(self) -> typing.Optional[QImage]:
+        """The decoded full resolution image data, if currently cached. Use load_image_data() to access the data."""
+        return self.image_data_cache.peek(self.image_path)
+
     @property
     def has_image_data(self) -> bool:
-        return self.image_data is not None
+        return self.image_path in self.image_data_cache
 
     def load_image_data(self) -> QImage:
         """
-        Loads the image data from disk. This has to be called when the file content needs to be accessed.
+        Returns the full resolution image data. It is loaded from disk, if it is not cached. This has to be called
+        when the file content needs to be accessed. Callers must keep the returned reference as long as they need the
+        data, because the cache may drop it at any time.
         :return:
         """
+        image_data = self.image_data_cache.get(self.image_path)
+        if image_data is None:
+            image_data = self._read_image_data()
+            self.image_data_cache.put(self.image_path, image_data)
+        return image_data
+
+    def _read_image_data(self) -> QImage:
+        """Reads and returns the full resolution image data from disk, without storing it in this Image instance."""
         logger.debug(f"Requested loading image data from the hard disk. File: {self.image_path}")
-        image_reader = QImageReader(str(self.image_path))
+        image_reader = self._create_image_reader()
         if image_reader.canRead():
             logger.debug("Image data can be read, performing file reading…")
-            self.image_data = image_reader.read()
+            image_data = image_reader.read()
+            if image_data.isNull():
+                raise RuntimeError(f"Image {self.image_path} cannot be read: {image_reader.errorString()}")
             logger.info(
                 f"File reading done. Loaded image dimensions: "
-                f"x={self.image_data.width()}, y={self.image_data.height()}, format={self.image_data.format()}"
+                f"x={image_data.width()}, y={image_data.height()}, format={image_data.format()}"
             )
-            return self.image_data
+            return image_data
         else:
             raise RuntimeError(f"Image {self.image_path} cannot be read.")
 
+    def _create_image_reader(self) -> QImageReader:
+        """
+        Returns a QImageReader for the image file. If the encoded data cache is enabled, the reader decodes from the
+        cached file content in memory. This avoids re-reading the file from disk or a network share on each decode.
+        """
+        if not self.encoded_data_cache.budget:
+            return QImageReader(str(self.image_path))
+        buffer = QBuffer()
+        buffer.setData(self.load_encoded_data())
+        buffer.open(QIODevice.ReadOnly)
+        # Use the file name suffix as the format hint, like QImageReader does when reading from a file.
+        # It falls back to detecting the format from the content, if the hint is wrong.
+        image_reader = QImageReader(buffer, self.image_path.suffix[1:].lower().encode())
+        # QImageReader does not take ownership of the device, so bind the buffer lifetime to the reader.
+        image_reader.source_buffer = buffer
+        return image_reader
+
+    def load_encoded_data(self) -> QByteArray:
+        """
+        Returns the encoded file content. It is read from disk using a single read, if it is not cached.
+        :raises RuntimeError: If the file can not be read.
+        """
+        encoded_data = self.encoded_data_cache.get(self.image_path)
+        if encoded_data is None:
+            logger.debug(f"Reading encoded file content into memory. File: {self.image_path}")
+            try:
+                with open(self.image_path, "rb") as image_file:
+                    encoded_data = QByteArray(image_file.read())
+            except OSError as e:
+                raise RuntimeError(f"Image {self.image_path} cannot be read: {e}") from e
+            self.encoded_data_cache.put(self.image_path, encoded_data)
+        return encoded_data
+
     def clear_image_data(self):
         """Images can be large at high resolutions, a 600DPI scanned image can be over 100MiB in size. Keeping hundreds
-        loaded at runtime is infeasible, so the image data has to be cleared if not used."""
-        if self.image_data is not None:
+        loaded at runtime is infeasible, so the image data cache has a limited memory budget. This drops the decoded and
+        encoded data of this image from the caches immediately, for example when the image is closed."""
+        if self.has_image_data:
             logger.debug(f"Deleting loaded image file data for Image {self.image_path}.")
-            self.image_data = None
+            self.image_data_cache.remove(self.image_path)
+        self.encoded_data_cache.remove(self.image_path)
 
     def remove_selection(self, selection: typing.Union[int, Selection]):
-        if isinstance(selection, Selection):
-            self.selections.remove(selection)
-        else:
-            del self.selections[selection]
+        row = rows.row_of(selection, self.selections) if isinstance(selection, Selection) else selection
+        del self.selections[row]
+        rows.renumber(self.selections, row)
 
     @property
     def width(self) -> int:
@@ -178,56 +397,194 @@ class Image(QObject):
     def height(self) -> int:
         return self._height
 
-    def write_output(self):
+    def write_output(
+            self, region_decoding: str = "auto", lossless_jpeg: bool = False,
+            executor: concurrent.futures.Executor = None,
+            is_interruption_requested: typing.Callable[[], bool] = None,
+            output_writer: OutputWriter = None) -> typing.List[Path]:
         """
         Writes all selections as output files to disk.
-        :return:
+        :param region_decoding: One of REGION_DECODING_MODES. Determines, if only the selected regions are decoded
+          instead of the full image. "auto" decodes regions, if the format supports it and it is estimated to be
+          cheaper than a full decode.
+        :param lossless_jpeg: If True and this is a JPEG file, crop the selections losslessly, without re-encoding.
+          See the lossless_jpeg module for details.
+        :param executor: Optional Executor used to extract and encode the selections concurrently. All selections
+          share the decoded image data. If None, the selections are written sequentially by the calling thread.
+        :param is_interruption_requested: Optional function returning True, if writing should be aborted. Selections
+          already in progress are finished, all other selections are skipped.
+        :param output_writer: Optional OutputWriter committing the encoded files in the background. If None, the files
+          are committed by the encoding thread. This method returns after all files are committed in both cases.
+        :return: Paths of the successfully written output files. Selections that failed or were skipped because of an
+          interruption are missing, so the result is shorter than the selection list in these cases.
         """
         logger.info(f"Starting to extract selections and writing output files for image {self.image_path}")
         if not self.selections:
             logger.debug("Image has no selections, do nothing.")
-            return
-        if not self.has_image_data:
-            self.load_image_data()
-        progress_step_size = 100/(len(self.selections)*2)
+            return []
+        if is_interruption_requested is None:
+            def is_interruption_requested(): return False
+        use_lossless_jpeg = lossless_jpeg and self.can_crop_losslessly()
+        if use_lossless_jpeg:
+            logger.debug("Cropping the selections losslessly.")
+            image_data = None
+        elif self._use_region_decoding(region_decoding):
+            logger.debug("Decoding only the selected regions.")
+            image_data = None
+        else:
+            image_data = self.load_image_data()
+        progress = _WriteProgress(self.write_output_progress, len(self.selections)*2)
         self.write_output_progress.emit(0)
-        worker_thread: QThread = QApplication.instance().model.worker_thread
-        for index, selection in enumerate(self.selections, start=1):
-            if worker_thread.isInterruptionRequested():
+        commits: typing.List[concurrent.futures.Future] = []
+
+        def write_selection(index: int, selection: Selection):
+            if is_interruption_requested():
                 logger.warning("Requested worker thread interruption. Aborting writing selections to files.")
-                break
-            self._write_selection_to_output_file(index, selection, progress_step_size)
+                return
+            commit = self._write_selection_to_output_file(
+                image_data, index, selection, progress, use_lossless_jpeg, output_writer)
+            if commit is not None:
+                commits.append(commit)
+
+        # The index is bound before the work is distributed, so the output file numbering does not depend on the
+        # order in which selections are finished.
+        if executor is None:
+            for index, selection in enumerate(self.selections, start=1):
+                write_selection(index, selection)
+        else:
+            pending = [
+                executor.submit(write_selection, index, selection)
+                for index, selection in enumerate(self.selections, start=1)
+            ]
+            try:
+                for future in concurrent.futures.as_completed(pending):
+                    future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+        # Errors are already logged by the OutputWriter.
+        concurrent.futures.wait(commits)
+        return [commit.result() for commit in commits if commit.exception() is None]
+
+    def can_crop_losslessly(self) -> bool:
+        """
+        Returns True, if all selections can be cropped losslessly from the source file. This requires a JPEG file,
+        the jpegtran tool and all selections to be inside the image bounds.
+        """
+        return self._selections_inside_image() and lossless_jpeg_cropping.can_crop_losslessly(self.image_path)
+
+    def _selections_inside_image(self) -> bool:
+        image_rect = QRect(0, 0, self.width, self.height)
+        return all(image_rect.contains(selection.as_qrect) for selection in self.selections)
 
-    def _write_selection_to_output_file(self, index: int, selection: Selection, progress_step_size: float):
+    def _use_region_decoding(self, region_decoding: str) -> bool:
+        """
+        Determines, if the selections should be extracted by decoding only the selected regions. This requires format
+        support (QImageIOHandler.ClipRect) and all selections to be inside the image bounds.
+        Sequential formats like JPEG have to decode all rows above the region, so the cost of a region decode is
+        estimated by the position of its bottom edge. In auto mode, regions are decoded, if the sum of these costs
+        does not exceed a single full decode. Already decoded image data is always used, if available.
+        """
+        if region_decoding == "never" or self.has_image_data:
+            return False
+        if not self._selections_inside_image():
+            return False
+        try:
+            supports_clip_rect = self._create_image_reader().supportsOption(QImageIOHandler.ClipRect)
+        except RuntimeError:
+            return False
+        if not supports_clip_rect:
+            return False
+        if region_decoding == "always":
+            return True
+        estimated_cost = sum(selection.bottom_right.y for selection in self.selections) / self.height
+        logger.debug(f"Estimated region decoding cost: {estimated_cost:.2f} full decodes")
+        return estimated_cost <= 1
+
+    def _read_region(self, region: QRect) -> QImage:
+        """Decodes only the given region of the image. Requires format support for QImageIOHandler.ClipRect."""
+        image_reader = self._create_image_reader()
+        image_reader.setClipRect(region)
+        extract = image_reader.read()
+        if extract.isNull():
+            raise RuntimeError(f"Region {region} of image {self.image_path} cannot be read: "
+                               f"{image_reader.errorString()}")
+        return extract
+
+    def _write_selection_to_output_file(
+            self, image_data: typing.Optional[QImage], index: int, selection: Selection, progress: "_WriteProgress",
+            lossless_jpeg: bool = False,
+            output_writer: OutputWriter = None) -> typing.Optional[concurrent.futures.Future]:
         """
         Creates a new image file and writes the content of the given selection to disk.
+        :param image_data: The full resolution image data. If None, only the selected region is decoded.
         :param index: The index of this selection. This is used to build increasing file numbers for the output file.
         :param selection: The Selection in progress
-        :param progress_step_size: Float giving the current progress step size per file in percent. Used for progress
-        notifications and logging purposes.
-        :return:
+        :param progress: Counts the finished steps of all selections. Used for progress notifications and logging
+          purposes.
+        :param lossless_jpeg: If True, crop the selection losslessly from the JPEG source file.
+        :param output_writer: Optional OutputWriter used to commit the file.
+        :return: The Future of the commit, resolved with the output file path. None, if encoding failed.
         """
-        extract = self.image_data.copy(selection.as_qrect)
-        self.write_output_progress.emit(int((2 * index - 1) * progress_step_size))
-        logger.debug(f"Extracted selection. Progress: {(2*index-1)*progress_step_size:2.2f}%")
-        writer = QImageWriter(self._get_output_file_name(index))
-        if writer.canWrite():
-            writer.write(extract)
-            logger.debug(f"Written extracted selection to disk. Progress: {(2*index)*progress_step_size:2.2f}%")
+        if lossless_jpeg:
+            try:
+                cropped = lossless_jpeg_cropping.crop(self.image_path, selection.as_qrect)
+            except RuntimeError as e:
+                logger.warning(f"Lossless cropping failed, re-encoding the selection instead: {e}")
+            else:
+                logger.debug(f"Losslessly cropped selection {index}. Progress: {progress.step():2.2f}%")
+                return self._commit_output_file(index, cropped, progress, output_writer)
+            image_data = self.load_image_data()
+        if image_data is None:
+            extract = self._read_region(selection.as_qrect)
         else:
-            logger.warning(f"Image data can not be written! Offending File: {writer.fileName()}")
-        self.write_output_progress.emit(int((2 * index) * progress_step_size))
+            extract = extract_region(image_data, selection.as_qrect)
+        encoded = self.encode(extract)
+        logger.debug(f"Extracted and encoded selection {index}. Progress: {progress.step():2.2f}%")
+        if encoded is None:
+            logger.warning(f"Image data can not be written! Offending File: {self._get_output_file_name(index)}")
+            progress.step()
+            return None
+        return self._commit_output_file(index, encoded, progress, output_writer)
+
+    def encode(self, extract: QImage) -> typing.Optional[bytes]:
+        """Encodes the given image data in the format of the source image. Returns None, if encoding fails."""
+        image_format = self.image_path.suffix[1:].lower()
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        writer = QImageWriter(buffer, image_format.encode())
+        self.encoder_settings.apply(writer, image_format)
+        # write() fails for unsupported formats. Don’t check canWrite() first: PyQt holds the GIL during that call while
+        # Qt loads the format plugin, which deadlocks with threads decoding from a QBuffer at the same time.
+        if not writer.write(extract):
+            return None
+        return bytes(buffer.data())
+
+    def _commit_output_file(
+            self, index: int, data: bytes, progress: "_WriteProgress",
+            output_writer: typing.Optional[OutputWriter]) -> concurrent.futures.Future:
+        output_file_name = Path(self._get_output_file_name(index))
+        if output_writer is None:
+            # Committed synchronously, so return an already resolved Future.
+            commit = concurrent.futures.Future()
+            try:
+                write_file_atomically(output_file_name, data)
+            except OSError as e:
+                logger.error(f"Writing output file {output_file_name} failed: {e}")
+                progress.step()
+                commit.set_exception(e)
+            else:
+                logger.debug(f"Written selection {index} to disk. Progress: {progress.step():2.2f}%")
+                commit.set_result(output_file_name)
+            return commit
+        commit = output_writer.submit(output_file_name, data)
+        commit.add_done_callback(lambda _: progress.step())
+        return commit
 
     def _get_output_file_name(self, selection_index: int) -> str:
         path = self.output_path / f"{self.image_path.stem}_{selection_index:05}{self.image_path.suffix}"
         return str(path)
 
-    def _scaled_to_resolution(self, maximum: int = 1000) -> typing.Tuple[float, float]:
-        scaling_factor = maximum / max(self.width, self.height)
-        if scaling_factor > 1:
-            return self.width, self.height
-        return self.width * scaling_factor, self.height * scaling_factor
-
     def __repr__(self):
         return f"Image({self.image_path}, selection_count={len(self.selections)}, " \
                f"selections={self.selections}, output_path={self.output_path})"
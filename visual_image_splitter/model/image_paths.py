@@ -0,0 +1,147 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Enumerates the image files given on the command line. Arguments can be image files, directories, which are searched
+for image files, or glob patterns. Additionally, a list of NUL-delimited paths can be read from a file or the standard
+input. All paths are enumerated lazily, so that loading the first images can start while the enumeration of large
+directory trees is still running.
+"""
+
+import glob
+import itertools
+import os
+from pathlib import Path
+import sys
+import typing
+
+from visual_image_splitter.argument_parser import Namespace
+from .image import supported_file_formats
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Size of the chunks read from path list files
+_READ_SIZE = 2**16
+
+
+def is_glob_pattern(argument: str) -> bool:
+    return any(character in argument for character in "*?[")
+
+
+def walk(directory: Path, extensions: typing.Collection[str], recursive: bool = True) -> typing.Iterator[Path]:
+    """
+    Lazily yields the files in directory having one of the given extensions. Files are yielded in name order, each
+    directory before its subdirectories. Hidden files and directories are skipped. Symbolic links to directories are
+    followed, but each directory is searched only once, so that links pointing to a parent directory do not cause an
+    endless loop.
+    :param directory: The directory to search
+    :param extensions: Lower case file name extensions without the leading dot, like "jpg"
+    :param recursive: If True, subdirectories are searched, too.
+    """
+    pending_directories = [directory]
+    # (st_dev, st_ino) pairs of the searched directories
+    visited_directories: typing.Set[typing.Tuple[int, int]] = set()
+    while pending_directories:
+        current = pending_directories.pop()
+        try:
+            status = current.stat()
+            if (status.st_dev, status.st_ino) in visited_directories:
+                logger.debug(f"Skipping {current}, because it was already searched.")
+                continue
+            visited_directories.add((status.st_dev, status.st_ino))
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.error(f"Reading directory {current} failed: {e}")
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir():
+                    subdirectories.append(Path(entry.path))
+                elif entry.is_file() and Path(entry.name).suffix[1:].lower() in extensions:
+                    yield Path(entry.path)
+            except OSError as e:
+                logger.warning(f"Skipping {entry.path}: {e}")
+        if recursive:
+            # The list is used as a stack, so push in reverse order to visit the subdirectories in name order.
+            pending_directories.extend(reversed(subdirectories))
+
+
+def expand(argument: str, extensions: typing.Collection[str], recursive: bool = True) -> typing.Iterator[Path]:
+    """
+    Lazily yields the image files given by a single command line argument.
+    Existing directories are searched using walk(). Glob patterns are expanded, supporting "**" for any number of
+    subdirectories. Matched directories are searched, too. Everything else is yielded as given, so that loading it
+    reports an error, if it is not a readable image file.
+    """
+    path = Path(argument).expanduser()
+    if path.is_dir():
+        yield from walk(path, extensions, recursive)
+    elif is_glob_pattern(argument) and not path.exists():
+        # Sorted, because glob yields the matches in file system order, which differs between systems.
+        for match in sorted(glob.iglob(os.path.expanduser(argument), recursive=True)):
+            match = Path(match)
+            if match.is_dir():
+                yield from walk(match, extensions, recursive)
+            elif match.suffix[1:].lower() in extensions:
+                yield match
+    else:
+        yield path
+
+
+def read_path_list(stream: typing.BinaryIO) -> typing.Iterator[str]:
+    """
+    Lazily yields the NUL-delimited paths read from the given binary stream, as produced by "find -print0".
+    Empty entries are skipped.
+    """
+    remainder = b""
+    while True:
+        chunk = stream.read(_READ_SIZE)
+        if not chunk:
+            break
+        *paths, remainder = (remainder + chunk).split(b"\0")
+        yield from (os.fsdecode(path) for path in paths if path)
+    if remainder:
+        yield os.fsdecode(remainder)
+
+
+def _read_path_list_file(files_from: str) -> typing.Iterator[str]:
+    if files_from == "-":
+        yield from read_path_list(sys.stdin.buffer)
+        return
+    try:
+        with open(files_from, "rb") as stream:
+            yield from read_path_list(stream)
+    except OSError as e:
+        logger.error(f"Reading the list of image files from {files_from} failed: {e}")
+
+
+def from_arguments(args: Namespace) -> typing.Iterator[Path]:
+    """
+    Lazily yields the absolute paths of all image files given on the command line, followed by the paths read from
+    the --files-from list.
+    """
+    extensions = set(args.extensions or supported_file_formats())
+    arguments = args.images
+    if args.files_from is not None:
+        arguments = itertools.chain(arguments, _read_path_list_file(args.files_from))
+    for argument in arguments:
+        for path in expand(argument, extensions, args.recursive):
+            yield path.resolve()
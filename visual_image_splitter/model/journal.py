@@ -0,0 +1,204 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Checkpoint journal for long running save operations. After all output files of an image are committed, a line is
+appended to the journal, recording the source file, the selections and each output file with its size:
+
+{"source": "/scans/a.tif", "source_size": 123, "source_modified": 1570000000000000000, "selections": […],
+ "outputs": [["/scans/a_00001.tif", 45], …]}
+
+When resuming, an image is skipped, if the journal contains an entry for it with the same source file size and
+modification time and the same selections, and all recorded output files exist with the recorded sizes. Later entries
+for the same source replace earlier ones. A line torn by a crash while it was written is ignored, so the affected
+image is written again.
+"""
+
+import json
+import os
+from pathlib import Path
+import threading
+import typing
+
+from visual_image_splitter.argument_parser import Namespace
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# The selections of an image as stored in the journal. Either rectangle coordinates or selection presets.
+JournalSelections = typing.List[typing.List[typing.Union[int, str]]]
+
+
+class JournalEntry(typing.NamedTuple):
+    source: Path
+    source_size: int
+    source_modified: int  # Modification time in nanoseconds
+    selections: JournalSelections
+    outputs: typing.List[typing.Tuple[Path, int]]  # Output file paths and sizes
+
+    @staticmethod
+    def parse(line: str) -> "JournalEntry":
+        """:raises ValueError: If the line is not a valid journal entry, for example because it is incomplete."""
+        entry = json.loads(line)
+        try:
+            return JournalEntry(
+                Path(entry["source"]), int(entry["source_size"]), int(entry["source_modified"]),
+                entry["selections"], [(Path(path), int(size)) for path, size in entry["outputs"]]
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid journal entry: {e}") from e
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "source": str(self.source),
+            "source_size": self.source_size,
+            "source_modified": self.source_modified,
+            "selections": self.selections,
+            "outputs": [[str(path), size] for path, size in self.outputs],
+        })
+
+
+def _normalized(selections: typing.Iterable[typing.Iterable[typing.Union[int, str]]]) -> JournalSelections:
+    """Converts tuples to lists, so that selections compare equal to those read back from the journal."""
+    return [list(selection) for selection in selections]
+
+
+def _file_matches(path: Path, size: int) -> bool:
+    try:
+        return path.stat().st_size == size
+    except OSError:
+        return False
+
+
+def _ends_with_partial_line(path: Path) -> bool:
+    try:
+        with open(path, "rb") as file:
+            if not file.seek(0, os.SEEK_END):
+                return False
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+class Journal:
+    """
+    Append-only checkpoint journal. Thread-safe. Use as a context manager or call close() when done.
+    """
+
+    def __init__(self, path: typing.Optional[Path], resume: bool = False, sync: str = "directory"):
+        """
+        :param path: The journal file. Created, if it does not exist. New entries are appended. If None, the journal
+          is disabled: Nothing is recorded and no image is complete.
+        :param resume: If True, read the existing entries, so that completed_outputs() can skip finished images.
+        :param sync: One of the output_writer.SYNC_MODES. Unless "never", each entry is synced to disk.
+        :raises OSError: If the journal can not be read or opened for writing.
+        """
+        self.path = path
+        self._entries: typing.Dict[Path, JournalEntry] = self._read(path) if resume and path is not None else {}
+        self._sync = sync != "never"
+        self._lock = threading.Lock()
+        self._file: typing.Optional[typing.TextIO] = None
+        if path is not None:
+            # Terminate a line torn by a crash, so that it does not swallow the first new entry.
+            is_torn = _ends_with_partial_line(path)
+            self._file = open(path, "a", encoding="utf-8")
+            if is_torn:
+                self._file.write("\n")
+
+    @staticmethod
+    def _read(path: Path) -> typing.Dict[Path, JournalEntry]:
+        entries: typing.Dict[Path, JournalEntry] = {}
+        try:
+            with open(path, encoding="utf-8") as file:
+                for line_number, line in enumerate(file, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = JournalEntry.parse(line)
+                    except ValueError as e:
+                        logger.warning(f"Ignoring line {line_number} of journal {path}: {e}")
+                        continue
+                    entries[entry.source] = entry
+        except FileNotFoundError:
+            logger.info(f"Journal {path} does not exist yet. Nothing to resume.")
+        logger.info(f"Read {len(entries)} entries from journal {path}")
+        return entries
+
+    def completed_outputs(
+            self, source: Path,
+            selections: typing.Iterable[typing.Iterable[typing.Union[int, str]]]) -> typing.Optional[typing.List[Path]]:
+        """
+        Returns the recorded output files, if the journal records that the output files of the given source image and
+        selections were written and all of them still exist with the recorded size. Otherwise, returns None.
+        """
+        entry = self._entries.get(source)
+        if entry is None or entry.selections != _normalized(selections):
+            return None
+        try:
+            stat = source.stat()
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry.source_size, entry.source_modified):
+            logger.debug(f"Source {source} changed since it was recorded in the journal.")
+            return None
+        if not all(_file_matches(path, size) for path, size in entry.outputs):
+            logger.debug(f"Output files of {source} are missing or changed since they were recorded in the journal.")
+            return None
+        return [path for path, _ in entry.outputs]
+
+    def record(
+            self, source: Path, selections: typing.Iterable[typing.Iterable[typing.Union[int, str]]],
+            outputs: typing.Iterable[Path]):
+        """
+        Appends an entry for the given source image. Call this after all output files are committed.
+        Failures are logged, because a missing entry only causes the image to be written again when resuming.
+        """
+        if self._file is None:
+            return
+        try:
+            stat = source.stat()
+            entry = JournalEntry(
+                source, stat.st_size, stat.st_mtime_ns, _normalized(selections),
+                [(path, path.stat().st_size) for path in outputs]
+            )
+            # A single write per entry, so that a crash tears at most the last line.
+            with self._lock:
+                self._file.write(entry.to_json() + "\n")
+                self._file.flush()
+                if self._sync:
+                    os.fsync(self._file.fileno())
+        except OSError as e:
+            logger.error(f"Recording {source} in journal {self.path} failed: {e}")
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_journal(args: Namespace) -> Journal:
+    """
+    Opens the journal given on the command line. The returned journal is disabled, if no journal is given.
+    :raises OSError: If the journal can not be read or opened for writing.
+    """
+    path = None if args.journal is None else Path(args.journal).expanduser().resolve()
+    return Journal(path, args.resume, args.sync)
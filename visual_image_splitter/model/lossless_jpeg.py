@@ -0,0 +1,76 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Lossless cropping of JPEG (JFIF) files using the jpegtran tool from libjpeg/libjpeg-turbo.
+
+jpegtran crops in the DCT domain and copies the compressed coefficient data into the output file, so the image data is
+neither decoded nor re-encoded. This loses no quality and is mostly I/O bound. The crop region has to be aligned to the
+iMCU grid of the source image, which is 8 or 16 pixels, depending on the chroma subsampling. jpegtran moves the top left
+corner of unaligned regions up and left to the next grid position and enlarges the region accordingly, so the output
+may contain up to 15 additional pixel rows and columns at the top and left border.
+"""
+
+import functools
+from pathlib import Path
+import shutil
+import subprocess
+import typing
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImageReader
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+JPEGTRAN = "jpegtran"
+
+
+@functools.lru_cache()
+def jpegtran_path() -> typing.Optional[str]:
+    """Returns the path to the jpegtran executable, or None, if it is not installed."""
+    path = shutil.which(JPEGTRAN)
+    if path is None:
+        logger.warning(f"The {JPEGTRAN} tool is not installed. Lossless JPEG cropping is unavailable, "
+                       f"JPEG files will be re-encoded instead.")
+    return path
+
+
+def can_crop_losslessly(image_path: Path) -> bool:
+    """Returns True, if the given file is a JPEG file and jpegtran is available to crop it losslessly."""
+    return QImageReader(str(image_path)).format() == b"jpeg" and jpegtran_path() is not None
+
+
+def crop(image_path: Path, region: QRect) -> bytes:
+    """
+    Losslessly crops the given region from the JPEG file at image_path and returns the content of the resulting
+    JPEG file. All metadata, like EXIF data and color profiles, is copied to the result.
+    :raises RuntimeError: If jpegtran is unavailable or fails.
+    """
+    executable = jpegtran_path()
+    if executable is None:
+        raise RuntimeError(f"Cannot crop {image_path} losslessly: {JPEGTRAN} is not installed.")
+    command = (
+        executable, "-copy", "all",
+        "-crop", f"{region.width()}x{region.height()}+{region.x()}+{region.y()}",
+        str(image_path)
+    )
+    logger.debug(f"Executing {command}")
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode or not result.stdout:
+        raise RuntimeError(f"{JPEGTRAN} failed to crop {image_path} with exit code {result.returncode}: "
+                           f"{result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
@@ -0,0 +1,118 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import threading
+import typing
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+KeyType = typing.TypeVar("KeyType")
+ValueType = typing.TypeVar("ValueType")
+
+
+class LRUCache(typing.Generic[KeyType, ValueType]):
+    """
+    Thread safe in-memory cache with a memory budget. The size of each value is determined by the size_of function.
+    If adding a value exceeds the budget, the least recently used values are dropped until the budget is met again.
+    Values larger than the whole budget are not cached at all, so a budget of zero disables caching.
+    """
+
+    def __init__(self, budget: int, size_of: typing.Callable[[ValueType], int], name: str = "LRUCache"):
+        """
+        :param budget: Maximum total size of all cached values in bytes.
+        :param size_of: Function returning the size of a value in bytes.
+        :param name: Name used in log messages.
+        """
+        self.budget = budget
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._size_of = size_of
+        self._lock = threading.Lock()
+        # Maps keys to (value, size) tuples, ordered from least recently used to most recently used.
+        self._entries: typing.MutableMapping[KeyType, typing.Tuple[ValueType, int]] = collections.OrderedDict()
+        self._total_size = 0
+
+    @property
+    def total_size(self) -> int:
+        return self._total_size
+
+    def get(self, key: KeyType) -> typing.Optional[ValueType]:
+        """Returns the cached value for key and marks it as recently used. Returns None, if key is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def peek(self, key: KeyType) -> typing.Optional[ValueType]:
+        """Returns the cached value for key without changing the usage order or the statistics."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key: KeyType, value: ValueType):
+        """Add value to the cache, replacing any value already cached for key. Drops old values, if required."""
+        size = self._size_of(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.budget:
+                logger.debug(f"{self.name}: Not caching {key}, because its size {size} exceeds the budget.")
+                return
+            self._entries[key] = value, size
+            self._total_size += size
+            while self._total_size > self.budget:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_size -= evicted_size
+                logger.debug(f"{self.name}: Evicted {evicted_key}")
+
+    def remove(self, key: KeyType):
+        """Remove the value cached for key, if any."""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_size = 0
+
+    def _remove(self, key: KeyType):
+        """Requires holding the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_size -= entry[1]
+
+    def __contains__(self, key: KeyType) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def log_statistics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            logger.info(
+                f"{self.name} statistics: {self.hits} hits, {self.misses} misses "
+                f"({100*self.hits/lookups if lookups else 0:.1f}% hit rate), {len(self._entries)} entries using "
+                f"{self._total_size/2**20:.1f} MiB of {self.budget/2**20:.1f} MiB"
+            )
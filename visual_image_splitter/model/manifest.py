@@ -0,0 +1,163 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Job manifests store the selections of many images, so that they can be drawn once and extracted later, for example in
+batch mode on another machine. A manifest is a JSON Lines file. Each line describes one source image:
+
+{"source": "scans/scan_001.tif", "output": "split", "selections": [[0, 0, 1200, 1700], [1200, 0, 2400, 1700]]}
+
+Each selection is given as the pixel coordinates x1, y1, x2, y2 of two opposite corners. "output" is optional and
+defaults to the directory containing the source image. The optional "encoder" object sets the encoder settings of this
+image, like {"preset": "small", "jpeg_quality": 95}, see encoder_settings.from_json(). These override the encoder
+settings given on the command line. Relative paths are relative to the directory containing the
+manifest. Empty lines are ignored. Manifests are read line by line, so they can be arbitrarily large.
+"""
+
+import json
+from pathlib import Path
+import sys
+import typing
+
+from . import encoder_settings
+from .encoder_settings import EncoderSettings
+from .image import Image
+from .output_writer import write_file_atomically
+from .point import Point
+from .save_job import SaveJob, SelectionCoordinates, selection_coordinates
+from .selection import Selection
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+
+class ManifestRecord(typing.NamedTuple):
+    source: Path
+    output: Path
+    selections: typing.List[SelectionCoordinates]
+    # Encoder settings of this image. These override the encoder settings given on the command line.
+    encoder: EncoderSettings = EncoderSettings()
+
+    @staticmethod
+    def from_image(image: Image) -> "ManifestRecord":
+        return ManifestRecord(
+            image.image_path,
+            image.output_path,
+            selection_coordinates(image),
+            image.encoder_overrides
+        )
+
+    @staticmethod
+    def parse(line: str, base_directory: Path) -> "ManifestRecord":
+        """
+        Parses a single manifest line.
+        :raises ValueError: If the line is not a valid manifest record.
+        """
+        record = json.loads(line)
+        if not isinstance(record, dict) or not isinstance(record.get("source"), str):
+            raise ValueError("Expected an object with a \"source\" path")
+        source = base_directory / Path(record["source"]).expanduser()
+        output = record.get("output")
+        if output is not None and not isinstance(output, str):
+            raise ValueError("Expected \"output\" to be a path")
+        output = source.parent if output is None else base_directory / Path(output).expanduser()
+        selections = record.get("selections", [])
+        if not isinstance(selections, list) or not all(
+                isinstance(selection, list) and len(selection) == 4
+                and all(isinstance(value, int) and not isinstance(value, bool) for value in selection)
+                for selection in selections):
+            raise ValueError("Expected \"selections\" to be a list of [x1, y1, x2, y2] integer coordinates")
+        encoder = encoder_settings.from_json(record.get("encoder", {}))
+        return ManifestRecord(source, output, [tuple(selection) for selection in selections], encoder)
+
+    def to_json(self) -> str:
+        record = {
+            "source": str(self.source),
+            "output": str(self.output),
+            "selections": [list(selection) for selection in self.selections],
+        }
+        if self.encoder != EncoderSettings():
+            record["encoder"] = encoder_settings.to_json(self.encoder)
+        return json.dumps(record)
+
+    def apply_to(self, image: Image):
+        """
+        Sets the output path and the encoder settings of the given image and adds the selections of this record to it.
+        """
+        image.output_path = self.output
+        image.encoder_overrides = self.encoder
+        image.encoder_settings = image.encoder_settings.merged(self.encoder)
+        for x1, y1, x2, y2 in self.selections:
+            image.add_selection(Selection(Point(x1, y1), Point(x2, y2), image))
+
+    def to_save_job(
+            self, region_decoding: str, lossless_jpeg: bool, encoder_settings: EncoderSettings,
+            sync: str) -> SaveJob:
+        """:param encoder_settings: The encoder settings given on the command line. Overridden by this record."""
+        return SaveJob(
+            self.source, self.output, self.selections, region_decoding, lossless_jpeg,
+            encoder_settings.merged(self.encoder), sync
+        )
+
+
+class ManifestReader:
+    """
+    Iterates over the records of a manifest, reading it line by line. Invalid lines are logged and skipped. Their line
+    numbers are collected in invalid_lines.
+    """
+
+    def __init__(self, stream: typing.TextIO, base_directory: Path, name: str = "manifest"):
+        self.stream = stream
+        self.base_directory = base_directory
+        self.name = name
+        self.invalid_lines: typing.List[int] = []
+
+    def __iter__(self) -> typing.Iterator[ManifestRecord]:
+        for line_number, line in enumerate(self.stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield ManifestRecord.parse(line, self.base_directory)
+            except ValueError as e:  # Includes json.JSONDecodeError
+                logger.error(f"Skipping invalid line {line_number} of {self.name}: {e}")
+                self.invalid_lines.append(line_number)
+
+
+def read(manifest: str) -> ManifestReader:
+    """
+    Returns a reader for the manifest file at the given path. "-" reads the manifest from the standard input, using the
+    current working directory as the base directory for relative paths.
+    The file is closed, when the returned reader is exhausted.
+    :raises OSError: If the file can not be opened.
+    """
+    if manifest == "-":
+        return ManifestReader(sys.stdin, Path.cwd(), "the standard input")
+    path = Path(manifest).expanduser().resolve()
+    return ManifestReader(_read_lines(open(path, encoding="utf-8")), path.parent, str(path))
+
+
+def _read_lines(stream: typing.TextIO) -> typing.Iterator[str]:
+    with stream:
+        yield from stream
+
+
+def write(path: Path, images: typing.Iterable[Image]):
+    """
+    Writes a manifest describing the given images and their selections to path. Paths are stored as absolute paths.
+    :raises OSError: If writing fails. An existing file at path is left untouched in this case.
+    """
+    content = "".join(f"{ManifestRecord.from_image(image).to_json()}\n" for image in images)
+    write_file_atomically(path, content.encode("utf-8"))
@@ -13,21 +13,46 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import concurrent.futures
+import itertools
+import threading
 import typing
 import pathlib
 
-from PyQt5.QtCore import QObject, QAbstractItemModel, QModelIndex, QVariant, Qt, QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import QObject, QAbstractItemModel, QModelIndex, QVariant, Qt, QThread, pyqtSignal, pyqtSlot, \
+    QTimer
 
 from visual_image_splitter.argument_parser import Namespace
-from visual_image_splitter.model.selection_preset import SelectionPreset
+from visual_image_splitter.model.selection_preset import SelectionPreset, SelectionPresetList
 from .selection import Selection
-from .image import Image, Columns as ImageColumns
+from .image import Image, Columns as ImageColumns, ImageDataCache, EncodedDataCache, create_image_data_cache, \
+    create_encoded_data_cache
 from .async_io import ModelWorker
+from .thumbnail_cache import ThumbnailCache, default_cache_directory
+from .prefetcher import Prefetcher
+from . import save_job
+from . import encoder_settings
+from . import image_paths
+from . import manifest
+from . import photo_detection
+from . import rows
+from .manifest import ManifestRecord
+from .journal import Journal, open_journal
+from .encoder_settings import EncoderSettings
+from .save_pipeline import SavePipeline
+from .output_writer import OutputWriter
 
 from visual_image_splitter.logger import get_logger
 logger = get_logger(__name__)
 del get_logger
 
+# Anything describing an image to load, like a path or a manifest record
+LoadItem = typing.TypeVar("LoadItem")
+# Opened image that is not loaded into the model yet. Paths are kept as strings, because these are much smaller than
+# pathlib.Path instances.
+UnfetchedItem = typing.Union[str, ManifestRecord]
+
 
 class Model(QAbstractItemModel):
     """
@@ -43,6 +68,23 @@ class Model(QAbstractItemModel):
     save_and_close_all_images = pyqtSignal()
     close_image = pyqtSignal(QModelIndex, bool)  # boolean parameter: True: save selections to files, False: discard
     save_and_close_all_finished = pyqtSignal()
+    save_and_close_all_progress = pyqtSignal(int, int)  # Number of finished images, total number of images
+    import_manifest = pyqtSignal(str)  # Path of the job manifest file
+    export_manifest = pyqtSignal(str)  # Path of the job manifest file
+    manifest_exported = pyqtSignal(str, int)  # Path of the written job manifest, number of written images
+    manifest_export_failed = pyqtSignal(str, str)  # Path of the job manifest, error message
+    fetch_images = pyqtSignal(list)  # List of UnfetchedItems to load and insert into the model
+    # Only the GUI thread changes the list of images, so that attached views always see a consistent model. Other
+    # threads request the changes using these signals.
+    _images_loaded = pyqtSignal()  # Loaded images are waiting in _loaded_images
+    _image_closed = pyqtSignal(QObject)  # Image to remove
+    _items_queued = pyqtSignal()  # Opened images are waiting in _unfetched_items
+
+    # Number of rows added to the model by each fetchMore() call
+    FETCH_COUNT = 64
+
+    # Number of images per loader thread that are opened ahead of the last image inserted into the model
+    OPEN_IMAGES_AHEAD = 4
 
     def __init__(self, args: Namespace, parent: QObject = None):
         """
@@ -54,14 +96,55 @@ class Model(QAbstractItemModel):
         self.args: Namespace = args
         logger.info(f"Creating Model instance. Arguments: {args}")
         self.worker, self.worker_thread = self._setup_worker_thread()
+        # Decoding images is CPU bound and Qt releases the GIL while decoding, so images are opened concurrently
+        # using a pool of threads. The ModelWorker thread dispatches the work and collects the results in order.
+        self.image_loader_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.jobs, thread_name_prefix="ImageLoader"
+        )
+        # Extracting and encoding the selections of an image is distributed to a separate pool, so that writing output
+        # files does not queue behind loading previews.
+        self.image_writer_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.jobs, thread_name_prefix="ImageWriter"
+        )
+        logger.debug(f"Created image loader and writer thread pools with {args.jobs} threads each.")
+        # Enumerating opened paths or reading a manifest can take long for large inputs. This is done by a separate,
+        # single thread, so that the worker thread keeps serving fetchMore() meanwhile and the order of opened images is
+        # kept across multiple open requests.
+        self.image_enumerator_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ImageEnumerator"
+        )
+        # The last submitted enumeration. Only accessed by the worker thread.
+        self._enumeration: typing.Optional[concurrent.futures.Future] = None
+        # Commits the encoded output files, so that encoding does not wait for the disk.
+        self.output_writer = OutputWriter(args.sync)
+        self.thumbnail_cache: typing.Optional[ThumbnailCache] = self._create_thumbnail_cache()
+        # Decoded full resolution image data is shared by all images and limited by a memory budget.
+        self.image_data_cache: ImageDataCache = create_image_data_cache(args.image_cache_size * 2**20)
+        # Optionally, the encoded file content is kept in memory, so that files are read only once.
+        self.encoded_data_cache: EncodedDataCache = create_encoded_data_cache(args.source_cache_size * 2**20)
+        # Reads and decodes the images following the currently edited image in the background.
+        self.prefetcher = Prefetcher(self, args.prefetch, args.prefetch_decode, self)
+        # Default encoder settings for the output files of all images
+        self.encoder_settings: EncoderSettings = encoder_settings.from_namespace(args)
 
         # The predefined selections is a list of selections given on the command line. These selections are
         # automatically added to each Image file
         logger.info("Loading selections given on the command line")
-        self.predefined_selections: typing.List[SelectionPreset] = self._create_selections_from_command_line()
+        self.predefined_selections: SelectionPresetList = self._create_selections_from_command_line()
         logger.debug(f"Loaded selections: {self.predefined_selections}")
         # Load all given images
         self.images: typing.List[Image] = []
+        # Images loaded by the worker thread, waiting to be inserted by the GUI thread. Guarded by the lock.
+        self._loaded_images: typing.List[Image] = []
+        self._loaded_images_lock = threading.Lock()
+        # Queued, so that all images loaded until the GUI thread gets to it are inserted at once.
+        self._images_loaded.connect(self._insert_loaded_images, Qt.QueuedConnection)
+        self._image_closed.connect(self._on_image_closed)
+        # Opened images are only loaded into the model, when views scroll to the end of the list and ask for more rows
+        # using fetchMore(). Until then, they wait in this list. Guarded by the lock.
+        self._unfetched_items: typing.Deque[UnfetchedItem] = collections.deque()
+        self._unfetched_items_lock = threading.Lock()
+        self._items_queued.connect(self._on_items_queued, Qt.QueuedConnection)
         # Wait some milliseconds after the main event loop started and then fill the model in the background.
         # This loads the images in a separate thread and does not block the GUI thread
         QTimer.singleShot(100, self.open_command_line_given_images.emit)
@@ -79,14 +162,34 @@ class Model(QAbstractItemModel):
         self.open_images.connect(worker.open_images)
         self.save_and_close_all_images.connect(worker.save_and_close_all_images)
         self.close_image.connect(worker.close_image)
+        self.fetch_images.connect(worker.fetch_images)
+        self.import_manifest.connect(worker.import_manifest)
+        self.export_manifest.connect(worker.export_manifest)
         logger.debug("Connected signals to offload to the worker thread.")
         worker_thread.start()
 
         return worker, worker_thread
 
-    def _create_selections_from_command_line(self):
+    def _create_thumbnail_cache(self) -> typing.Optional[ThumbnailCache]:
+        """Create the persistent preview image cache, as configured on the command line."""
+        if not self.args.thumbnail_cache_size:
+            logger.info("Thumbnail cache disabled.")
+            return None
+        if self.args.thumbnail_cache_dir:
+            cache_directory = pathlib.Path(self.args.thumbnail_cache_dir).expanduser()
+        else:
+            cache_directory = default_cache_directory(self.args.freedesktop_thumbnails)
+        try:
+            return ThumbnailCache(
+                cache_directory, self.args.thumbnail_cache_size * 2**20, self.args.freedesktop_thumbnails
+            )
+        except OSError as e:
+            logger.warning(f"Unable to use the thumbnail cache directory {cache_directory}, disabling the cache: {e}")
+            return None
+
+    def _create_selections_from_command_line(self) -> SelectionPresetList:
         """Read all selection presets given on the command line."""
-        return [SelectionPreset(*selection) for selection in self.args.selections]
+        return SelectionPresetList(SelectionPreset(*selection) for selection in self.args.selections)
 
     def _open_command_line_given_images(self):
         """
@@ -94,21 +197,166 @@ class Model(QAbstractItemModel):
         This automatically adds the selections predefined on the command line to each image file.
         """
         logger.info("Loading images given on the command line")
-        for image_path_str in self.args.images:
+        self._open_images(image_paths.from_arguments(self.args))
+        if self.args.manifest is not None:
+            self._import_manifest(self.args.manifest)
+
+    def _open_images(self, path_list: typing.Iterable[pathlib.Path]):
+        """
+        Open a list of image files. The paths are queued for fetchMore(), which loads the images into the model in the
+        order given by path_list, as soon as attached views need the rows. See _queue_unfetched_items().
+        This function is used by the file open dialog, because it returns a list with selected files.
+        """
+        self._enumerate(str(path) for path in path_list)
+
+    def _import_manifest(self, manifest_path: str):
+        """
+        Open the images listed in the given job manifest together with their selections and output paths.
+        Like _open_images(), the records are queued for fetchMore(). The manifest is read in the background.
+        """
+        logger.info(f"Importing the job manifest {manifest_path}")
+        try:
+            reader = manifest.read(manifest_path)
+        except OSError as e:
+            logger.error(f"Opening the manifest {manifest_path} failed: {e}")
+            return
+        self._enumerate(reader)
+
+    def _export_manifest(self, path: str):
+        """
+        Write a job manifest containing all opened images and their selections to the given path. Executed by the
+        worker thread. Images not fetched into the model yet are loaded to determine their selections, but they are not
+        added to the model. These are loaded a few at a time and released as soon as their record is created.
+        Reports the result using the manifest_exported or manifest_export_failed signal.
+        """
+        self._wait_for_enumeration()
+        with self._unfetched_items_lock:
+            unfetched_items = list(self._unfetched_items)
+        # Removing images is done by the GUI thread, so work on a snapshot of the opened images.
+        images = itertools.chain(list(self.images), self._load_images(self._load_unfetched_item, unfetched_items))
+        count = 0
+
+        def counted(image: Image) -> Image:
+            nonlocal count
+            count += 1
+            return image
+
+        logger.info(f"Exporting the opened images to the job manifest {path}")
+        try:
+            manifest.write(pathlib.Path(path), map(counted, images))
+        except OSError as e:
+            logger.error(f"Exporting the job manifest to {path} failed: {e}")
+            self.manifest_export_failed.emit(path, str(e))
+        else:
+            logger.info(f"Exported {count} images to the job manifest {path}")
+            self.manifest_exported.emit(path, count)
+
+    def _enumerate(self, items: typing.Iterable[UnfetchedItem]):
+        """Queue the given items for fetchMore() using the enumerator thread. See _queue_unfetched_items()."""
+        self._enumeration = self.image_enumerator_pool.submit(self._queue_unfetched_items, items)
+
+    def _wait_for_enumeration(self):
+        """Wait until all opened images are queued, so that operations on all opened images include them."""
+        if self._enumeration is not None:
+            try:
+                self._enumeration.result()
+            except Exception:
+                logger.exception("Enumerating the opened images failed.")
+            self._enumeration = None
+
+    def _queue_unfetched_items(self, items: typing.Iterable[UnfetchedItem]):
+        """
+        Queue opened images for fetchMore(). Executed by the enumerator thread. items is consumed lazily, so that
+        enumerating a large directory tree or reading a large manifest neither blocks the GUI thread nor fetching the
+        first images. The first item queued, while nothing else is waiting, notifies the GUI thread, which fetches the
+        first rows, so that attached views start showing the images.
+        """
+        for item in items:
             if self.worker_thread.isInterruptionRequested():
-                logger.warning("Requested worker thread interruption. Aborting file loading.")
+                logger.warning("Requested worker thread interruption. Aborting opening files.")
                 break
-            image_path = pathlib.Path(image_path_str).expanduser().resolve()
-            logger.debug(f"Create Image instance with Path: '{image_path}'")
-            self._open_image(image_path)
+            with self._unfetched_items_lock:
+                is_first = not self._unfetched_items
+                self._unfetched_items.append(item)
+            if is_first:
+                self._items_queued.emit()
 
-    def _open_images(self, path_list: typing.Iterable[pathlib.Path]):
+    @pyqtSlot()
+    def _on_items_queued(self):
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        """Qt Model API function. Returns True, if opened images are waiting to be loaded into the model."""
+        return not parent.isValid() and bool(self._unfetched_items)
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        """
+        Qt Model API function. Views call this, when they scroll to the end of the list. Hands the next FETCH_COUNT
+        opened images to the worker thread, which loads them and inserts them into the model. See _fetch_images().
+        """
+        if parent.isValid():
+            return
+        with self._unfetched_items_lock:
+            items = [self._unfetched_items.popleft() for _ in range(min(self.FETCH_COUNT, len(self._unfetched_items)))]
+        if items:
+            logger.debug(f"Fetching {len(items)} images. Unfetched images left: {len(self._unfetched_items)}")
+            self.fetch_images.emit(items)
+
+    def _fetch_images(self, items: typing.List[UnfetchedItem]):
+        """
+        Load the images taken from the unfetched items by fetchMore() and insert them into the model. Executed by the
+        worker thread, which handles fetches one after another, so that the images are inserted in the opened order.
+        """
+        self._load_and_insert_images(self._load_unfetched_item, items)
+
+    def _load_unfetched_item(self, item: UnfetchedItem) -> typing.Optional[Image]:
+        if isinstance(item, ManifestRecord):
+            return self._load_image(item.source, item)
+        return self._load_image(pathlib.Path(item))
+
+    def _load_and_insert_images(
+            self, load: typing.Callable[[LoadItem], typing.Optional[Image]], items: typing.Iterable[LoadItem]):
+        """
+        Load images using the image loader thread pool and insert them into the model in the order given by items.
+        The images are inserted by the GUI thread. See _queue_for_insertion() and _load_images().
+        """
+        for image in self._load_images(load, items):
+            self._queue_for_insertion(image)
+
+    def _load_images(
+            self, load: typing.Callable[[LoadItem], typing.Optional[Image]],
+            items: typing.Iterable[LoadItem]) -> typing.Iterator[Image]:
         """
-        Open a list of image files. This function is used by the file open dialog, because it returns a list with
-        selected files.
+        Load images using the image loader thread pool and yield them in the order given by items. Images that can not
+        be read are skipped.
+        :param load: Called with each item by the pool threads. Returns the loaded Image or None, if interrupted.
+        :param items: Describe the images to load. Consumed lazily, OPEN_IMAGES_AHEAD items per thread at a time.
         """
-        for image_path in path_list:
-            self._open_image(image_path)
+        items = iter(items)
+        pending_images: typing.Deque[concurrent.futures.Future] = collections.deque()
+
+        def submit_next_images():
+            for item in itertools.islice(items, self.OPEN_IMAGES_AHEAD * self.args.jobs - len(pending_images)):
+                pending_images.append(self.image_loader_pool.submit(load, item))
+
+        try:
+            submit_next_images()
+            while pending_images:
+                if self.worker_thread.isInterruptionRequested():
+                    logger.warning("Requested worker thread interruption. Aborting file loading.")
+                    break
+                try:
+                    image = pending_images.popleft().result()
+                except RuntimeError as e:
+                    logger.error(f"Failed to open image: {e}")
+                else:
+                    if image is not None:
+                        yield image
+                submit_next_images()
+        finally:
+            # Cancel everything not yet started, if loading was interrupted. This is a no-op for finished futures.
+            for pending_image in pending_images:
+                pending_image.cancel()
 
     def add_selection(self, index: QModelIndex, selection: Selection):
         """
@@ -116,41 +364,271 @@ class Model(QAbstractItemModel):
         """
         image = self.images[index.row()]
         self.beginInsertRows(index, len(image.selections), len(image.selections))
+        selection.cached_row = len(image.selections)
         image.selections.append(selection)
         self.endInsertRows()
 
-    def _open_image(self, path: pathlib.Path):
+    def _load_image(self, path: pathlib.Path, record: ManifestRecord = None) -> typing.Optional[Image]:
         """
-        Open the image with the given path.
+        Open the image with the given path. This is executed by the image loader thread pool.
+        Only the image header is read, the preview image is created later by _load_preview().
         This automatically adds the selections predefined on the command line to the given image file.
+        If a manifest record is given, its selections and output path are used instead.
+        If photo detection is enabled and the image has no selections otherwise, the detected photos are selected.
+        Returns None, if the worker thread was interrupted before the image was loaded.
         """
-        self.beginInsertRows(QModelIndex(), len(self.images), len(self.images))
-        image = Image(path)  # Don’t set the parent yet. See below.
-        logger.debug(f"Image instance created. Adding predefined selections as given on the command line: "
-                     f"{self.predefined_selections}")
-        for selection in self.predefined_selections:
-            image.add_selection(selection.to_rectangle(image))
-        self.images.append(image)
-        image.clear_image_data()
-        # Image currently belongs to the self.worker_thread that created it.
-        # Move to the main thread, before assigning the parent object, because setting the parent across different
-        # threads is unsupported.
+        if self.worker_thread.isInterruptionRequested():
+            return None
+        logger.debug(f"Create Image instance with Path: '{path}'")
+        # Don’t set the parent yet. See _insert_image().
+        image = Image(path, image_data_cache=self.image_data_cache, encoded_data_cache=self.encoded_data_cache)
+        image.encoder_settings = self.encoder_settings
+        if record is not None:
+            logger.debug(f"Image instance created. Adding selections from the manifest: {record.selections}")
+            record.apply_to(image)
+        else:
+            logger.debug("Image instance created. Adding predefined selections as given on the command line.")
+            self.predefined_selections.apply_to(image)
+        if self.args.detect_photos and not image.selections:
+            self._detect_photos(image)
+        # Image currently belongs to the pool thread that created it. Move it to the main thread. This has to be done
+        # here, because only the thread an object lives in is allowed to push it to another thread.
         image.moveToThread(self.thread())
-        image.setParent(self)
+        return image
+
+    def _detect_photos(self, image: Image):
+        """
+        Add a selection for each photo detected in the given image. This is executed by the image loader thread pool,
+        before the image is inserted into the model. The preview image used for the detection is kept, so that
+        _insert_image() does not have to create it again.
+        """
+        try:
+            low_resolution_image = image.read_preview(self.thumbnail_cache)
+        except RuntimeError as e:
+            logger.error(f"Failed to create the preview image used to detect photos: {e}")
+            return
+        for selection in photo_detection.detect_photos(image, low_resolution_image):
+            image.add_selection(selection)
+        image.set_preview(low_resolution_image)
+
+    def _queue_for_insertion(self, image: Image):
+        """
+        Queue a loaded image for insertion by the GUI thread. Only the first image queued since the last insertion
+        emits a signal, so the GUI thread inserts all images loaded in the meantime using a single row insertion,
+        instead of handling one event and one view update per image.
+        """
+        with self._loaded_images_lock:
+            is_first = not self._loaded_images
+            self._loaded_images.append(image)
+        if is_first:
+            self._images_loaded.emit()
+
+    @pyqtSlot()
+    def _insert_loaded_images(self):
+        with self._loaded_images_lock:
+            images, self._loaded_images = self._loaded_images, []
+        if images:
+            logger.debug(f"Inserting {len(images)} loaded images.")
+            self._insert_images(images)
+
+    def _insert_image(self, image: Image):
+        """Append a loaded image to the model. See _insert_images()."""
+        self._insert_images([image])
+
+    def _insert_images(self, images: typing.List[Image]):
+        """
+        Append loaded images to the model and schedule the preview image creation. Executed by the GUI thread.
+        The parent is assigned here, after the images were moved to the main thread by _load_image(), because setting
+        the parent across different threads is unsupported.
+        """
+        first_row = len(self.images)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(images) - 1)
+        for row, image in enumerate(images, start=first_row):
+            image.cached_row = row
+            image.setParent(self)
+            image.preview_loaded.connect(self._on_image_preview_loaded)
+        self.images += images
         self.endInsertRows()
+        for image in images:
+            if not image.has_preview:
+                self.image_loader_pool.submit(self._load_preview, image)
+
+    def _load_preview(self, image: Image):
+        """Create the preview image for the given Image. This is executed by the image loader thread pool."""
+        if self.worker_thread.isInterruptionRequested():
+            return
+        try:
+            image.load_preview(self.thumbnail_cache)
+        except RuntimeError as e:
+            logger.error(f"Failed to create the preview image: {e}")
+
+    @pyqtSlot(QObject)
+    def _on_image_preview_loaded(self, image: Image):
+        """Notify attached views that the preview image of the given Image and all of its selections changed."""
+        try:
+            row = rows.row_of(image, self.images)
+        except ValueError:
+            logger.debug(f"Preview image loaded for already closed image {image.image_path}. Ignoring it.")
+            return
+        # The preview is loaded by another thread, so a view may have cached data of the old preview in the meantime.
+        image.invalidate_role_data()
+        last_column = Image.column_count() - 1
+        image_index = self.index(row, ImageColumns.IMAGE)
+        self.dataChanged.emit(image_index, image_index.sibling(image_index.row(), last_column))
+        if image.selections:
+            self.dataChanged.emit(
+                self.index(0, 0, image_index),
+                self.index(len(image.selections) - 1, Selection.column_count() - 1, image_index)
+            )
 
     def _save_and_close_all_images(self):
         """
         Save and close all images. This writes all selections to separate files, then closes all files.
+        Images are written concurrently by a pool of processes, starting with the largest files. Each image is closed as
+        soon as its output files are written. Images without selections are closed immediately.
+        If a journal is given on the command line, each written image is recorded in it. When resuming, images
+        recorded as written are closed without writing them again.
+        Images not fetched into the model yet are loaded now, so that the selection presets are applied to them, and
+        written without adding them to the model. These are loaded and written FETCH_COUNT images at a time, so that
+        only a bounded number of them is held in memory.
         """
         logger.info("Writing all selections and closing all opened image files.")
-        for index, image in enumerate(self.images):
-            logger.debug(f"Writing output files for {image}")
-            self.beginRemoveRows(QModelIndex(), index, index)
-            image.write_output()
-            self.endRemoveRows()
-        self.images.clear()
-        self.save_and_close_all_finished.emit()
+        self._wait_for_enumeration()
+        with self._unfetched_items_lock:
+            unfetched_items = list(self._unfetched_items)
+            self._unfetched_items.clear()
+        # Removing images is done by the GUI thread later on, so work on a snapshot of the opened images.
+        images = list(self.images)
+        for image in [image for image in images if not image.selections]:
+            self._remove_image(image)
+        images = save_job.schedule(image for image in images if image.selections)
+        # Unfetched images without selections or failing to load are counted as finished, once they are loaded.
+        total = len(images) + len(unfetched_items)
+        self.save_and_close_all_progress.emit(0, total)
+        try:
+            journal = open_journal(self.args)
+        except OSError as e:
+            logger.error(f"Opening the journal {self.args.journal} failed. Continuing without journal: {e}")
+            journal = Journal(None)
+        # Starting processes is expensive, so a single pool is used for all images.
+        process_pool = None if self.args.save_strategy == "pipeline" \
+            else save_job.create_process_pool(min(self.args.jobs, max(total, 1)))
+        try:
+            with journal:
+                finished = self._save_images(images, journal, process_pool, 0, total)
+                del images
+                for start in range(0, len(unfetched_items), self.FETCH_COUNT):
+                    if finished is None:
+                        return
+                    items = unfetched_items[start:start + self.FETCH_COUNT]
+                    loaded_images = list(self._load_images(self._load_unfetched_item, items))
+                    if self.worker_thread.isInterruptionRequested():
+                        logger.warning("Requested worker thread interruption. Aborting writing output files.")
+                        return
+                    images = save_job.schedule(image for image in loaded_images if image.selections)
+                    finished += len(items) - len(images)
+                    self.save_and_close_all_progress.emit(finished, total)
+                    finished = self._save_images(images, journal, process_pool, finished, total)
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown(wait=True)
+        if finished is not None:
+            self.save_and_close_all_finished.emit()
+
+    def _save_images(
+            self, images: typing.List[Image], journal: Journal,
+            process_pool: typing.Optional[concurrent.futures.Executor],
+            finished_before: int, total: int) -> typing.Optional[int]:
+        """
+        Write the output files of the given images and close each written image. Images recorded as written in the
+        journal are closed without writing them again.
+        :param process_pool: Writes the images. If None, the SavePipeline is used instead.
+        :returns: The number of finished images, including finished_before, or None, if interrupted.
+        """
+        completed: typing.List[Image] = []
+        remaining: typing.List[Image] = []
+        for image in images:
+            outputs = journal.completed_outputs(image.image_path, save_job.selection_coordinates(image))
+            (remaining if outputs is None else completed).append(image)
+        finished = finished_before
+        for finished, image in enumerate(completed, start=finished_before + 1):
+            logger.info(f"Skipping {image.image_path}, because the journal records it as written.")
+            self._remove_image(image)
+            self.save_and_close_all_progress.emit(finished, total)
+        images = remaining
+        if not images:
+            return finished
+        if process_pool is None:
+            return self._save_images_using_pipeline(images, journal, finished, total)
+        pending = {process_pool.submit(save_job.run, self._create_save_job(image)): image for image in images}
+        try:
+            for finished, future in enumerate(concurrent.futures.as_completed(pending), start=finished + 1):
+                if self.worker_thread.isInterruptionRequested():
+                    logger.warning("Requested worker thread interruption. Aborting writing output files.")
+                    return None
+                image = pending[future]
+                try:
+                    outputs = future.result()
+                except (RuntimeError, OSError) as e:
+                    logger.error(f"Writing output files for {image.image_path} failed, keeping it open: {e}")
+                else:
+                    logger.debug(f"Written output files for {image.image_path}. Finished {finished}/{total}.")
+                    journal.record(image.image_path, save_job.selection_coordinates(image), outputs)
+                    self._remove_image(image)
+                self.save_and_close_all_progress.emit(finished, total)
+        finally:
+            for future in pending:
+                future.cancel()
+        return finished
+
+    def _save_images_using_pipeline(
+            self, images: typing.List[Image], journal: Journal, finished_before: int,
+            total: int) -> typing.Optional[int]:
+        """Write the given images using the SavePipeline. Returns like _save_images()."""
+        pipeline = SavePipeline(
+            images, self.args.jobs, self.args.lossless_jpeg, self.worker_thread.isInterruptionRequested, self.args.sync
+        )
+        finished = finished_before
+        for finished, result in enumerate(pipeline.results(), start=finished_before + 1):
+            if result.error is None:
+                logger.debug(f"Written output files for {result.image.image_path}. Finished {finished}/{total}.")
+                journal.record(result.image.image_path, save_job.selection_coordinates(result.image), result.outputs)
+                self._remove_image(result.image)
+            else:
+                logger.error(f"Writing output files for {result.image.image_path} failed, keeping it open.")
+            self.save_and_close_all_progress.emit(finished, total)
+        if self.worker_thread.isInterruptionRequested():
+            return None
+        return finished
+
+    def _create_save_job(self, image: Image) -> save_job.SaveJob:
+        return save_job.SaveJob.from_image(image, self.args.region_decoding, self.args.lossless_jpeg, self.args.sync)
+
+    def _remove_image(self, image: Image):
+        """
+        Remove the given image from the model. When called by another thread, the GUI thread removes it later.
+        """
+        self._image_closed.emit(image)
+
+    @pyqtSlot(QObject)
+    def _on_image_closed(self, image: Image):
+        try:
+            row = rows.row_of(image, self.images)
+        except ValueError:
+            # Already removed or never fetched into the model
+            logger.debug(f"Image {image.image_path} is not in the model.")
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        image.clear_image_data()
+        del self.images[row]
+        rows.renumber(self.images, row)
+        self.endRemoveRows()
+
+    def _write_output(self, image: Image):
+        image.write_output(
+            self.args.region_decoding, self.args.lossless_jpeg,
+            self.image_writer_pool, self.worker_thread.isInterruptionRequested, self.output_writer
+        )
 
     def _close_image(self, model_index: QModelIndex, save_selections: bool = True):
         """
@@ -159,35 +637,36 @@ class Model(QAbstractItemModel):
         :param save_selections: True: Save all selections to files. False: Discard all selections. Don’t write anything.
         """
         if model_index.isValid() and not model_index.parent().isValid() and model_index.row() < self.rowCount():
-            row = model_index.row()
-            logger.info(f"Closing file at row {row}. File: {self.images[row]}, write selections: {save_selections}")
-            self.beginRemoveRows(QModelIndex(), row, row)
+            # Rows may change while the output is written, so hold on to the image instead.
+            image: Image = model_index.internalPointer()
+            logger.info(f"Closing file {image}, write selections: {save_selections}")
             if save_selections:
-                self.images[row].write_output()
-            del self.images[row]
-            self.endRemoveRows()
+                self._write_output(image)
+            self._remove_image(image)
         else:
             logger.warning(f"Got invalid model index: {model_index}")
 
     def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
-        if not self.hasIndex(row, column, parent):
-            logger.debug("No index. Returning invalid QModelIndex()")
-            return QModelIndex()
-
-        if parent.isValid():
-            parent_item = parent.internalPointer().child(row)
-        else:
+        # Same checks as hasIndex(), but without calling rowCount() and columnCount(), because views call this a lot.
+        if not parent.isValid():
             # Invalid parent means top level access. Look up the Image in the images list.
-            parent_item = self.images[row] if 0 <= row < len(self.images) else None  # Sanity check the row value
-        if parent_item is not None:
-            return self.createIndex(row, column, parent_item)
-        else:
-            return QModelIndex()
+            if 0 <= row < len(self.images) and 0 <= column < Image.column_count():
+                return self.createIndex(row, column, self.images[row])
+        elif not parent.column():
+            parent_item = parent.internalPointer()
+            item = parent_item.child(row)
+            if item is not None and 0 <= column < parent_item.column_count():
+                return self.createIndex(row, column, item)
+        logger.debug("No index. Returning invalid QModelIndex()")
+        return QModelIndex()
 
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
         """Qt Model API function. Returns the number of rows/children for the given parent."""
         if not parent.isValid():
             return len(self.images)
+        elif parent.column():
+            # Selections are children of the first column only, like in any other Qt tree model.
+            return 0
         else:
             return parent.internalPointer().row_count()
 
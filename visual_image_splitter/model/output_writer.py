@@ -0,0 +1,251 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Commits encoded output files to disk using a dedicated thread, so that encoding does not wait for disk or network
+latency. Each file is first written to a temporary file in the target directory and then renamed to its final name,
+so an interruption never leaves truncated output files behind.
+
+The sync mode determines, how the data is flushed to the storage device:
+
+- "file": Each file is synced before it is renamed, and its directory is synced after the rename.
+- "directory": All files waiting in the queue are written as one batch. The files are synced after all of them are
+  written, then renamed, and each affected directory is synced once per batch.
+- "never": Nothing is synced explicitly. Files are still renamed atomically, so a crash of this program never leaves
+  truncated files, but a crash of the operating system or a power loss may.
+"""
+
+import concurrent.futures
+import os
+from pathlib import Path
+import queue
+import threading
+import time
+import typing
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+SYNC_MODES = ("file", "directory", "never")
+
+# Signals the writer thread to exit
+_STOP = object()
+
+
+class _PendingFile(typing.NamedTuple):
+    path: Path
+    data: bytes
+    future: concurrent.futures.Future
+
+
+class OutputWriterStatistics(typing.NamedTuple):
+    files: int
+    bytes: int
+    batches: int
+    busy_seconds: float
+    queue_depth: int
+    max_queue_depth: int
+    queue_size: int
+
+
+def _temporary_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def _write_temporary_file(path: Path, data: bytes, sync: bool) -> Path:
+    temporary_path = _temporary_path(path)
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+    except OSError:
+        _remove_temporary_file(temporary_path)
+        raise
+    return temporary_path
+
+
+def _sync_file(path: Path):
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+
+
+def _sync_directory(directory: Path):
+    """Persists renames inside the directory. Not supported on Windows, where renames are persisted by the system."""
+    if os.name != "posix":
+        return
+    file_descriptor = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def _remove_temporary_file(temporary_path: Path):
+    try:
+        temporary_path.unlink()
+    except OSError:
+        pass
+
+
+def write_file_atomically(path: Path, data: bytes, sync: str = "never"):
+    """
+    Synchronously writes data to the file at path using a temporary file and a rename.
+    :param path: Output file path. An existing file is replaced.
+    :param data: File content
+    :param sync: One of SYNC_MODES. "file" and "directory" are equivalent for a single file.
+    :raises OSError: If writing fails. The output file is left untouched in this case.
+    """
+    temporary_path = _write_temporary_file(path, data, sync != "never")
+    try:
+        os.replace(temporary_path, path)
+    except OSError:
+        _remove_temporary_file(temporary_path)
+        raise
+    if sync != "never":
+        _sync_directory(path.parent)
+
+
+class OutputWriter:
+    """
+    Write-behind stage for output files. Files submitted by any thread are committed by a single dedicated writer
+    thread. The returned Future is resolved, when the file is committed, or carries the OSError, if writing failed.
+    """
+
+    def __init__(self, sync: str = "directory", name: str = "OutputWriter", max_queued_files: int = 0):
+        """
+        :param sync: One of SYNC_MODES
+        :param name: Name of the writer thread
+        :param max_queued_files: If not zero, submit() blocks while this many files are waiting to be written.
+          This limits the memory used by queued file contents.
+        """
+        if sync not in SYNC_MODES:
+            raise ValueError(f"Invalid sync mode {sync}. Expected one of {SYNC_MODES}")
+        self.sync = sync
+        self._queue: queue.Queue = queue.Queue(max_queued_files)
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes = 0
+        self._batches = 0
+        self._busy_seconds = 0.0
+        self._max_queue_depth = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        logger.debug(f"Created {self.__class__.__name__} with sync mode {sync}")
+
+    def submit(self, path: typing.Union[Path, str], data: bytes) -> concurrent.futures.Future:
+        """Queues data for writing into the file at path. Returns a Future resolved, when the file is committed."""
+        future = concurrent.futures.Future()
+        self._queue.put(_PendingFile(Path(path), data, future))
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future
+
+    def close(self):
+        """Commits all queued files and stops the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            if self.sync == "directory":
+                # Drain everything queued up to now into a single batch.
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            is_stopped = _STOP in batch
+            batch = [pending_file for pending_file in batch if pending_file is not _STOP]
+            if batch:
+                start = time.perf_counter()
+                self._commit(batch)
+                with self._lock:
+                    self._busy_seconds += time.perf_counter() - start
+                    self._batches += 1
+            if is_stopped:
+                # Commit files submitted concurrently with close(), if any.
+                remaining = []
+                while not self._queue.empty():
+                    remaining.append(self._queue.get_nowait())
+                remaining = [pending_file for pending_file in remaining if pending_file is not _STOP]
+                if remaining:
+                    self._commit(remaining)
+                break
+
+    def _commit(self, batch: typing.List[_PendingFile]):
+        # Write all files of the batch first, so that the operating system can combine the disk accesses,
+        # then sync and rename them.
+        written: typing.List[typing.Tuple[_PendingFile, Path]] = []
+        for pending_file in batch:
+            if not pending_file.future.set_running_or_notify_cancel():
+                continue
+            try:
+                temporary_path = _write_temporary_file(pending_file.path, pending_file.data, self.sync == "file")
+                if self.sync == "file":
+                    try:
+                        os.replace(temporary_path, pending_file.path)
+                    except OSError:
+                        _remove_temporary_file(temporary_path)
+                        raise
+                    _sync_directory(pending_file.path.parent)
+                    self._finish(pending_file)
+                else:
+                    written.append((pending_file, temporary_path))
+            except OSError as e:
+                logger.error(f"Writing output file {pending_file.path} failed: {e}")
+                pending_file.future.set_exception(e)
+        directories: typing.Set[Path] = set()
+        for pending_file, temporary_path in written:
+            try:
+                if self.sync == "directory":
+                    _sync_file(temporary_path)
+                os.replace(temporary_path, pending_file.path)
+            except OSError as e:
+                _remove_temporary_file(temporary_path)
+                logger.error(f"Writing output file {pending_file.path} failed: {e}")
+                pending_file.future.set_exception(e)
+                continue
+            directories.add(pending_file.path.parent)
+            self._finish(pending_file)
+        if self.sync == "directory":
+            for directory in directories:
+                try:
+                    _sync_directory(directory)
+                except OSError as e:
+                    logger.warning(f"Syncing directory {directory} failed: {e}")
+        logger.debug(f"Committed {len(batch)} output files.")
+
+    def _finish(self, pending_file: _PendingFile):
+        with self._lock:
+            self._files += 1
+            self._bytes += len(pending_file.data)
+        pending_file.future.set_result(pending_file.path)
+
+    def statistics(self) -> OutputWriterStatistics:
+        with self._lock:
+            return OutputWriterStatistics(
+                self._files, self._bytes, self._batches, self._busy_seconds,
+                self._queue.qsize(), self._max_queue_depth, self._queue.maxsize
+            )
@@ -0,0 +1,208 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Detects photos placed on the scanner bed, so that they do not have to be selected by hand. The detection runs on the
+low resolution preview image, which takes a few milliseconds per page:
+
+1. The background color is estimated from the pixels at the page border and each pixel that differs from it by more
+   than BACKGROUND_THRESHOLD gray levels is considered to be part of a photo.
+2. The pixel mask is reduced to square cells of CELL_SIZE pixels, which removes dust and scanner noise.
+3. Connected components of foreground cells are labeled using runs of cells in each row. Neighbouring cells are
+   connected, so that bright areas inside a photo do not split it into multiple components.
+4. The bounding boxes of all components covering at least MINIMUM_AREA of the page are scaled to the full resolution,
+   like selections drawn in the selection editor.
+
+This requires NumPy. It is an optional dependency, use is_available() to check for it.
+"""
+
+import typing
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .point import Point
+from .selection import Selection
+
+if typing.TYPE_CHECKING:
+    from .image import Image
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Pixels differing from the estimated background by more than this many gray levels are part of a photo.
+BACKGROUND_THRESHOLD = 32
+# The pixel mask is analyzed in square cells with this edge length in preview pixels.
+CELL_SIZE = 4
+# A cell belongs to a photo, if at least this fraction of its pixels does.
+CELL_COVERAGE = 0.5
+# Components with a bounding box smaller than this fraction of the page area are ignored as dirt or labels.
+MINIMUM_AREA = 0.01
+
+# Run of foreground cells in a single row: row, first column, column after the last one
+_Run = typing.Tuple[int, int, int]
+
+
+def is_available() -> bool:
+    """Returns True, if NumPy is installed, which is required for the photo detection."""
+    return numpy is not None
+
+
+def _gray_pixels(preview: QImage) -> "numpy.ndarray":
+    gray = preview.convertToFormat(QImage.Format_Grayscale8)
+    buffer = gray.constBits()
+    buffer.setsize(gray.height() * gray.bytesPerLine())
+    # Scan lines are padded to 32 bit boundaries, so cut the padding off. Copy, because gray owns the buffer.
+    pixels = numpy.frombuffer(buffer, numpy.uint8).reshape(gray.height(), gray.bytesPerLine())
+    return pixels[:, :gray.width()].copy()
+
+
+def _foreground_cells(pixels: "numpy.ndarray") -> "numpy.ndarray":
+    border = numpy.concatenate((pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]))
+    background = numpy.median(border)
+    mask = numpy.abs(pixels.astype(numpy.int16) - background) > BACKGROUND_THRESHOLD
+    rows, columns = mask.shape[0] // CELL_SIZE, mask.shape[1] // CELL_SIZE
+    cells = mask[:rows * CELL_SIZE, :columns * CELL_SIZE].reshape(rows, CELL_SIZE, columns, CELL_SIZE)
+    return cells.mean(axis=(1, 3)) >= CELL_COVERAGE
+
+
+def _dilated(cells: "numpy.ndarray") -> "numpy.ndarray":
+    """Grows the foreground by one cell in all directions."""
+    padded = numpy.pad(cells, 1)
+    result = numpy.zeros_like(cells)
+    for row_offset in range(3):
+        for column_offset in range(3):
+            result |= padded[row_offset:row_offset + cells.shape[0], column_offset:column_offset + cells.shape[1]]
+    return result
+
+
+def _runs(cells: "numpy.ndarray") -> typing.List[_Run]:
+    """Returns all runs of foreground cells, ordered by row and column."""
+    edges = numpy.diff(numpy.pad(cells.astype(numpy.int8), ((0, 0), (1, 1))), axis=1)
+    rows, starts = numpy.nonzero(edges == 1)
+    _, ends = numpy.nonzero(edges == -1)
+    return list(zip(rows.tolist(), starts.tolist(), ends.tolist()))
+
+
+def _label(cells: "numpy.ndarray") -> "numpy.ndarray":
+    """
+    Labels the 8-connected components of the foreground cells. Returns an array of the cell shape containing the
+    component number of each cell, starting at 1. Background cells are 0.
+    Runs overlapping a run of the previous row, including diagonally, are joined using a union-find structure.
+    """
+    runs = _runs(cells)
+    parents = list(range(len(runs)))
+
+    def find(run_index: int) -> int:
+        while parents[run_index] != run_index:
+            parents[run_index] = parents[parents[run_index]]
+            run_index = parents[run_index]
+        return run_index
+
+    previous_row: typing.List[int] = []
+    current_row: typing.List[int] = []
+    for run_index, (row, start, end) in enumerate(runs):
+        if current_row and runs[current_row[0]][0] != row:
+            previous_row, current_row = (current_row if runs[current_row[0]][0] == row - 1 else []), []
+        for other_index in previous_row:
+            _, other_start, other_end = runs[other_index]
+            if other_start <= end and start <= other_end:
+                parents[find(run_index)] = find(other_index)
+        current_row.append(run_index)
+    labels = numpy.zeros(cells.shape, numpy.int32)
+    for run_index, (row, start, end) in enumerate(runs):
+        labels[row, start:end] = find(run_index) + 1
+    return labels
+
+
+def _bounding_boxes(cells: "numpy.ndarray", labels: "numpy.ndarray") -> typing.List[QRect]:
+    """Returns the bounding box of the foreground cells of each component in preview pixel coordinates."""
+    rows, columns = numpy.nonzero(cells)
+    if not len(rows):
+        return []
+    components, inverse = numpy.unique(labels[rows, columns], return_inverse=True)
+    top = numpy.full(len(components), labels.shape[0])
+    left = numpy.full(len(components), labels.shape[1])
+    bottom = numpy.zeros(len(components), numpy.int64)
+    right = numpy.zeros(len(components), numpy.int64)
+    numpy.minimum.at(top, inverse, rows)
+    numpy.minimum.at(left, inverse, columns)
+    numpy.maximum.at(bottom, inverse, rows + 1)
+    numpy.maximum.at(right, inverse, columns + 1)
+    return [
+        QRect(x1 * CELL_SIZE, y1 * CELL_SIZE, (x2 - x1) * CELL_SIZE, (y2 - y1) * CELL_SIZE)
+        for y1, x1, y2, x2 in zip(top.tolist(), left.tolist(), bottom.tolist(), right.tolist())
+    ]
+
+
+def _reading_order(rectangles: typing.List[QRect]) -> typing.List[QRect]:
+    """
+    Sorts the rectangles line by line from top to bottom and from left to right inside each line. A rectangle belongs
+    to the current line, if it starts above the vertical center of the topmost remaining rectangle.
+    """
+    remaining = sorted(rectangles, key=QRect.top)
+    result = []
+    while remaining:
+        line_end = remaining[0].center().y()
+        line = [rectangle for rectangle in remaining if rectangle.top() <= line_end]
+        remaining = [rectangle for rectangle in remaining if rectangle.top() > line_end]
+        result += sorted(line, key=QRect.left)
+    return result
+
+
+def find_photos(preview: QImage) -> typing.List[QRect]:
+    """
+    Returns the bounding boxes of the photos found in the given preview image, in preview pixel coordinates and in
+    reading order. Boxes contained in another box, like bright areas inside a photo, are dropped.
+    """
+    pixels = _gray_pixels(preview)
+    if min(pixels.shape) < 2 * CELL_SIZE:
+        return []
+    cells = _foreground_cells(pixels)
+    rectangles = _bounding_boxes(cells, _label(_dilated(cells)))
+    minimum_area = MINIMUM_AREA * preview.width() * preview.height()
+    rectangles = [rectangle for rectangle in rectangles if rectangle.width() * rectangle.height() >= minimum_area]
+    rectangles = [
+        rectangle for rectangle in rectangles
+        if not any(other != rectangle and other.contains(rectangle) for other in rectangles)
+    ]
+    return _reading_order(rectangles)
+
+
+def detect_photos(image: "Image", preview: QImage) -> typing.List[Selection]:
+    """
+    Detects the photos in the given image and returns a selection for each of them.
+    :param image: The image. The selections are scaled to its full resolution, but not added to it.
+    :param preview: Low resolution preview of the image, see Image.read_preview()
+    """
+    scaling_factor = image.width / preview.width()
+    selections = [
+        Selection(
+            Point(round(rectangle.x() * scaling_factor), round(rectangle.y() * scaling_factor)),
+            Point(
+                min(round((rectangle.x() + rectangle.width()) * scaling_factor), image.width),
+                min(round((rectangle.y() + rectangle.height()) * scaling_factor), image.height)),
+            image
+        )
+        for rectangle in find_photos(preview)
+    ]
+    logger.info(f"Detected {len(selections)} photos in {image.image_path}")
+    return selections
@@ -0,0 +1,97 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+import typing
+
+from PyQt5.QtCore import QObject, QModelIndex, pyqtSlot
+
+from .image import Image
+
+if typing.TYPE_CHECKING:
+    from .model import Model
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+
+class Prefetcher(QObject):
+    """
+    Prepares the images the user is likely to work on next, while the current image is edited.
+    Whenever the active image changes, the active image and the next images in navigation direction are read into the
+    encoded data cache and optionally decoded into the image data cache. Both caches are bounded by their memory
+    budgets.
+    If the encoded data cache is disabled, reading the files still warms the file system cache of the operating system.
+    Prefetching work that did not start yet is discarded, when the active image changes again.
+    """
+
+    def __init__(self, model: "Model", count: int, decode: bool, parent: QObject = None):
+        """
+        :param model: The Model containing the images
+        :param count: Number of images to prefetch after the active image. Zero disables prefetching.
+        :param decode: If True, decode prefetched images. Otherwise, only read the file content.
+        :param parent: Optional parent object
+        """
+        super(Prefetcher, self).__init__(parent)
+        self.model = model
+        self.count = count
+        self.decode = decode
+        # A single thread is sufficient, because this only has to be faster than the user. It also keeps the impact on
+        # other background work low.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="Prefetcher")
+        self._pending: typing.List[concurrent.futures.Future] = []
+        self._generation = 0
+        logger.info(f"Created {self.__class__.__name__} instance. Prefetching {count} images, decode={decode}")
+
+    @pyqtSlot(QModelIndex, QModelIndex)
+    def on_active_image_changed(self, current: QModelIndex, previous: QModelIndex):
+        """Cancel stale prefetching work and start prefetching the images around the new active image."""
+        self._cancel_pending()
+        if not self.count or not current.isValid() or current.parent().isValid():
+            return
+        direction = -1 if previous.isValid() and not previous.parent().isValid() and previous.row() > current.row() \
+            else 1
+        rows = [current.row() + direction * offset for offset in range(self.count + 1)]
+        images = [self.model.images[row] for row in rows if 0 <= row < len(self.model.images)]
+        logger.debug(f"Prefetching rows {rows}, direction={direction}")
+        generation = self._generation
+        self._pending = [self._executor.submit(self._prefetch, image, generation) for image in images]
+
+    def _cancel_pending(self):
+        self._generation += 1
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _prefetch(self, image: Image, generation: int):
+        """Executed by the prefetching thread."""
+        if generation != self._generation:
+            # The active image changed after this was scheduled and the job could not be cancelled in time.
+            return
+        try:
+            if self.decode:
+                image.load_image_data()
+            else:
+                image.load_encoded_data()
+        except RuntimeError as e:
+            logger.warning(f"Prefetching failed: {e}")
+        else:
+            logger.debug(f"Prefetched {image.image_path}")
+
+    def shutdown(self):
+        """Discard all pending work and wait for running work to finish."""
+        self._cancel_pending()
+        self._executor.shutdown(wait=True)
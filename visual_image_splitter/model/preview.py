@@ -0,0 +1,78 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Functions used to create the low resolution preview images shown in the GUI.
+
+Two decoding paths exist: Some image format readers, most notably JPEG, are able to decode the image at a reduced size.
+For JPEG, this is done by skipping DCT coefficients, which is an order of magnitude faster than a full decode and never
+allocates the full resolution image. All other formats are decoded at full resolution and scaled down afterwards.
+"""
+
+import typing
+
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Previews are scaled, so that the longer edge is at most this many pixels long.
+PREVIEW_RESOLUTION = 800
+
+
+def preview_size(width: int, height: int, maximum: int = PREVIEW_RESOLUTION) -> QSize:
+    """
+    Returns the size of the preview image for an image with the given dimensions. Keeps the aspect ratio and never
+    scales images up.
+    """
+    scaling_factor = maximum / max(width, height)
+    if scaling_factor > 1:
+        return QSize(width, height)
+    return QSize(round(width * scaling_factor), round(height * scaling_factor))
+
+
+def supports_reduced_size_decoding(image_reader: QImageReader) -> bool:
+    """Returns True, if the format handler of the given reader is able to decode directly to a reduced size."""
+    return image_reader.supportsOption(QImageIOHandler.ScaledSize)
+
+
+def read_reduced_size_preview(image_reader: QImageReader, target_size: QSize) -> typing.Optional[QImage]:
+    """
+    Decode the image read by image_reader directly to the given target size. The reader must not have been used
+    to read image data before.
+    Returns None, if the format does not support reduced size decoding or decoding failed. In that case,
+    the caller has to fall back to a full decode.
+    """
+    if not supports_reduced_size_decoding(image_reader):
+        logger.debug(f"Format {image_reader.format()} does not support reduced size decoding.")
+        return None
+    image_reader.setScaledSize(target_size)
+    preview = image_reader.read()
+    if preview.isNull():
+        logger.info(f"Reduced size decoding failed: {image_reader.errorString()}")
+        return None
+    return preview
+
+
+def scale_to_preview(image_data: QImage, maximum: int = PREVIEW_RESOLUTION) -> QImage:
+    """Scale a fully decoded image down to the preview size. This is the fallback path for all image formats."""
+    return scale_to_size(image_data, preview_size(image_data.width(), image_data.height(), maximum))
+
+
+def scale_to_size(image_data: QImage, target_size: QSize) -> QImage:
+    """Scale the given image to the given size, as returned by preview_size()."""
+    return image_data.scaled(target_size, transformMode=Qt.SmoothTransformation)
@@ -0,0 +1,49 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Row numbers of the items in the Qt tree model. Qt asks for the row of each parent item very often, for example when
+painting, so each Image and Selection remembers its position in the list containing it. Code inserting into or
+removing from these lists renumbers the items after the changed position. A remembered row is verified on each lookup,
+so a missed renumbering only costs a linear search, instead of returning a wrong row.
+"""
+
+import typing
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+
+# Image or Selection. Both have a cached_row attribute.
+RowItemType = typing.TypeVar("RowItemType")
+
+
+def renumber(items: typing.Sequence[RowItemType], start: int = 0):
+    """Updates the remembered rows of all items starting at the given position."""
+    for row in range(start, len(items)):
+        items[row].cached_row = row
+
+
+def row_of(item: RowItemType, items: typing.Sequence[RowItemType]) -> int:
+    """
+    Returns the position of item in items. Constant time, if the remembered row is up to date.
+    :raises ValueError: If the item is not in items
+    """
+    row = item.cached_row
+    if not (0 <= row < len(items) and items[row] is item):
+        logger.debug(f"Remembered row {row} of {item} is outdated. Searching it.")
+        row = item.cached_row = items.index(item)
+    return row
@@ -0,0 +1,129 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Writes the output files of images in separate processes. Image and Selection instances are QObjects bound to the
+model, so they can not be sent to other processes. Instead, a picklable SaveJob describing the work is sent, and the
+worker process re-creates the Image from it.
+"""
+
+import concurrent.futures
+import multiprocessing
+from pathlib import Path
+import signal
+import typing
+
+from .point import Point
+from .selection import Selection
+from .image import Image
+from .encoder_settings import EncoderSettings
+from .output_writer import OutputWriter
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# x1, y1, x2, y2 of a Selection
+SelectionCoordinates = typing.Tuple[int, int, int, int]
+# Image, SaveJob or any other object with an image_path attribute
+HasImagePath = typing.TypeVar("HasImagePath")
+
+
+class SaveJob(typing.NamedTuple):
+    image_path: Path
+    output_path: Path
+    selections: typing.List[SelectionCoordinates]
+    region_decoding: str
+    lossless_jpeg: bool
+    encoder_settings: EncoderSettings
+    sync: str
+
+    @staticmethod
+    def from_image(image: Image, region_decoding: str, lossless_jpeg: bool, sync: str = "directory") -> "SaveJob":
+        return SaveJob(
+            image.image_path,
+            image.output_path,
+            selection_coordinates(image),
+            region_decoding,
+            lossless_jpeg,
+            image.encoder_settings,
+            sync
+        )
+
+
+def selection_coordinates(image: Image) -> typing.List[SelectionCoordinates]:
+    return [(*selection.top_left, *selection.bottom_right) for selection in image.selections]
+
+
+def create_process_pool(processes: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Creates a process pool for executing SaveJobs. The worker processes are spawned instead of forked, because forking
+    a process running Qt and multiple threads is unsafe.
+    """
+    logger.info(f"Starting a pool of {processes} processes for writing output files.")
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn"), initializer=_ignore_interrupts
+    )
+
+
+def _ignore_interrupts():
+    """
+    Pressing Ctrl+C in a terminal sends SIGINT to all processes of the process group. Only the main process handles
+    it, so that images in progress are finished instead of leaving the pool broken.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def schedule(images: typing.Iterable[HasImagePath]) -> typing.List[HasImagePath]:
+    """
+    Orders the images from the largest to the smallest source file. Starting with the longest running jobs avoids a
+    single large file running alone at the end, while all other processes idle.
+    :param images: Images or jobs, anything having an image_path attribute.
+    """
+    def source_size(image: HasImagePath) -> int:
+        try:
+            return image.image_path.stat().st_size
+        except OSError:
+            return 0
+    return sorted(images, key=source_size, reverse=True)
+
+
+def run(job: SaveJob) -> typing.List[Path]:
+    """
+    Writes all output files of the given job. Executed by the worker processes.
+    :returns: The written output file paths
+    :raises RuntimeError: If the image can not be read or any output file can not be written.
+    """
+    image = Image(job.image_path)
+    image.output_path = job.output_path
+    image.encoder_settings = job.encoder_settings
+    for x1, y1, x2, y2 in job.selections:
+        image.add_selection(Selection(Point(x1, y1), Point(x2, y2), image))
+    return write_output(image, job.region_decoding, job.lossless_jpeg, job.sync)
+
+
+def write_output(image: Image, region_decoding: str, lossless_jpeg: bool, sync: str) -> typing.List[Path]:
+    """
+    Writes all output files of the given image in the calling worker process.
+    :returns: The written output file paths
+    :raises RuntimeError: If any output file can not be written.
+    """
+    # Write-behind within the worker process, so that decoding and encoding do not wait for the disk.
+    with OutputWriter(sync) as output_writer:
+        written = image.write_output(region_decoding, lossless_jpeg, output_writer=output_writer)
+    if len(written) < len(image.selections):
+        raise RuntimeError(f"Only {len(written)} of {len(image.selections)} output files of image {image.image_path} "
+                           f"were written.")
+    return written
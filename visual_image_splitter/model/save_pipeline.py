@@ -0,0 +1,352 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Writes the output files of many images using a pipeline of concurrently running stages:
+
+    read → decode → crop → encode → write
+
+The write stage is an OutputWriter, which commits the files atomically and syncs them according to the sync mode.
+
+Each stage is executed by one or more threads. Qt releases the GIL while decoding and encoding, so reading the next
+image from disk, decoding it and encoding the selections of previous images overlap. The stages are connected by
+bounded queues. A full queue blocks the producing stage, which limits the number of images in memory.
+Each stage records the number of processed items, the time spent working and the depth of its input queue, so that
+the bottleneck stage can be identified.
+"""
+
+import concurrent.futures
+from pathlib import Path
+import queue
+import threading
+import time
+import typing
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage, QImageReader
+
+from .image import Image
+from . import lossless_jpeg as lossless_jpeg_cropping
+from .output_writer import OutputWriter
+from .crop import extract_region
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Marks the end of the input of a stage
+_END = object()
+
+
+class _ImageItem(typing.NamedTuple):
+    image: Image
+    encoded_data: typing.Optional[QByteArray] = None
+    image_data: typing.Optional[QImage] = None
+
+
+class _SelectionItem(typing.NamedTuple):
+    image: Image
+    index: int
+    # Decoded selection content, usually a view of the full image, or the already encoded content, if the selection
+    # was cropped losslessly.
+    content: typing.Union[QImage, bytes]
+
+
+class Result(typing.NamedTuple):
+    image: Image
+    # None, if all output files were written. Otherwise an error message.
+    error: typing.Optional[str]
+    # The written output files, if all were written
+    outputs: typing.Tuple[Path, ...] = ()
+
+
+class StageStatistics(typing.NamedTuple):
+    name: str
+    threads: int
+    processed: int
+    busy_seconds: float
+    queue_depth: int
+    max_queue_depth: int
+    queue_size: int
+
+    def utilization(self, elapsed_seconds: float) -> float:
+        """Fraction of the time the stage threads were working. The bottleneck stage has the highest utilization."""
+        return self.busy_seconds / (elapsed_seconds * self.threads) if elapsed_seconds else 0
+
+    def throughput(self, elapsed_seconds: float) -> float:
+        """Processed items per second"""
+        return self.processed / elapsed_seconds if elapsed_seconds else 0
+
+
+class _Stage:
+
+    def __init__(
+            self, name: str, work: typing.Callable[[typing.Any], typing.Iterable[typing.Any]],
+            threads: int, queue_size: int, fail: typing.Callable[[typing.Any, Exception], None]):
+        """
+        :param name: Stage name used for thread names and statistics
+        :param work: Function processing one input item. Returns the items for the next stage.
+        :param threads: Number of threads executing this stage
+        :param queue_size: Maximum number of items waiting in the input queue of this stage
+        :param fail: Called with the input item and the exception, if work raises an unexpected exception
+        """
+        self.name = name
+        self.work = work
+        self.fail = fail
+        self.input: queue.Queue = queue.Queue(queue_size)
+        self.output: typing.Optional[queue.Queue] = None
+        self.next_stage_threads = 1
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+        self._running_threads = threads
+        self.threads = [
+            threading.Thread(target=self._run, name=f"SavePipeline-{name}-{number}", daemon=True)
+            for number in range(threads)
+        ]
+
+    def _run(self):
+        try:
+            while True:
+                item = self.input.get()
+                if item is _END:
+                    break
+                with self._lock:
+                    self.max_queue_depth = max(self.max_queue_depth, self.input.qsize() + 1)
+                start = time.perf_counter()
+                try:
+                    results = list(self.work(item))
+                except Exception as e:
+                    # Fail only the image of this item. A dying thread would never pass _END on and stall the pipeline.
+                    logger.exception(f"Unexpected error in the {self.name} stage")
+                    self.fail(item, e)
+                    results = []
+                with self._lock:
+                    self.busy_seconds += time.perf_counter() - start
+                    self.processed += 1
+                for result in results:
+                    self.output.put(result)
+        finally:
+            with self._lock:
+                self._running_threads -= 1
+                is_last_thread = not self._running_threads
+            if is_last_thread:
+                for _ in range(self.next_stage_threads):
+                    self.output.put(_END)
+
+    def statistics(self) -> StageStatistics:
+        with self._lock:
+            return StageStatistics(
+                self.name, len(self.threads), self.processed, self.busy_seconds,
+                self.input.qsize(), self.max_queue_depth, self.input.maxsize
+            )
+
+
+class SavePipeline:
+    """
+    Writes the output files of the given images using a staged pipeline. Iterate over results() to receive a Result for
+    each image, as soon as all its output files are written. The CPU bound decode and encode stages use the given
+    number of threads. The I/O bound read and write stages and the crop stage, which usually only creates views of the
+    decoded image, use a single thread each. Each bounded queue holds as many items as threads consume it, so that no
+    thread has to wait for input while the producing stage keeps up. Regions are never decoded separately, because the
+    pipeline always decodes the whole image once.
+    """
+
+    def __init__(
+            self, images: typing.Iterable[Image], threads: int, lossless_jpeg: bool = False,
+            is_interruption_requested: typing.Callable[[], bool] = None, sync: str = "directory"):
+        """
+        :param images: Images to write. Images are read in the given order.
+        :param threads: Number of threads for each of the decode and encode stages.
+        :param lossless_jpeg: If True, crop JPEG files losslessly. See the lossless_jpeg module.
+        :param is_interruption_requested: Optional function returning True, if writing should be aborted. Aborting
+          skips all remaining work.
+        :param sync: Sync mode of the output files. One of output_writer.SYNC_MODES.
+        """
+        self.images = list(images)
+        self.lossless_jpeg = lossless_jpeg
+        self.is_interruption_requested = is_interruption_requested or (lambda: False)
+        self._results: queue.Queue = queue.Queue()
+        self._remaining_selections: typing.Dict[Image, int] = {}
+        self._outputs: typing.Dict[Image, typing.List[Path]] = {}
+        self._failed: typing.Set[Image] = set()
+        self._lock = threading.Lock()
+        self.stages = [
+            _Stage("read", self._read, 1, 1, self._fail_item),
+            _Stage("decode", self._decode, threads, threads, self._fail_item),
+            _Stage("crop", self._crop, 1, 1, self._fail_item),
+            _Stage("encode", self._encode, threads, threads, self._fail_item),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.output = next_stage.input
+            stage.next_stage_threads = len(next_stage.threads)
+        # The encode stage hands the encoded files to the OutputWriter and produces no items.
+        self.stages[-1].output = queue.Queue()
+        # Allow a whole batch per encoding thread, so that batched syncing is effective.
+        self.output_writer = OutputWriter(sync, "SavePipeline-write", 2*threads)
+        self._start_time = 0.0
+
+    def results(self) -> typing.Iterator[Result]:
+        """Starts the pipeline and yields a Result for each image in completion order."""
+        self._start_time = time.perf_counter()
+        for stage in self.stages:
+            for thread in stage.threads:
+                thread.start()
+        feeder = threading.Thread(target=self._feed, name="SavePipeline-feeder", daemon=True)
+        feeder.start()
+        remaining = len(self.images)
+        while remaining:
+            try:
+                result = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if self.is_interruption_requested():
+                    logger.warning("Requested worker thread interruption. Aborting writing output files.")
+                    break
+                continue
+            remaining -= 1
+            yield result
+        feeder.join()
+        for stage in self.stages:
+            for thread in stage.threads:
+                thread.join()
+        self.output_writer.close()
+        self.log_statistics()
+
+    def _feed(self):
+        read_stage = self.stages[0]
+        for image in self.images:
+            if self.is_interruption_requested():
+                break
+            if not image.selections:
+                # Nothing to write, so the image is finished right away.
+                self._results.put(Result(image, None))
+                continue
+            with self._lock:
+                self._remaining_selections[image] = len(image.selections)
+                self._outputs[image] = []
+            read_stage.input.put(_ImageItem(image))
+        read_stage.input.put(_END)
+
+    def _fail(self, image: Image, error: Exception):
+        with self._lock:
+            if image in self._failed:
+                return
+            self._failed.add(image)
+        logger.error(f"Writing output files for {image.image_path} failed: {error}")
+        self._results.put(Result(image, str(error)))
+
+    def _fail_item(self, item: typing.Union[_ImageItem, _SelectionItem], error: Exception):
+        self._fail(item.image, error)
+
+    def _is_cancelled(self, image: Image) -> bool:
+        with self._lock:
+            return image in self._failed or self.is_interruption_requested()
+
+    def _use_lossless_jpeg(self, image: Image) -> bool:
+        return self.lossless_jpeg and image.can_crop_losslessly()
+
+    def _read(self, item: _ImageItem) -> typing.Iterable[_ImageItem]:
+        image = item.image
+        if self._is_cancelled(image):
+            return
+        image_data = image.image_data
+        if image_data is not None or self._use_lossless_jpeg(image):
+            # Nothing to read. Either the image data is already decoded or the crop stage uses jpegtran.
+            yield item._replace(image_data=image_data)
+            return
+        try:
+            yield item._replace(encoded_data=image.load_encoded_data())
+        except RuntimeError as e:
+            self._fail(image, e)
+
+    def _decode(self, item: _ImageItem) -> typing.Iterable[_ImageItem]:
+        image = item.image
+        if self._is_cancelled(image):
+            return
+        if item.encoded_data is None:
+            yield item
+            return
+        buffer = QBuffer()
+        buffer.setData(item.encoded_data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer, image.image_path.suffix[1:].lower().encode())
+        image_data = reader.read()
+        if image_data.isNull():
+            self._fail(image, RuntimeError(f"Image {image.image_path} cannot be read: {reader.errorString()}"))
+            return
+        # The encoded data is not needed anymore, so drop it to save memory.
+        yield _ImageItem(image, image_data=image_data)
+
+    def _crop(self, item: _ImageItem) -> typing.Iterable[_SelectionItem]:
+        image = item.image
+        for index, selection in enumerate(image.selections, start=1):
+            if self._is_cancelled(image):
+                return
+            if item.image_data is not None:
+                yield _SelectionItem(image, index, extract_region(item.image_data, selection.as_qrect))
+                continue
+            try:
+                yield _SelectionItem(image, index, lossless_jpeg_cropping.crop(image.image_path, selection.as_qrect))
+            except RuntimeError as e:
+                logger.warning(f"Lossless cropping failed, re-encoding the selection instead: {e}")
+                try:
+                    item = item._replace(image_data=image.load_image_data())
+                except RuntimeError as e:
+                    self._fail(image, e)
+                    return
+                yield _SelectionItem(image, index, extract_region(item.image_data, selection.as_qrect))
+
+    def _encode(self, item: _SelectionItem) -> typing.Iterable[None]:
+        image = item.image
+        if self._is_cancelled(image):
+            return ()
+        encoded = item.content if isinstance(item.content, bytes) else image.encode(item.content)
+        if encoded is None:
+            self._fail(image, RuntimeError(f"Encoding selection {item.index} failed."))
+            return ()
+        commit = self.output_writer.submit(image._get_output_file_name(item.index), encoded)
+        commit.add_done_callback(lambda future: self._on_committed(image, future))
+        return ()
+
+    def _on_committed(self, image: Image, commit: concurrent.futures.Future):
+        """Executed by the OutputWriter thread."""
+        if commit.exception() is not None:
+            self._fail(image, commit.exception())
+            return
+        with self._lock:
+            if image in self._failed:
+                return
+            self._remaining_selections[image] -= 1
+            self._outputs[image].append(commit.result())
+            is_finished = not self._remaining_selections[image]
+        if is_finished:
+            self._results.put(Result(image, None, tuple(sorted(self._outputs.pop(image)))))
+
+    def statistics(self) -> typing.List[StageStatistics]:
+        writer = self.output_writer.statistics()
+        return [stage.statistics() for stage in self.stages] + [StageStatistics(
+            "write", 1, writer.files, writer.busy_seconds, writer.queue_depth, writer.max_queue_depth, writer.queue_size
+        )]
+
+    def log_statistics(self):
+        elapsed_seconds = time.perf_counter() - self._start_time
+        logger.info(f"Save pipeline statistics after {elapsed_seconds:.2f}s:")
+        for stage in self.statistics():
+            logger.info(
+                f"  {stage.name}: {stage.threads} threads, {stage.processed} items "
+                f"({stage.throughput(elapsed_seconds):.1f}/s), {100*stage.utilization(elapsed_seconds):.0f}% busy, "
+                f"queue depth {stage.queue_depth} (max {stage.max_queue_depth} of {stage.queue_size})"
+            )
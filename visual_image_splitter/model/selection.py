@@ -21,6 +21,7 @@ from PyQt5.QtCore import QRect, QPoint, QSize, QRectF, QVariant, Qt
 from PyQt5.QtGui import QPixmap
 
 from .point import Point
+from . import rows
 
 if typing.TYPE_CHECKING:
     from .image import Image
@@ -39,16 +40,32 @@ class Columns(enum.IntEnum):
 
 class Selection:
 
-    QT_COLUMN_COUNT = 3  # Number of columns. Used in the Qt Model API.
+    QT_COLUMN_COUNT = len(Columns)  # Number of columns. Used in the Qt Model API.
 
     def __init__(self, point1: Point, point2: Point, parent_image=None):
         logger.info(f"Creating Selection, using points {point1}, {point2}, has_parent={parent_image is not None}")
-        self.top_left, self.bottom_right = Selection._normalize(point1, point2)
-        self._parent: Image = parent_image
+        self._initialize(*Selection.normalize(point1, point2), parent_image)
         logger.debug(f"Normalized input points to {self.top_left}, {self.bottom_right}")
 
+    def _initialize(self, top_left: Point, bottom_right: Point, parent_image):
+        """Sets up all instance attributes. Shared by the constructor and from_normalized_points()."""
+        self.top_left, self.bottom_right = top_left, bottom_right
+        self._parent: Image = parent_image
+        self.cached_row = 0  # Position in the parent Image. See the rows module.
+        self._display_data: typing.Optional[typing.Tuple[Point, Point, typing.List[QVariant]]] = None
+
+    @classmethod
+    def from_normalized_points(cls, top_left: Point, bottom_right: Point, parent_image=None) -> "Selection":
+        """
+        Creates a selection from points that are already normalized, like those returned by normalize(). This skips
+        the normalization and logging done by the constructor, which is noticeable when creating many selections.
+        """
+        selection = cls.__new__(cls)
+        selection._initialize(top_left, bottom_right, parent_image)
+        return selection
+
     @staticmethod
-    def _normalize(point1: Point, point2: Point) -> typing.Tuple[Point, Point]:
+    def normalize(point1: Point, point2: Point) -> typing.Tuple[Point, Point]:
         """
         Normalize coordinates given by two points. After normalization, the first point gives the top left corner,
         and the second point the bottom right corner.
@@ -73,6 +90,9 @@ class Selection:
         if self._parent is None:
             logger.info(f"Requested thumbnail for {self}, but parent is None. Returning empty QPixmap.")
             return QPixmap()
+        elif not self._parent.has_preview:
+            logger.debug(f"Requested thumbnail for {self}, but the preview is not loaded yet. Returning empty QPixmap.")
+            return QPixmap()
         else:
             low_resolution_image = self.parent().low_resolution_image
             # The low_resolution_image has the same aspect ratio as the source image, so computing the scaling from
@@ -93,7 +113,7 @@ class Selection:
     @staticmethod
     def column_count() -> int:
         """Qt Model function."""
-        return len(Columns)
+        return Selection.QT_COLUMN_COUNT
 
     @staticmethod
     def row_count() -> int:
@@ -105,10 +125,10 @@ class Selection:
         Qt Model function. This function returns this selections own row number. It is used to create QModelIndex
         instances.
         """
-        if self.parent is None:
+        if self._parent is None:
             return 0
         else:
-            return self.parent().selections.index(self)
+            return rows.row_of(self, self._parent.selections)
 
     def data(self, column: int, role: int = Qt.DisplayRole) -> QVariant:
         """Qt Model function. Returns the own data using the Qt Model API"""
@@ -124,13 +144,15 @@ class Selection:
             return QVariant()
 
     def _get_column_display_data_for_row(self, column: int) -> QVariant:
-        """Returns column data for Qt.DisplayRole. REQUIRES a valid column index."""
-        if column == Columns.SELECTION:
-            return QVariant(str(self))
-        elif column == Columns.TOP_LEFT:
-            return QVariant(str(self.top_left))
-        elif column == Columns.BOTTOM_RIGHT:
-            return QVariant(str(self.bottom_right))
+        """
+        Returns column data for Qt.DisplayRole. REQUIRES a valid column index. The data of all columns is created at
+        once and cached, as long as the points do not change.
+        """
+        if self._display_data is None or self._display_data[:2] != (self.top_left, self.bottom_right):
+            self._display_data = self.top_left, self.bottom_right, [
+                QVariant(str(self)), QVariant(str(self.top_left)), QVariant(str(self.bottom_right))
+            ]
+        return self._display_data[2][column]
 
     def _get_user_data_for_row(self, column: int):
         """Returns column data for Qt.UserRole. REQUIRES a valid column index."""
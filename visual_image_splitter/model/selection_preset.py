@@ -16,6 +16,7 @@
 import typing
 
 from visual_image_splitter.model.image import Image
+from visual_image_splitter.model.lru_cache import LRUCache
 from visual_image_splitter.model.point import Point
 from visual_image_splitter.model.selection import Selection
 
@@ -23,6 +24,48 @@ from visual_image_splitter.logger import get_logger
 logger = get_logger(__name__)
 del get_logger
 
+# Number of image sizes, for which the resolved coordinates of a SelectionPresetList are kept.
+# Scans from the same scanner share a few sizes, so this is plenty.
+RESOLVED_SIZES_CACHE_SIZE = 256
+
+# Coordinates of a resolved preset: x1, y1, x2, y2
+Coordinates = typing.Tuple[int, int, int, int]
+
+
+class _Value(typing.NamedTuple):
+    """A single parsed preset value."""
+    number: typing.Union[int, float]
+    is_percentage: bool
+    sign: str  # "+", "-" or "", as given. Required to distinguish "-0" from "0".
+
+    @staticmethod
+    def parse(value: str) -> "_Value":
+        sign = value[0] if value.startswith(("+", "-")) else ""
+        if value.endswith("%"):
+            return _Value(float(value[:-1]), True, sign)
+        return _Value(int(value), False, sign)
+
+    def resolve(self, image_dimension: int) -> int:
+        if self.is_percentage:
+            return round(image_dimension * self.number / 100)
+        return self.number
+
+    def resolve_first(self, image_dimension: int) -> int:
+        result = self.resolve(image_dimension)
+        if result < 0 or (result == 0 and self.sign == "-"):
+            # Second case is triggered, if specifying "-0" on the command line. This will use the right or bottom border
+            # Reminder: Because result is non-positive, this is the desired subtraction:
+            result = image_dimension + result
+        return result
+
+    def resolve_second(self, image_dimension: int, relative_anchor: int) -> int:
+        result = self.resolve(image_dimension)
+        if result < 0 or self.sign == "+" or (result == 0 and self.sign == "-"):
+            # Relative to the first anchor, positive or negative
+            # Reminder: Because result is non-positive, this is the desired subtraction:
+            result = relative_anchor + result
+        return result
+
 
 class SelectionPreset(typing.NamedTuple):
     """
@@ -37,36 +80,64 @@ class SelectionPreset(typing.NamedTuple):
     y2: str
 
     def to_rectangle(self, image: Image):
-        x1 = SelectionPreset._parse_first(self.x1, image.width)
-        y1 = SelectionPreset._parse_first(self.y1, image.height)
-        x2 = SelectionPreset._parse_second(self.x2, image.width, x1)
-        y2 = SelectionPreset._parse_second(self.y2, image.height, y1)
-        result = Selection(Point(x1, y1), Point(x2, y2), image)
-        logger.info(f"Converting {self} into {result}")
+        result = Selection(*_to_points(self.compile()(image.width, image.height)), image)
+        logger.debug(f"Converting {self} into {result}")
         return result
 
-    @staticmethod
-    def _parse_first(value: str, image_dimension: int) -> int:
-        result = SelectionPreset._parse_value(value, image_dimension)
-        if result < 0 or (result == 0 and value.startswith("-")):
-            # Second case is triggered, if specifying "-0" on the command line. This will use the right or bottom border
-            # Reminder: Because result is non-positive, this is the desired subtraction:
-            result = image_dimension + result
-        return result
+    def compile(self) -> typing.Callable[[int, int], Coordinates]:
+        """
+        Parses the preset values once. Returns a function that converts the preset into the coordinates for an image
+        with the given width and height.
+        """
+        x1, y1, x2, y2 = (_Value.parse(value) for value in self)
 
-    @staticmethod
-    def _parse_second(value: str, image_dimension: int, relative_anchor: int) -> int:
-        result = SelectionPreset._parse_value(value, image_dimension)
-        if result < 0 or value.startswith("+") or (result == 0 and value.startswith("-")):
-            # Relative to the first anchor, positive or negative
-            # Reminder: Because result is non-positive, this is the desired subtraction:
-            result = relative_anchor + result
-        return result
+        def resolve(width: int, height: int) -> Coordinates:
+            first_x = x1.resolve_first(width)
+            first_y = y1.resolve_first(height)
+            return first_x, first_y, x2.resolve_second(width, first_x), y2.resolve_second(height, first_y)
+        return resolve
 
-    @staticmethod
-    def _parse_value(value: str, image_dimension: int) -> int:
-        if value.endswith("%"):
-            result = round(image_dimension * float(value[:-1]) / 100)
-        else:
-            result = int(value)
+
+def _to_points(coordinates: Coordinates) -> typing.Tuple[Point, Point]:
+    x1, y1, x2, y2 = coordinates
+    return Point(x1, y1), Point(x2, y2)
+
+
+class SelectionPresetList:
+    """
+    A list of selection presets applied to many images. The presets are parsed once and the resolved, normalized
+    points are cached per image size, so that applying them to images of an already seen size only creates the
+    selections. Thread safe.
+    """
+
+    def __init__(self, presets: typing.Iterable[SelectionPreset]):
+        self.presets: typing.List[SelectionPreset] = list(presets)
+        self._compiled = [preset.compile() for preset in self.presets]
+        self._resolved: LRUCache[typing.Tuple[int, int], typing.List[typing.Tuple[Point, Point]]] = LRUCache(
+            RESOLVED_SIZES_CACHE_SIZE, lambda points: 1, "Resolved selection presets"
+        )
+
+    def __len__(self) -> int:
+        return len(self.presets)
+
+    def __iter__(self) -> typing.Iterator[SelectionPreset]:
+        return iter(self.presets)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.presets})"
+
+    def points(self, width: int, height: int) -> typing.List[typing.Tuple[Point, Point]]:
+        """Returns the normalized top left and bottom right points of all presets for an image with the given size."""
+        size = width, height
+        result = self._resolved.get(size)
+        if result is None:
+            result = [Selection.normalize(*_to_points(resolve(width, height))) for resolve in self._compiled]
+            self._resolved.put(size, result)
         return result
+
+    def apply_to(self, image: Image):
+        """Adds a selection for each preset to the given image."""
+        image.add_selections(
+            Selection.from_normalized_points(top_left, bottom_right, image)
+            for top_left, bottom_right in self.points(image.width, image.height)
+        )
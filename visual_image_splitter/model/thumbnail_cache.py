@@ -0,0 +1,223 @@
+# Copyright (C) 2019 Thomas Hess <thomas.hess@udo.edu>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import hashlib
+import os
+from pathlib import Path
+import threading
+import typing
+
+from PyQt5.QtCore import QSize, QStandardPaths
+from PyQt5.QtGui import QImage, QImageReader
+
+from .preview import PREVIEW_RESOLUTION
+
+from visual_image_splitter.logger import get_logger
+logger = get_logger(__name__)
+del get_logger
+
+# Value of the Software PNG text chunk of the entries written by this program. In the shared freedesktop.org thumbnail
+# directory, only entries carrying it are counted, evicted or replaced, so thumbnails of other programs are kept.
+SOFTWARE = "visual_image_splitter"
+# Longer edge of the thumbnails in the freedesktop.org xx-large directory, as defined by the thumbnail standard
+FREEDESKTOP_XX_LARGE_RESOLUTION = 1024
+
+
+def default_cache_directory(freedesktop: bool = False) -> Path:
+    """
+    Returns the default thumbnail cache location. If freedesktop is True, this is the shared thumbnail directory as
+    specified by the freedesktop.org thumbnail managing standard. The xx-large category is used, because it is the
+    smallest one holding thumbnails not smaller than the preview images.
+    """
+    cache_root = Path(QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation))
+    if freedesktop:
+        return cache_root / "thumbnails" / "xx-large"
+    return cache_root / "visual_image_splitter" / "thumbnails"
+
+
+class ThumbnailCache:
+    """
+    Persistent on-disk cache for the low resolution preview images. Entries are stored as PNG files and keyed by the
+    resolved source file path, the source file size and the modification time, so modified files are detected.
+    The total cache size is limited. If the limit is exceeded, the least recently used entries are deleted.
+    The usage order is persisted using the modification time of the cache files, which is updated on each cache hit.
+
+    If freedesktop is True, entries follow the freedesktop.org thumbnail managing standard: File names are the MD5 hash
+    of the source file URI and the source modification time and size are stored as Thumb::MTime and Thumb::Size
+    PNG text chunks. This allows sharing the cache with file managers. Entries written by other programs are used,
+    but never replaced or evicted, and do not count towards the size limit. Entries are stored at the xx-large size
+    of 1024 pixels defined by the standard, instead of the preview size, so that other programs reading the shared
+    directory get thumbnails of the expected size. These are scaled down to the preview size when used.
+    The size of the stored entries is given by the resolution attribute.
+
+    This class is thread safe.
+    """
+
+    # Log the hit and miss counts after this many lookups. They are also logged on application exit.
+    STATISTICS_INTERVAL = 100
+
+    def __init__(self, cache_directory: Path, size_limit: int, freedesktop: bool = False):
+        """
+        :param cache_directory: Directory containing the cache entries. Created, if it does not exist.
+        :param size_limit: Maximum total size of all cache entries in bytes.
+        :param freedesktop: Use the freedesktop.org thumbnail standard for cache entries.
+        """
+        self.cache_directory = cache_directory
+        self.size_limit = size_limit
+        self.freedesktop = freedesktop
+        # Longer edge of the stored thumbnails
+        self.resolution = FREEDESKTOP_XX_LARGE_RESOLUTION if freedesktop else PREVIEW_RESOLUTION
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Maps cache file names to file sizes, ordered from least recently used to most recently used.
+        self._entries: typing.MutableMapping[str, int] = collections.OrderedDict()
+        self._total_size = 0
+        self._scan_cache_directory()
+        logger.info(f"Created thumbnail cache in {cache_directory} with {len(self._entries)} entries, using "
+                    f"{self._total_size/2**20:.1f} MiB of {size_limit/2**20:.1f} MiB")
+
+    def _scan_cache_directory(self):
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_directory) as directory:
+            for entry in directory:
+                if entry.is_file() and entry.name.endswith(".png") and self._is_own_entry(Path(entry.path)):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._total_size += size
+
+    def load(self, image_path: Path, expected_size: QSize) -> typing.Optional[QImage]:
+        """
+        Returns the cached preview image for the given source file or None, if no valid entry exists. Entries with a
+        size different from expected_size are considered invalid.
+        """
+        try:
+            source_stat = image_path.stat()
+        except OSError:
+            return None
+        name = self._entry_name(image_path, source_stat)
+        # Entries may have been added by other processes, so always try to read the entry.
+        thumbnail = self._read_entry(name, source_stat)
+        is_hit = thumbnail is not None and thumbnail.size() == expected_size
+        with self._lock:
+            if is_hit:
+                self.hits += 1
+                if name in self._entries:
+                    self._entries.move_to_end(name)
+            else:
+                self.misses += 1
+            lookups = self.hits + self.misses
+        if not lookups % self.STATISTICS_INTERVAL:
+            self.log_statistics()
+        if not is_hit:
+            logger.debug(f"Thumbnail cache miss for {image_path}")
+            return None
+        logger.debug(f"Thumbnail cache hit for {image_path}")
+        try:
+            os.utime(self.cache_directory / name)
+        except OSError:
+            pass
+        return thumbnail
+
+    def store(self, image_path: Path, thumbnail: QImage):
+        """Adds the thumbnail for the given source file to the cache. Evicts old entries, if the cache is full."""
+        try:
+            source_stat = image_path.stat()
+        except OSError:
+            return
+        name = self._entry_name(image_path, source_stat)
+        entry_path = self.cache_directory / name
+        if entry_path.exists() and not self._is_own_entry(entry_path):
+            logger.debug(f"Keeping the thumbnail of {image_path} written by another program.")
+            return
+        if self.freedesktop:
+            thumbnail = QImage(thumbnail)  # Don’t modify the given image
+            thumbnail.setText("Thumb::URI", self._uri(image_path))
+            thumbnail.setText("Thumb::MTime", str(int(source_stat.st_mtime)))
+            thumbnail.setText("Thumb::Size", str(source_stat.st_size))
+            thumbnail.setText("Software", SOFTWARE)
+        # Write to a temporary file first and rename it afterwards, so that other threads or processes never see
+        # partially written entries.
+        temporary_path = entry_path.with_name(f".{name}.{threading.get_ident()}.tmp")
+        if not thumbnail.save(str(temporary_path), "png"):
+            logger.warning(f"Writing the thumbnail cache entry for {image_path} failed.")
+            return
+        try:
+            os.replace(temporary_path, entry_path)
+            size = entry_path.stat().st_size
+        except OSError as e:
+            logger.warning(f"Writing the thumbnail cache entry for {image_path} failed: {e}")
+            try:
+                temporary_path.unlink()
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._total_size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used entries until the size limit is met. Requires holding the lock."""
+        while self._total_size > self.size_limit and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_size -= size
+            logger.debug(f"Evicting thumbnail cache entry {name}")
+            try:
+                (self.cache_directory / name).unlink()
+            except OSError:
+                pass
+
+    def _is_own_entry(self, entry_path: Path) -> bool:
+        """Returns True, if the entry was written by this program. Only reads the PNG header, not the pixel data."""
+        if not self.freedesktop:
+            # The private cache directory is only used by this program.
+            return True
+        return QImageReader(str(entry_path)).text("Software") == SOFTWARE
+
+    def _read_entry(self, name: str, source_stat: os.stat_result) -> typing.Optional[QImage]:
+        thumbnail = QImageReader(str(self.cache_directory / name)).read()
+        if thumbnail.isNull():
+            return None
+        # QImageReader.text() can not be used, because it splits keys at colons, so check the decoded image instead.
+        if self.freedesktop and not (
+                thumbnail.text("Thumb::MTime") == str(int(source_stat.st_mtime))
+                and thumbnail.text("Thumb::Size") in ("", str(source_stat.st_size))):
+            return None
+        return thumbnail
+
+    def _entry_name(self, image_path: Path, source_stat: os.stat_result) -> str:
+        if self.freedesktop:
+            # The modification time and file size are validated using the PNG text chunks when reading the entry.
+            return hashlib.md5(self._uri(image_path).encode("utf-8")).hexdigest() + ".png"
+        key = f"{image_path.resolve()}\0{source_stat.st_size}\0{source_stat.st_mtime_ns}"
+        return hashlib.sha256(key.encode("utf-8", "surrogateescape")).hexdigest() + ".png"
+
+    @staticmethod
+    def _uri(image_path: Path) -> str:
+        return image_path.resolve().as_uri()
+
+    def log_statistics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            logger.info(
+                f"Thumbnail cache statistics: {self.hits} hits, {self.misses} misses "
+                f"({100*self.hits/lookups if lookups else 0:.1f}% hit rate), {len(self._entries)} entries using "
+                f"{self._total_size/2**20:.1f} MiB"
+            )
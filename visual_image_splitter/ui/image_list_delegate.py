@@ -85,6 +85,9 @@ class ImageListItemDelegate(CustomItemDelegateBase):
     @staticmethod
     def _paint_image(painter: QtGui.QPainter, option: QStyleOptionViewItem, index: QModelIndex):
         image: Image = index.data(Qt.UserRole)
+        if not image.has_preview:
+            # The preview image is created in the background. The model signals dataChanged, when it is available.
+            return
         image_region = ImageListItemDelegate._scale_image(image, option)
         painter.drawPixmap(image_region, image.low_resolution_image)
 
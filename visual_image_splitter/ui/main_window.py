@@ -16,7 +16,7 @@
 
 from PyQt5.QtCore import pyqtSlot, pyqtSignal, QModelIndex
 from PyQt5.QtGui import QCloseEvent
-from PyQt5.QtWidgets import QWidget, QApplication
+from PyQt5.QtWidgets import QWidget, QApplication, QFileDialog
 
 from visual_image_splitter.ui.common import inherits_from_ui_file_with_name
 from visual_image_splitter.ui.selection_editor import SelectionEditor
@@ -26,16 +26,21 @@ from visual_image_splitter.logger import get_logger
 logger = get_logger(__name__)
 del get_logger
 
+MANIFEST_FILE_FILTER = "Job manifests (*.jsonl);;All files(*)"
+
 
 class MainWindow(*inherits_from_ui_file_with_name("main_window")):
 
     open_command_line_given_images = pyqtSignal()
     open_images = pyqtSignal(list)
     close_image = pyqtSignal(QModelIndex, bool)
+    import_manifest = pyqtSignal(str)
+    export_manifest = pyqtSignal(str)
 
     def __init__(self, model, parent: QWidget = None):
         super(MainWindow, self).__init__(parent)
         self.setupUi(self)
+        self.model = model
         self.dirty: bool = False
         self.image_view: SelectionEditor
         self.opened_images_list_view: OpenedImageListView
@@ -49,23 +54,39 @@ class MainWindow(*inherits_from_ui_file_with_name("main_window")):
         self.opened_images_list_view.selectionModel().currentRowChanged.connect(
             self.selection_list_view.on_active_image_changed
         )
+        self.opened_images_list_view.selectionModel().currentRowChanged.connect(
+            model.prefetcher.on_active_image_changed
+        )
         logger.info(f"Created {self.__class__.__name__} instance.")
         self._connect_model_signals(model)
 
     def _connect_model_signals(self, model):
         """Connect all GUI actions with the model."""
         self.open_images.connect(model.open_images)
+        model.dataChanged.connect(self.image_view.on_model_data_changed)
         model.save_and_close_all_finished.connect(self.image_view.clear)
         model.save_and_close_all_finished.connect(self.selection_list_view.clear_list)
+        model.save_and_close_all_progress.connect(self.on_save_and_close_all_progress)
         self.action_save_all.triggered.connect(model.save_and_close_all_images)
         self.action_save_current.triggered.connect(self.selection_list_view.clear_list)
         self.action_save_current.triggered.connect(self.image_view.clear)
         self.action_close_current.triggered.connect(self.selection_list_view.clear_list)
         self.action_close_current.triggered.connect(self.image_view.clear)
         self.close_image.connect(model.close_image)
+        self.import_manifest.connect(model.import_manifest)
+        self.export_manifest.connect(model.export_manifest)
+        model.manifest_exported.connect(self.on_manifest_exported)
+        model.manifest_export_failed.connect(self.on_manifest_export_failed)
 
         logger.debug("Connected action signals with model signals")
 
+    @pyqtSlot(int, int)
+    def on_save_and_close_all_progress(self, finished: int, total: int):
+        if finished < total:
+            self.statusbar.showMessage(f"Saving images: {finished} of {total} done")
+        else:
+            self.statusbar.showMessage(f"Saved {total} images", 5000)
+
     def closeEvent(self, event: QCloseEvent):
         """
         This function is automatically called when the window is closed using the close [X] button in the window
@@ -98,6 +119,29 @@ class MainWindow(*inherits_from_ui_file_with_name("main_window")):
             logger.debug(f"File open dialog accepted. Emitting open_images signal with paths={paths}")
             self.open_images.emit(paths)
 
+    @pyqtSlot()
+    def on_action_import_manifest_triggered(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import job manifest", filter=MANIFEST_FILE_FILTER)
+        if path:
+            logger.debug(f"Importing job manifest {path}")
+            self.import_manifest.emit(path)
+
+    @pyqtSlot()
+    def on_action_export_manifest_triggered(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export job manifest", filter=MANIFEST_FILE_FILTER)
+        if path:
+            logger.debug(f"Exporting job manifest {path}")
+            self.statusbar.showMessage(f"Exporting the job manifest to {path}")
+            self.export_manifest.emit(path)
+
+    @pyqtSlot(str, int)
+    def on_manifest_exported(self, path: str, count: int):
+        self.statusbar.showMessage(f"Exported {count} images to {path}", 5000)
+
+    @pyqtSlot(str, str)
+    def on_manifest_export_failed(self, path: str, error: str):
+        self.statusbar.showMessage(f"Exporting the job manifest to {path} failed: {error}")
+
     @pyqtSlot()
     def on_action_save_current_triggered(self):
         selected_image = self.opened_images_list_view.selectionModel().currentIndex()
@@ -16,9 +16,10 @@
 from pathlib import Path
 import typing
 
-from PyQt5.QtGui import QImageReader, QImageWriter
 from PyQt5.QtWidgets import QFileDialog, QWidget
 
+from visual_image_splitter.model.image import supported_file_formats
+
 from visual_image_splitter.logger import get_logger
 logger = get_logger(__name__)
 del get_logger
@@ -65,10 +66,7 @@ class OpenImagesDialog(QFileDialog):
         """
         Returns all supported file types. This is the intersection of readable and writable file formats.
         """
-        supported_input_formats = set(f.data().decode("utf-8") for f in QImageReader.supportedImageFormats())
-        supported_output_formats = set(f.data().decode("utf-8") for f in QImageWriter.supportedImageFormats())
-        supported_formats = sorted(list(supported_input_formats.intersection(supported_output_formats)))
-        return supported_formats
+        return supported_file_formats()
 
     def selected_paths(self) -> typing.List[Path]:
         """Returns a list with all selected files."""
@@ -18,9 +18,10 @@ import enum
 
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsSceneMouseEvent, QGraphicsRectItem
 from PyQt5.QtWidgets import QWidget, QApplication
-from PyQt5.QtCore import QRectF, QModelIndex, Qt, QObject, QPointF, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import QRectF, QModelIndex, QPersistentModelIndex, Qt, QObject, QPointF, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QPixmap, QPen, QColor, QBrush
 
+from visual_image_splitter.model.image import Image
 from visual_image_splitter.model.selection import Selection
 from visual_image_splitter.model.point import Point
 
@@ -117,8 +118,9 @@ class SelectionScene(QGraphicsScene):
             event.accept()
 
     def load_selections(self, current: QModelIndex):
-        selection_count: int = current.model().rowCount(current)  # The number of child nodes, which are selections
         current_first_column = current.sibling(current.row(), 0)  # Selections are below the first column
+        # The number of child nodes, which are selections
+        selection_count: int = current.model().rowCount(current_first_column)
         selections: typing.List[Selection] = [
             current_first_column.child(index, 0).data(Qt.UserRole) for index in range(selection_count)
         ]
@@ -172,6 +174,8 @@ class SelectionEditor(QGraphicsView):
 
     def __init__(self, parent: QWidget = None):
         super(SelectionEditor, self).__init__(parent)
+        # Set, if the active image has no preview image yet. It is loaded, when the model signals a data change.
+        self._waiting_for_preview = QPersistentModelIndex()
 
     @pyqtSlot(QModelIndex, QModelIndex)
     def on_active_image_changed(self, current: QModelIndex, previous: QModelIndex):
@@ -179,17 +183,31 @@ class SelectionEditor(QGraphicsView):
         Called, whenever the selected image changes.
         This happens, when the user clicks on an image in the opened images list to edit the selections.
         """
+        self._waiting_for_preview = QPersistentModelIndex()
         if current.isValid():
             data = current.data(Qt.BackgroundRole)
             if data is not None:
                 self.load_image(data)
                 self.load_selections(current)
+            elif isinstance(current.data(Qt.UserRole), Image):
+                editor_logger.info(f"Preview image for row {current.row()} not yet available. Waiting for it.")
+                self._waiting_for_preview = QPersistentModelIndex(current)
+                self.clear()
             else:
                 editor_logger.info(f"Invalid index {current}. row={current.row()}, column={current.column()}")
         else:
             editor_logger.debug("Selection changed to an invalid index. Clearing scene.")
             self.clear()
 
+    @pyqtSlot(QModelIndex, QModelIndex)
+    def on_model_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex):
+        """Called, whenever model data changes. Used to show the active image as soon as its preview is available."""
+        if self._waiting_for_preview.isValid() \
+                and top_left.parent() == self._waiting_for_preview.parent() \
+                and top_left.row() <= self._waiting_for_preview.row() <= bottom_right.row():
+            waiting_for = QModelIndex(self._waiting_for_preview)
+            self.on_active_image_changed(waiting_for, waiting_for)
+
     def load_image(self, image: QPixmap):
         new_scene = SelectionScene(QRectF(image.rect()), parent=self)
         new_scene.addPixmap(image)
@@ -14,7 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import sys
+
 import visual_image_splitter.application
+import visual_image_splitter.batch
+import visual_image_splitter.encoder_benchmark
+import visual_image_splitter.hot_folder
+import visual_image_splitter.logger
+from visual_image_splitter.argument_parser import parse_arguments
 
 
 # Workaround that puts the Application instance into the module scope. This prevents issues with the garbage collector
@@ -25,7 +32,17 @@ _app = None
 
 def main():
     global _app
-    _app = visual_image_splitter.application.Application()
+    args = parse_arguments()
+    if args.benchmark_encoders:
+        visual_image_splitter.logger.configure_root_logger(args)
+        sys.exit(visual_image_splitter.encoder_benchmark.run(args))
+    if args.batch:
+        # Headless mode: No QApplication is created, so no display is required.
+        visual_image_splitter.logger.configure_root_logger(args)
+        if args.watch_directories:
+            sys.exit(visual_image_splitter.hot_folder.run(args))
+        sys.exit(visual_image_splitter.batch.run(args))
+    _app = visual_image_splitter.application.Application(args=args)
 
 
 if __name__ == "__main__": 